@@ -5,6 +5,18 @@ from flask_jwt_extended import JWTManager
 from routes.auth import auth_bp, init_auth_routes
 from routes.users import users_bp, init_users_routes
 from routes.posts import posts_bp, init_posts_routes
+from routes.events import events_bp, init_events_routes
+from routes.metrics import metrics_bp, init_metrics_routes
+from models.timeline import Timeline
+from models.post import Post
+from models.user import User
+from models.indexes import ensure_indexes, verify_indexes
+from models.cache import get_user_cache
+from json_provider import MongoJSONProvider
+from services.events import event_bus
+from services.images import IMAGE_MAX_BYTES
+from services.logs import configure_logging
+from services.metrics import MongoCommandListener
 from dotenv import load_dotenv
 import os
 
@@ -12,32 +24,50 @@ import os
 load_dotenv()
 
 def create_app():
+    configure_logging()
     app = Flask(__name__)
-    # socketio = SocketIO(app, cors_allowed_origins="*")  # or frontend origin
+    app.json = MongoJSONProvider(app)
     
     # Configuration
     app.config['MONGO_URI'] = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/beizzati_tracker')
     app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'your-super-secret-jwt-key')
+    # Oversized uploads are refused with 413 before the body is read; room is left for the form fields
+    app.config['MAX_CONTENT_LENGTH'] = IMAGE_MAX_BYTES + 1024 * 1024
     # Initialize extensions
     CORS(app, supports_credentials=True)
-    mongo = PyMongo(app)
+    # Counts and times every command, per request and overall; see /api/metrics
+    mongo = PyMongo(app, event_listeners=[MongoCommandListener()])
     jwt = JWTManager(app)
     
+    # Create indexes on startup (idempotent); optionally fail fast on unindexed queries
+    if os.getenv('MONGO_ENSURE_INDEXES', 'true').lower() == 'true':
+        ensure_indexes(mongo.db)
+    if os.getenv('MONGO_VERIFY_INDEXES', 'false').lower() == 'true':
+        verify_indexes(mongo.db)
+    
     # Initialize routes
     auth_bp_initialized = init_auth_routes(mongo)
     users_bp_initialized = init_users_routes(mongo)
     posts_bp_initialized = init_posts_routes(mongo)
+    events_bp_initialized = init_events_routes(mongo)
+    metrics_bp_initialized = init_metrics_routes(mongo)
     
     # Register blueprints
     app.register_blueprint(auth_bp_initialized, url_prefix='/api/auth')
     app.register_blueprint(users_bp_initialized, url_prefix='/api/users')
     app.register_blueprint(posts_bp_initialized, url_prefix='/api/posts')
+    app.register_blueprint(events_bp_initialized, url_prefix='/api/events')
+    app.register_blueprint(metrics_bp_initialized, url_prefix='/api/metrics')
     
     # Error handlers
     @app.errorhandler(404)
     def not_found(error):
         return jsonify({'error': 'Not found'}), 404
     
+    @app.errorhandler(413)
+    def request_too_large(error):
+        return jsonify({'error': 'Upload is too large'}), 413
+    
     @app.errorhandler(500)
     def internal_error(error):
         return jsonify({'error': 'Internal server error'}), 500
@@ -45,7 +75,49 @@ def create_app():
     # Health check endpoint
     @app.route('/api/health')
     def health_check():
-        return jsonify({'status': 'healthy', 'message': 'Beijjati Tracker API is running'}), 200
+        return jsonify({
+            'status': 'healthy',
+            'message': 'Beijjati Tracker API is running',
+            'user_cache': get_user_cache(mongo.db).stats(),
+            'event_streams': event_bus.stats()
+        }), 200
+    
+    # Maintenance commands
+    @app.cli.command('init-indexes')
+    def init_indexes():
+        """Create all registered MongoDB indexes."""
+        ensure_indexes(mongo.db)
+        print("Indexes are up to date")
+    
+    @app.cli.command('check-indexes')
+    def check_indexes():
+        """Explain every model query and fail if any of them does a COLLSCAN."""
+        verify_indexes(mongo.db)
+        print("All model queries are index-backed")
+    
+    @app.cli.command('backfill-usernames')
+    def backfill_usernames():
+        """Add the normalized username_lower field to existing users."""
+        updated, conflicts = User(mongo.db).backfill_username_lower()
+        print(f"Backfilled username_lower for {updated} users")
+        for username in conflicts:
+            print(f"Conflict: more than one user normalizes to '{username}'")
+    
+    @app.cli.command('migrate-likes')
+    def migrate_likes():
+        """Move embedded post like arrays into the likes collection."""
+        posts, likes = Post(mongo.db).migrate_embedded_likes()
+        print(f"Migrated {likes} likes from {posts} posts")
+    
+    @app.cli.command('rebuild-timelines')
+    def rebuild_timelines():
+        """Rebuild every user's materialized feed timeline."""
+        timeline = Timeline(mongo.db)
+        count = 0
+        for user in mongo.db.users.find({}, {"_id": 1}):
+            timeline.rebuild(user["_id"])
+            count += 1
+        print(f"Rebuilt timelines for {count} users")
     
     return app
 
@@ -0,0 +1,191 @@
+"""Synthetic data for benchmarks: users, a power-law friend graph, posts, mentions and likes.
+
+    python bench/dataset.py --users 10000 --mongo-uri mongodb://localhost:27017/bench
+
+Documents are written with bulk inserts in the shapes the models read, so
+generating is fast and bypasses bcrypt. Every user's password is
+DATASET_PASSWORD. The target collections are dropped first and indexes are
+built once the data is in.
+"""
+from bson import ObjectId
+from datetime import datetime, timedelta
+from pymongo import InsertOne, MongoClient
+import argparse
+import bcrypt
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.indexes import ensure_indexes  # noqa: E402
+from models.timeline import Timeline  # noqa: E402
+from models.user import normalize_username  # noqa: E402
+
+DATASET_PASSWORD = 'bench-password'
+
+BATCH_SIZE = 1000
+
+WORDS = (
+    "solved q1 q2 q3 q4 contest rating bug deadline standup merge review coffee "
+    "leetcode streak tle wrong answer accepted segfault refactor deploy rollback"
+).split()
+
+
+def friend_graph(users, average_friends, rng):
+    """Preferential attachment (Barabasi-Albert): each user links to `average_friends / 2`
+    earlier users picked in proportion to their degree, so a few users end up
+    with very large friend lists. Returns a list of neighbour sets."""
+    links = max(1, average_friends // 2)
+    friends = [set() for _ in range(users)]
+    endpoints = []  # Each user appears once per friendship, making picks degree-weighted
+    for user in range(users):
+        targets = set()
+        if user <= links:
+            targets.update(range(user))
+        else:
+            while len(targets) < links:
+                targets.add(rng.choice(endpoints))
+        for target in targets:
+            friends[user].add(target)
+            friends[target].add(user)
+            endpoints.extend((user, target))
+    return friends
+
+
+def _flush(collection, batch):
+    if batch:
+        collection.bulk_write(batch, ordered=False)
+        batch.clear()
+
+
+def generate(db, users=1000, average_friends=20, posts_per_user=5, mention_rate=0.3,
+             average_likes=5, days=30, seed=42):
+    """Fill `db` with a synthetic dataset and return its document counts"""
+    rng = random.Random(seed)
+    for name in ('users', 'posts', 'likes', 'comments', 'timelines'):
+        db[name].drop()
+
+    password_hash = bcrypt.hashpw(DATASET_PASSWORD.encode(), bcrypt.gensalt(rounds=4)).decode()
+    user_ids = [ObjectId() for _ in range(users)]
+    friends = [sorted(neighbours) for neighbours in friend_graph(users, average_friends, rng)]
+
+    now = datetime.utcnow()
+    start = now - timedelta(days=days)
+    posts = []
+    mentions = [0] * users
+    for _ in range(users * posts_per_user):
+        # A random friend of a random user, so users with more friends post more
+        author = rng.randrange(users)
+        if friends[author]:
+            author = rng.choice(friends[author])
+        mentioned = []
+        if friends[author] and rng.random() < mention_rate:
+            mentioned = rng.sample(friends[author], min(len(friends[author]), rng.randint(1, 3)))
+            for user in mentioned:
+                mentions[user] += 1
+        posts.append((start + timedelta(seconds=rng.uniform(0, days * 86400)), author, mentioned))
+    posts.sort()
+
+    batch = []
+    for index, user_id in enumerate(user_ids):
+        username = f"user{index:06d}"
+        batch.append(InsertOne({
+            "_id": user_id,
+            "username": username,
+            "username_lower": normalize_username(username),
+            "email": f"{username}@bench.local",
+            "password_hash": password_hash,
+            "profile_picture": "",
+            "bio": "",
+            "beijjati_count": mentions[index],
+            "friends": [user_ids[friend] for friend in friends[index]],
+            "friend_requests_sent": [],
+            "friend_requests_received": [],
+            "created_at": start
+        }))
+        if len(batch) >= BATCH_SIZE:
+            _flush(db.users, batch)
+    _flush(db.users, batch)
+
+    likes = []
+    for created_at, author, mentioned in posts:
+        post_id = ObjectId()
+        audience = friends[author]
+        liked_by = []
+        if average_likes:
+            liked_by = rng.sample(audience, min(len(audience), int(rng.expovariate(1 / average_likes))))
+        likes.extend(
+            InsertOne({"post_id": post_id, "user_id": user_ids[user], "created_at": created_at})
+            for user in liked_by
+        )
+        post = {
+            "_id": post_id,
+            "author_id": user_ids[author],
+            "content": " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 12))),
+            "is_beizzati": bool(mentioned),
+            "mentioned_users": [user_ids[user] for user in mentioned],
+            "visible_to": [user_ids[friend] for friend in audience],
+            "like_count": len(liked_by),
+            "comment_count": 0,
+            "comment_preview": [],
+            "created_at": created_at
+        }
+        if mentioned:
+            post["verification_status"] = "verified"
+        if Timeline.is_enabled():
+            post["fanned_out"] = True
+        batch.append(InsertOne(post))
+        if len(batch) >= BATCH_SIZE:
+            _flush(db.posts, batch)
+        if len(likes) >= BATCH_SIZE:
+            _flush(db.likes, likes)
+    _flush(db.posts, batch)
+    _flush(db.likes, likes)
+
+    # Built after the bulk load, which is faster than maintaining them per insert
+    ensure_indexes(db)
+
+    if Timeline.is_enabled():
+        timeline = Timeline(db)
+        for user_id in user_ids:
+            timeline.rebuild(user_id)
+
+    return {name: db[name].count_documents({}) for name in ('users', 'posts', 'likes')}
+
+
+def add_arguments(parser):
+    parser.add_argument('--average-friends', type=int, default=20)
+    parser.add_argument('--posts-per-user', type=int, default=5)
+    parser.add_argument('--mention-rate', type=float, default=0.3, help='Share of posts that mention friends')
+    parser.add_argument('--average-likes', type=float, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+
+
+def dataset_options(args):
+    return {
+        "average_friends": args.average_friends,
+        "posts_per_user": args.posts_per_user,
+        "mention_rate": args.mention_rate,
+        "average_likes": args.average_likes,
+        "seed": args.seed
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--mongo-uri', default='mongodb://localhost:27017/beizzati_bench')
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    client = MongoClient(args.mongo_uri)
+    started = time.perf_counter()
+    counts = generate(client.get_default_database(), args.users, **dataset_options(args))
+    print(json.dumps({"counts": counts, "seconds": round(time.perf_counter() - started, 2)}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,442 @@
+"""Concurrent HTTP load test replaying user sessions against the whole app.
+
+    python bench/load_test.py --users 1000 --concurrency 32 --duration 60 --output load.json
+    python bench/load_test.py --server-cmd "gunicorn -w 4 -b 127.0.0.1:{port} app:create_app()"
+    python bench/load_test.py --url http://127.0.0.1:5000
+
+Unless --url is given, a synthetic dataset is loaded into --mongo-uri (see
+bench/dataset.py) and the app is started on a free port with the stub image
+verifier, so post verification never calls out. With --url nothing is
+written unless --generate is passed, and the server must already hold a
+dataset made with the same --users. Each client then loops over sessions
+until --duration runs out:
+- log in and load /me;
+- scroll a few feed pages, then revalidate the first page with its ETag;
+- view a friend's profile and posts, and like a post;
+- sometimes create a post, which is a beijjati post with an image and
+  mentions some of the time.
+
+Clients are threads with one keep-alive connection each, or asyncio tasks
+on a minimal HTTP/1.1 client (--client asyncio). Neither needs packages
+beyond the standard library. The JSON report has throughput, latency
+percentiles, status codes and error rates per endpoint.
+"""
+from collections import defaultdict
+from pymongo import MongoClient
+import argparse
+import asyncio
+import http.client
+import io
+import json
+import os
+import random
+import shlex
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+import uuid
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from bench.dataset import DATASET_PASSWORD, add_arguments, dataset_options, generate  # noqa: E402
+from bench.model_layer import git_revision, percentile  # noqa: E402
+
+DEFAULT_SERVER_CMD = (
+    f"{shlex.quote(sys.executable)} -c "
+    "\"from app import create_app; create_app().run(host='127.0.0.1', port={port}, threaded=True)\""
+)
+
+
+class Request:
+    def __init__(self, name, method, path, headers=None, body=None, json_body=None):
+        self.name = name  # Endpoint label in the report, without ids
+        self.method = method
+        self.path = path
+        self.headers = dict(headers or {})
+        self.body = body
+        if json_body is not None:
+            self.body = json.dumps(json_body).encode()
+            self.headers['Content-Type'] = 'application/json'
+
+
+class Response:
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers  # lower-cased names
+        self.body = body
+
+    def json(self):
+        try:
+            return json.loads(self.body)
+        except ValueError:
+            return {}
+
+
+def multipart(fields, files=()):
+    """Encode form fields and (name, filename, content_type, data) files"""
+    boundary = uuid.uuid4().hex
+    body = io.BytesIO()
+    for name, value in fields.items():
+        body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, filename, content_type, data in files:
+        body.write(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f'Content-Type: {content_type}\r\n\r\n'.encode()
+        )
+        body.write(data)
+        body.write(b'\r\n')
+    body.write(f'--{boundary}--\r\n'.encode())
+    return body.getvalue(), f'multipart/form-data; boundary={boundary}'
+
+
+def proof_image():
+    """A small PNG; the stub verifier accepts any image that decodes"""
+    from PIL import Image, ImageDraw
+
+    image = Image.new('RGB', (480, 320), 'white')
+    ImageDraw.Draw(image).text((20, 20), "Q3 solved", fill='black')
+    data = io.BytesIO()
+    image.save(data, format='PNG')
+    return data.getvalue()
+
+
+def session(rng, users, post_rate, beizzati_rate, image):
+    """One user's visit as a generator: yields Requests, receives Responses"""
+    username = f"user{rng.randrange(users):06d}"
+    login = yield Request('POST /api/auth/login', 'POST', '/api/auth/login',
+                          json_body={'username': username, 'password': DATASET_PASSWORD})
+    if login.status != 200:
+        return
+    auth = {'Authorization': f"Bearer {login.json()['access_token']}"}
+
+    yield Request('GET /api/auth/me', 'GET', '/api/auth/me', auth)
+
+    first_page = yield Request('GET /api/posts/feed', 'GET', '/api/posts/feed', auth)
+    page = first_page.json()
+    posts = list(page.get('posts', []))
+    for _ in range(rng.randint(0, 3)):
+        if not page.get('next_cursor'):
+            break
+        query = urllib.parse.urlencode({'before': page['next_cursor']})
+        response = yield Request('GET /api/posts/feed?before', 'GET', f'/api/posts/feed?{query}', auth)
+        page = response.json()
+        posts.extend(page.get('posts', []))
+
+    etag = first_page.headers.get('etag')
+    if etag:
+        yield Request('GET /api/posts/feed (If-None-Match)', 'GET', '/api/posts/feed',
+                      dict(auth, **{'If-None-Match': etag}))
+
+    authors = sorted({post['author']['username'] for post in posts if post.get('author')} - {username})
+    if authors:
+        friend = rng.choice(authors)
+        yield Request('GET /api/users/profile/<username>', 'GET', f'/api/users/profile/{friend}', auth)
+        yield Request('GET /api/posts/user/<username>', 'GET', f'/api/posts/user/{friend}', auth)
+
+    unliked = [post for post in posts if not post.get('liked_by_me')]
+    if unliked:
+        post_id = rng.choice(unliked)['_id']
+        yield Request('POST /api/posts/<post_id>/like', 'POST', f'/api/posts/{post_id}/like', auth)
+
+    if rng.random() < post_rate:
+        mentioned = rng.sample(authors, min(len(authors), rng.randint(1, 2))) if authors else []
+        is_beizzati = bool(mentioned) and rng.random() < beizzati_rate
+        fields = {
+            'content': ' '.join(f'@{name}' for name in mentioned) + ' load test post',
+            'is_beizzati': 'true' if is_beizzati else 'false',
+            'mentioned_users': json.dumps(mentioned)
+        }
+        files = [('image', 'proof.png', 'image/png', image)] if is_beizzati else []
+        body, content_type = multipart(fields, files)
+        name = 'POST /api/posts (beijjati)' if is_beizzati else 'POST /api/posts'
+        yield Request(name, 'POST', '/api/posts', dict(auth, **{'Content-Type': content_type}), body=body)
+
+
+class Recorder:
+    """Latencies and status codes per endpoint for one client"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.sessions = 0
+
+    def record(self, name, status, seconds):
+        self.latencies[name].append(seconds)
+        self.statuses[name][status] += 1
+
+
+def run_session_sync(send, recorder, requests):
+    response = None
+    try:
+        while True:
+            request = requests.send(response)
+            started = time.perf_counter()
+            response = send(request)
+            recorder.record(request.name, response.status, time.perf_counter() - started)
+    except StopIteration:
+        recorder.sessions += 1
+
+
+def thread_client(host, port, deadline, recorder, make_session):
+    connection = http.client.HTTPConnection(host, port, timeout=60)
+
+    def send(request):
+        nonlocal connection
+        try:
+            connection.request(request.method, request.path, body=request.body, headers=request.headers)
+            response = connection.getresponse()
+            return Response(response.status, {k.lower(): v for k, v in response.getheaders()}, response.read())
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            connection = http.client.HTTPConnection(host, port, timeout=60)
+            return Response(0, {}, b'')
+
+    while time.monotonic() < deadline:
+        run_session_sync(send, recorder, make_session())
+    connection.close()
+
+
+class AsyncConnection:
+    """Keep-alive HTTP/1.1 client for the responses this app sends"""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = self.writer = None
+
+    async def send(self, request):
+        try:
+            if self.writer is None:
+                self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+            body = request.body or b''
+            head = [f"{request.method} {request.path} HTTP/1.1", f"Host: {self.host}:{self.port}",
+                    f"Content-Length: {len(body)}"]
+            head.extend(f"{name}: {value}" for name, value in request.headers.items())
+            self.writer.write(('\r\n'.join(head) + '\r\n\r\n').encode() + body)
+            await self.writer.drain()
+
+            status = int((await self.reader.readline()).split()[1])
+            headers = {}
+            while True:
+                line = (await self.reader.readline()).decode('latin-1').strip()
+                if not line:
+                    break
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+            if headers.get('transfer-encoding', '').lower() == 'chunked':
+                data = bytearray()
+                while True:
+                    size = int((await self.reader.readline()).split(b';')[0], 16)
+                    chunk = await self.reader.readexactly(size + 2)
+                    if size == 0:
+                        break
+                    data.extend(chunk[:-2])
+                data = bytes(data)
+            elif 'content-length' in headers:
+                data = await self.reader.readexactly(int(headers['content-length']))
+            else:
+                data = await self.reader.read()
+                self.close()
+            if headers.get('connection', '').lower() == 'close':
+                self.close()
+            return Response(status, headers, data)
+        except (OSError, ValueError, IndexError, asyncio.IncompleteReadError):
+            self.close()
+            return Response(0, {}, b'')
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+async def async_client(host, port, deadline, recorder, make_session):
+    connection = AsyncConnection(host, port)
+    while time.monotonic() < deadline:
+        requests = make_session()
+        response = None
+        try:
+            while True:
+                request = requests.send(response)
+                started = time.perf_counter()
+                response = await connection.send(request)
+                recorder.record(request.name, response.status, time.perf_counter() - started)
+        except StopIteration:
+            recorder.sessions += 1
+    connection.close()
+
+
+def run_load(url, concurrency, duration, client='thread', users=1000, post_rate=0.2, beizzati_rate=0.3, seed=42):
+    """Drive `concurrency` clients for `duration` seconds; returns the report"""
+    parsed = urllib.parse.urlparse(url)
+    host, port = parsed.hostname, parsed.port or 80
+    image = proof_image()
+    recorders = [Recorder() for _ in range(concurrency)]
+
+    def session_factory(index):
+        rng = random.Random(seed + index)
+        return lambda: session(rng, users, post_rate, beizzati_rate, image)
+
+    started = time.perf_counter()
+    deadline = time.monotonic() + duration
+    if client == 'asyncio':
+        async def run_all():
+            await asyncio.gather(*(
+                async_client(host, port, deadline, recorder, session_factory(index))
+                for index, recorder in enumerate(recorders)
+            ))
+        asyncio.run(run_all())
+    else:
+        threads = [
+            threading.Thread(target=thread_client, args=(host, port, deadline, recorder, session_factory(index)))
+            for index, recorder in enumerate(recorders)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    elapsed = time.perf_counter() - started
+
+    return report(recorders, elapsed)
+
+
+def report(recorders, elapsed):
+    latencies = defaultdict(list)
+    statuses = defaultdict(lambda: defaultdict(int))
+    for recorder in recorders:
+        for name, values in recorder.latencies.items():
+            latencies[name].extend(values)
+        for name, codes in recorder.statuses.items():
+            for status, count in codes.items():
+                statuses[name][status] += count
+
+    endpoints = {}
+    total_requests = total_errors = 0
+    for name in sorted(latencies):
+        values = sorted(latencies[name])
+        # 0 is a connection failure; 304 is a successful revalidation
+        errors = sum(count for status, count in statuses[name].items() if status == 0 or status >= 400)
+        total_requests += len(values)
+        total_errors += errors
+        endpoints[name] = {
+            "requests": len(values),
+            "requests_per_second": round(len(values) / elapsed, 2),
+            "errors": errors,
+            "error_rate": round(errors / len(values), 4),
+            "p50_ms": round(1000 * percentile(values, 0.5), 2),
+            "p90_ms": round(1000 * percentile(values, 0.9), 2),
+            "p99_ms": round(1000 * percentile(values, 0.99), 2),
+            "max_ms": round(1000 * values[-1], 2),
+            "statuses": {str(status): count for status, count in sorted(statuses[name].items())}
+        }
+
+    return {
+        "seconds": round(elapsed, 2),
+        "sessions": sum(recorder.sessions for recorder in recorders),
+        "requests": total_requests,
+        "requests_per_second": round(total_requests / elapsed, 2),
+        "errors": total_errors,
+        "error_rate": round(total_errors / total_requests, 4) if total_requests else None,
+        "endpoints": endpoints
+    }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(server_cmd, port, mongo_uri, bcrypt_rounds):
+    env = dict(
+        os.environ,
+        MONGODB_URI=mongo_uri,
+        IMAGE_VERIFIER='stub',
+        BCRYPT_ROUNDS=str(bcrypt_rounds),
+        LOG_LEVEL=os.getenv('LOG_LEVEL', 'WARNING')
+    )
+    process = subprocess.Popen(shlex.split(server_cmd.format(port=port)), cwd=BACKEND_DIR, env=env)
+
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            connection.request('GET', '/api/health')
+            if connection.getresponse().status == 200:
+                return process
+        except OSError:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError("Server did not become healthy within 60 seconds")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help='Test an already running server instead of starting one')
+    parser.add_argument('--server-cmd', default=DEFAULT_SERVER_CMD,
+                        help='Command that serves the app; {port} is replaced (default: Werkzeug, threaded)')
+    parser.add_argument('--mongo-uri', default='mongodb://localhost:27017/beizzati_loadtest',
+                        help='Database for the dataset and the started server; it is overwritten')
+    parser.add_argument('--generate', dest='generate', action='store_true', default=None,
+                        help='Load the dataset into --mongo-uri (default unless --url is given)')
+    parser.add_argument('--no-generate', dest='generate', action='store_false',
+                        help='Reuse data already in the database')
+    parser.add_argument('--users', type=int, default=1000, help='Users in the dataset; sessions log in as them')
+    parser.add_argument('--client', choices=('thread', 'asyncio'), default='thread')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=30, help='Seconds to run')
+    parser.add_argument('--post-rate', type=float, default=0.2, help='Share of sessions that create a post')
+    parser.add_argument('--beizzati-rate', type=float, default=0.3, help='Share of posts with mentions that are beijjati posts')
+    parser.add_argument('--bcrypt-rounds', type=int, default=4,
+                        help='BCRYPT_ROUNDS for the started server; raise it to include production login cost')
+    parser.add_argument('--output', help='Write the JSON here as well as to stdout')
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    # An existing server's database is only written to when asked for explicitly
+    generate_data = args.generate if args.generate is not None else not args.url
+    if generate_data:
+        client = MongoClient(args.mongo_uri)
+        generate(client.get_default_database(), args.users, **dataset_options(args))
+        client.close()
+
+    server = None
+    url = args.url
+    if not url:
+        port = free_port()
+        server = start_server(args.server_cmd, port, args.mongo_uri, args.bcrypt_rounds)
+        url = f"http://127.0.0.1:{port}"
+
+    try:
+        results = run_load(url, args.concurrency, args.duration, args.client, args.users,
+                           args.post_rate, args.beizzati_rate, args.seed)
+    finally:
+        if server:
+            server.terminate()
+            server.wait(timeout=30)
+
+    results = dict({
+        "revision": git_revision(),
+        "url": url if args.url else None,
+        "server_cmd": None if args.url else args.server_cmd,
+        "client": args.client,
+        "concurrency": args.concurrency,
+        "users": args.users
+    }, **results)
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+"""Model-layer latency and round trips on synthetic data at several scales.
+
+    python bench/model_layer.py --scales 1000 10000 --output bench-results.json
+    python bench/model_layer.py --mongo-uri mongodb://localhost:27017 --baseline old.json
+
+Each scale generates a fresh dataset (see bench/dataset.py), then times
+the feed, mentions, user search, username lookup and post creation.
+Without --mongo-uri the data lives in mongomock (``pip install mongomock``),
+which is good for spotting algorithmic regressions. Round trips are counted
+through command monitoring against a real mongod, and on mongomock by
+counting calls to the collection methods that would each be a command
+(a find counts once however many batches it would take). With a mongod,
+each scale writes to `<--db-name>_<users>` and drops it afterwards; any
+database named in the URI is ignored. With
+--baseline, every operation also gets its p50/p99 ratio to the same
+operation in an earlier result file.
+"""
+import argparse
+import contextvars
+import functools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pymongo  # noqa: E402
+from bench.dataset import add_arguments, dataset_options, generate  # noqa: E402
+from models.post import Post  # noqa: E402
+from models.timeline import FEED_MODE  # noqa: E402
+from models.user import User  # noqa: E402
+from services.metrics import (  # noqa: E402
+    Metrics, MongoCommandListener, end_request_tally, start_request_tally, tally_command
+)
+
+# mongomock Collection methods that are one command against a real server
+MONGOMOCK_COMMANDS = (
+    "find", "find_one", "find_one_and_update", "find_one_and_replace", "find_one_and_delete",
+    "aggregate", "count_documents", "estimated_document_count", "distinct",
+    "insert_one", "insert_many", "update_one", "update_many", "replace_one",
+    "delete_one", "delete_many", "bulk_write"
+)
+# Set while a counted mongomock method runs, so the calls it makes internally aren't counted again
+_in_mongomock_command = contextvars.ContextVar('in_mongomock_command', default=False)
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, max(0, round(q * len(sorted_values)) - 1))]
+
+
+def _counted(method):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        if _in_mongomock_command.get():
+            return method(*args, **kwargs)
+        tally_command()
+        token = _in_mongomock_command.set(True)
+        try:
+            return method(*args, **kwargs)
+        finally:
+            _in_mongomock_command.reset(token)
+    return wrapper
+
+
+def count_mongomock_commands(mongomock):
+    """Patch mongomock's Collection so each command-like call is tallied like a pymongo command"""
+    collection = mongomock.collection.Collection
+    for name in MONGOMOCK_COMMANDS:
+        method = getattr(collection, name, None)
+        if method is not None and not hasattr(method, '__wrapped__'):
+            setattr(collection, name, _counted(method))
+
+
+def connect(mongo_uri):
+    """A client whose commands are tallied per operation"""
+    if mongo_uri:
+        return pymongo.MongoClient(mongo_uri, event_listeners=[MongoCommandListener(Metrics())])
+    import mongomock
+    count_mongomock_commands(mongomock)
+    return mongomock.MongoClient()
+
+
+def operations(db, rng):
+    """name -> callable running one randomized model call"""
+    post_model = Post(db)
+    user_model = User(db)
+    users = list(db.users.find({}, {"username": 1, "friends": 1}))
+
+    def random_user():
+        return rng.choice(users)
+
+    def feed():
+        post_model.get_posts_for_user(random_user()["_id"])
+
+    def mentions():
+        user = random_user()
+        post_model.get_mentions_for_user(user["_id"], viewer_id=user["_id"])
+
+    def search():
+        # A prefix that matches a handful of users, like @mention autocomplete
+        username = random_user()["username"]
+        user_model.search_users(username[:rng.randint(5, len(username))])
+
+    def by_username():
+        user_model.get_user_by_username(random_user()["username"])
+
+    def create():
+        author = random_user()
+        friends = author.get("friends", [])
+        mentioned = rng.sample(friends, min(len(friends), rng.randint(0, 2)))
+        post_model.create_post(str(author["_id"]), "benchmark post", bool(mentioned), [str(i) for i in mentioned])
+
+    return {
+        "Post.get_posts_for_user": feed,
+        "Post.get_mentions_for_user": mentions,
+        "User.search_users": search,
+        "User.get_user_by_username": by_username,
+        "Post.create_post": create
+    }
+
+
+def measure(operation, iterations, warmup):
+    for _ in range(warmup):
+        operation()
+
+    durations = []
+    round_trips = []
+    for _ in range(iterations):
+        tally, token = start_request_tally()
+        started = time.perf_counter()
+        try:
+            operation()
+        finally:
+            durations.append(time.perf_counter() - started)
+            end_request_tally(token)
+        round_trips.append(tally.commands)
+
+    durations.sort()
+    return {
+        "calls": iterations,
+        "mean_ms": round(1000 * sum(durations) / len(durations), 3),
+        "p50_ms": round(1000 * percentile(durations, 0.5), 3),
+        "p99_ms": round(1000 * percentile(durations, 0.99), 3),
+        "max_ms": round(1000 * durations[-1], 3),
+        "round_trips_mean": round(sum(round_trips) / len(round_trips), 2),
+        "round_trips_max": max(round_trips)
+    }
+
+
+def compare(results, baseline):
+    """Add p50/p99 ratios (current / baseline) for operations present in both"""
+    previous = {
+        (scale["users"], name): stats
+        for scale in baseline.get("scales", [])
+        for name, stats in scale["operations"].items()
+    }
+    for scale in results["scales"]:
+        for name, stats in scale["operations"].items():
+            before = previous.get((scale["users"], name))
+            if not before:
+                continue
+            for key in ("p50_ms", "p99_ms"):
+                if before.get(key):
+                    stats[f"{key[:3]}_ratio"] = round(stats[key] / before[key], 3)
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', type=int, nargs='+', default=[1000, 5000], help='User counts to benchmark')
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--mongo-uri', help='Local mongod to use instead of mongomock')
+    parser.add_argument('--db-name', default='beizzati_bench',
+                        help='Database name prefix; each scale uses and then drops <db-name>_<users>')
+    parser.add_argument('--output', help='Write the JSON here as well as to stdout')
+    parser.add_argument('--baseline', help='Earlier result file to compare against')
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    client = connect(args.mongo_uri)
+    results = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "pymongo": pymongo.version,
+        "backend": "mongod" if args.mongo_uri else "mongomock",
+        "feed_mode": FEED_MODE,
+        "dataset": dataset_options(args),
+        "iterations": args.iterations,
+        "scales": []
+    }
+
+    for users in args.scales:
+        # A new database name per scale so the process-wide caches start empty
+        db = client[f"{args.db_name}_{users}"]
+        started = time.perf_counter()
+        counts = generate(db, users, **dataset_options(args))
+        scale = {"users": users, "counts": counts, "generate_seconds": round(time.perf_counter() - started, 2)}
+
+        rng = random.Random(args.seed)
+        scale["operations"] = {
+            name: measure(operation, args.iterations, args.warmup)
+            for name, operation in operations(db, rng).items()
+        }
+        results["scales"].append(scale)
+        if args.mongo_uri:
+            client.drop_database(db.name)
+
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            compare(results, json.load(baseline))
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""bcrypt throughput, to pick BCRYPT_ROUNDS and size BCRYPT_POOL_SIZE.
+
+    python bench/passwords.py --rounds 10 11 12 --seconds 3
+
+For each cost factor, reports hashes/second on a single core and through
+the process pool at each requested size. Output is JSON.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.passwords import _hash  # noqa: E402
+
+PASSWORD = b"correct horse battery staple"
+
+
+def single_core(rounds, seconds):
+    done = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        _hash(PASSWORD, rounds)
+        done += 1
+    return done / (time.perf_counter() - started)
+
+
+def pooled(rounds, seconds, workers):
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        # Warm the workers so process start-up is not timed
+        list(pool.map(_hash, [PASSWORD] * workers, [4] * workers))
+        batch = workers * 2
+        done = 0
+        started = time.perf_counter()
+        while time.perf_counter() - started < seconds:
+            list(pool.map(_hash, [PASSWORD] * batch, [rounds] * batch))
+            done += batch
+        return done / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rounds', type=int, nargs='+', default=[10, 12])
+    parser.add_argument('--workers', type=int, nargs='+', default=[os.cpu_count() or 1])
+    parser.add_argument('--seconds', type=float, default=3.0)
+    args = parser.parse_args()
+
+    results = []
+    for rounds in args.rounds:
+        single = single_core(rounds, args.seconds)
+        result = {
+            "rounds": rounds,
+            "single_core_hashes_per_second": round(single, 2),
+            "ms_per_hash": round(1000 / single, 1),
+            "pool": []
+        }
+        for workers in args.workers:
+            throughput = pooled(rounds, args.seconds, workers)
+            result["pool"].append({
+                "workers": workers,
+                "hashes_per_second": round(throughput, 2),
+                "hashes_per_second_per_worker": round(throughput / workers, 2)
+            })
+        results.append(result)
+
+    print(json.dumps({"cpu_count": os.cpu_count(), "results": results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
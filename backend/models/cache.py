@@ -0,0 +1,119 @@
+from collections import OrderedDict
+from dotenv import load_dotenv
+import functools
+import os
+import threading
+import time
+
+load_dotenv()
+
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', '10000'))
+# Bounds how stale a user can look to other worker processes, which don't
+# see this process's invalidations
+USER_CACHE_TTL = float(os.getenv('USER_CACHE_TTL', '30'))
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire `ttl` seconds after being set"""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached value, or None on a miss"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[0] > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return item[1]
+            if item is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._data),
+                "maxsize": self.maxsize
+            }
+
+
+class UserCache:
+    """User documents (without password_hash) keyed by _id, plus a username_lower -> _id map"""
+
+    def __init__(self, maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL):
+        self.users = TTLCache(maxsize, ttl)
+        self.usernames = TTLCache(maxsize, ttl)
+
+    def get_by_id(self, user_id):
+        user = self.users.get(user_id)
+        # Callers are free to modify what they get back
+        return dict(user) if user is not None else None
+
+    def get_by_username(self, username_lower):
+        user_id = self.usernames.get(username_lower)
+        if user_id is None:
+            return None
+        return self.get_by_id(user_id)
+
+    def put(self, user):
+        self.users.set(user["_id"], dict(user))
+        if user.get("username_lower"):
+            self.usernames.set(user["username_lower"], user["_id"])
+
+    def invalidate(self, *user_ids):
+        self.users.delete(*user_ids)
+
+    def stats(self):
+        return {"users": self.users.stats(), "usernames": self.usernames.stats()}
+
+
+def per_database(factory):
+    """Make `factory(db)` return one process-wide instance per database.
+
+    Databases are keyed by client and name, so separate clients pointing
+    at the same name (as in tests) don't share state.
+    """
+    instances = {}
+    lock = threading.Lock()
+
+    @functools.wraps(factory)
+    def get(db):
+        key = (id(db.client), db.name)
+        with lock:
+            if key not in instances:
+                instances[key] = factory(db)
+            return instances[key]
+
+    return get
+
+
+@per_database
+def get_user_cache(db):
+    """Process-wide user cache for a database"""
+    return UserCache()
@@ -0,0 +1,83 @@
+from bson import ObjectId
+from datetime import datetime
+from models.pagination import DEFAULT_PAGE_SIZE, fetch_page
+from models.user_dto import USER_CARD_PROJECTION, UserCard
+from models.versions import Versions
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Newest comments embedded on the post for feed display
+COMMENT_PREVIEW_SIZE = 3
+COMMENT_MAX_LENGTH = 1000
+
+
+class Comment:
+    """Comments live in their own collection; the post only keeps
+    `comment_count` and the latest few as `comment_preview`."""
+
+    def __init__(self, db):
+        self.collection = db.comments
+        self.posts_collection = db.posts
+        self.users_collection = db.users
+        self.versions = Versions(db)
+
+    def get_visible_post(self, post_id, user_id):
+        """The post if it exists and the user can see it (author or in visible_to), else None"""
+        try:
+            post_object_id = ObjectId(post_id)
+            user_object_id = ObjectId(user_id)
+        except:
+            return None
+        return self.posts_collection.find_one(
+            {
+                "_id": post_object_id,
+                "$or": [{"author_id": user_object_id}, {"visible_to": user_object_id}]
+            },
+            {"author_id": 1}
+        )
+
+    def add_comment(self, post, author_id, content):
+        """Store a comment on a post returned by get_visible_post; returns the comment or None"""
+        try:
+            comment = {
+                "post_id": post["_id"],
+                "author_id": ObjectId(author_id),
+                "content": content,
+                "created_at": datetime.utcnow()
+            }
+            comment["_id"] = self.collection.insert_one(comment).inserted_id
+
+            # Count and preview in one write; $slice keeps only the newest entries
+            self.posts_collection.update_one(
+                {"_id": post["_id"]},
+                {
+                    "$inc": {"comment_count": 1},
+                    "$push": {"comment_preview": {"$each": [comment], "$slice": -COMMENT_PREVIEW_SIZE}}
+                }
+            )
+            self.versions.bump_posts(post["author_id"])
+            return comment
+        except Exception as e:
+            logger.error("Error in add_comment: %s", e)
+            return None
+
+    def hydrate(self, comments):
+        """Attach an `author` user card to each comment with one `$in` query"""
+        author_ids = list({comment["author_id"] for comment in comments})
+        authors = {}
+        if author_ids:
+            for user in self.users_collection.find({"_id": {"$in": author_ids}}, USER_CARD_PROJECTION):
+                authors[user["_id"]] = UserCard.from_document(user)
+        for comment in comments:
+            comment["author"] = authors.get(comment["author_id"])
+        return comments
+
+    def get_comments(self, post, limit=DEFAULT_PAGE_SIZE, before=None):
+        """Get a page of a post's comments, newest first; returns (comments, next_cursor)"""
+        try:
+            comments, next_cursor = fetch_page(self.collection, {"post_id": post["_id"]}, limit, before)
+            return self.hydrate(comments), next_cursor
+        except Exception as e:
+            logger.error("Error in get_comments: %s", e)
+            return [], None
@@ -0,0 +1,177 @@
+from array import array
+from collections import Counter
+from dotenv import load_dotenv
+from models.cache import per_database
+import bisect
+import os
+import threading
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+load_dotenv()
+
+# Seconds between full reloads, which pick up friendships made by other processes
+FRIEND_GRAPH_REFRESH_INTERVAL = float(os.getenv('FRIEND_GRAPH_REFRESH_INTERVAL', '300'))
+
+
+def _intersect(a, b):
+    """Sorted intersection of two sorted array('I') adjacency lists"""
+    if not a or not b:
+        return []
+    if np is not None:
+        return np.intersect1d(
+            np.frombuffer(a, dtype=np.uint32), np.frombuffer(b, dtype=np.uint32), assume_unique=True
+        ).tolist()
+    if len(a) > len(b):
+        a, b = b, a
+    members = set(b)
+    return [node for node in a if node in members]
+
+
+class FriendGraph:
+    """In-process copy of the friendship graph.
+
+    Each user id gets a dense integer; friends are kept per user as a sorted
+    ``array('I')`` of those integers, which NumPy reads without copying. The
+    graph is loaded from the `friends` arrays and kept current by the
+    friend-request methods of the User model. Reloads are built outside the
+    lock and swapped in, so reads keep using the previous copy meanwhile.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()  # held by the one thread rebuilding
+        self._pending = None  # friendships added while a rebuild runs, replayed onto it
+        self._node_of = {}  # ObjectId -> int
+        self._ids = []  # int -> ObjectId
+        self._adjacency = []  # int -> sorted array('I')
+        self._loaded_at = None
+
+    @staticmethod
+    def _node(graph, user_id):
+        node_of, ids, adjacency = graph
+        node = node_of.get(user_id)
+        if node is None:
+            node = len(ids)
+            node_of[user_id] = node
+            ids.append(user_id)
+            adjacency.append(array('I'))
+        return node
+
+    @staticmethod
+    def _link(adjacency, node, other):
+        neighbours = adjacency[node]
+        position = bisect.bisect_left(neighbours, other)
+        if position == len(neighbours) or neighbours[position] != other:
+            # Replace rather than insert in place so NumPy views of the old array stay valid
+            adjacency[node] = neighbours[:position] + array('I', [other]) + neighbours[position:]
+
+    def _add(self, graph, user_id, friend_ids):
+        node = self._node(graph, user_id)
+        for friend_id in friend_ids:
+            other = self._node(graph, friend_id)
+            self._link(graph[2], node, other)
+            self._link(graph[2], other, node)
+
+    def _reload(self):
+        with self._lock:
+            self._pending = []
+        try:
+            graph = ({}, [], [])
+            for user in self.collection.find({}, {"friends": 1}):
+                node = self._node(graph, user["_id"])
+                graph[2][node] = array('I', sorted({self._node(graph, friend_id) for friend_id in user.get("friends", [])}))
+        except Exception:
+            with self._lock:
+                self._pending = None
+            raise
+
+        with self._lock:
+            for user_id, friend_ids in self._pending:
+                self._add(graph, user_id, friend_ids)
+            self._node_of, self._ids, self._adjacency = graph
+            self._pending = None
+            self._loaded_at = time.monotonic()
+
+    def _sync(self):
+        """Load the graph on first use, then rebuild it once it is older than the refresh interval.
+
+        Only the first load makes callers wait; later rebuilds are done by
+        whichever caller gets the reload lock while the rest read the old copy.
+        """
+        if self._loaded_at is None:
+            with self._reload_lock:
+                if self._loaded_at is None:
+                    self._reload()
+            return
+        if time.monotonic() - self._loaded_at < FRIEND_GRAPH_REFRESH_INTERVAL:
+            return
+        if self._reload_lock.acquire(blocking=False):
+            try:
+                self._reload()
+            finally:
+                self._reload_lock.release()
+
+    def add_friendships(self, user_id, friend_ids):
+        """Record `user_id` as friends with each of `friend_ids` (both directions)"""
+        friend_ids = list(friend_ids)
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((user_id, friend_ids))
+            if self._loaded_at is not None:
+                self._add((self._node_of, self._ids, self._adjacency), user_id, friend_ids)
+
+    def mutual_friends(self, user_id, other_id):
+        """Ids of the friends two users have in common"""
+        self._sync()
+        with self._lock:
+            node, other = self._node_of.get(user_id), self._node_of.get(other_id)
+            if node is None or other is None:
+                return []
+            common = _intersect(self._adjacency[node], self._adjacency[other])
+            return [self._ids[member] for member in common]
+
+    def suggestions(self, user_id, limit=10, exclude=()):
+        """Friends of friends as (id, mutual_count), most mutual friends first"""
+        self._sync()
+        with self._lock:
+            node = self._node_of.get(user_id)
+            if node is None:
+                return []
+            friends = self._adjacency[node]
+            if not friends:
+                return []
+
+            excluded = set(friends)
+            excluded.add(node)
+            excluded.update(self._node_of[i] for i in exclude if i in self._node_of)
+
+            if np is not None:
+                reachable = np.concatenate([np.frombuffer(self._adjacency[f], dtype=np.uint32) for f in friends])
+                counts = np.bincount(reachable, minlength=len(self._ids))
+                if excluded:
+                    counts[np.fromiter(excluded, dtype=np.int64)] = 0
+                candidates = np.flatnonzero(counts)
+                # Most mutual friends first; ties in node order
+                order = np.lexsort((candidates, -counts[candidates]))[:limit]
+                ranked = [(int(candidates[i]), int(counts[candidates[i]])) for i in order]
+            else:
+                counts = Counter()
+                for friend in friends:
+                    counts.update(self._adjacency[friend])
+                for candidate in excluded:
+                    counts.pop(candidate, None)
+                ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+            return [(self._ids[candidate], count) for candidate, count in ranked]
+
+
+@per_database
+def get_friend_graph(db):
+    """Process-wide friend graph for a database"""
+    return FriendGraph(db.users)
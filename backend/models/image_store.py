@@ -0,0 +1,63 @@
+from bson import ObjectId
+import gridfs
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ImageStore:
+    """Post images in GridFS (`images.files` / `images.chunks`).
+
+    Each upload is stored twice: the original bytes and a JPEG thumbnail.
+    The post document only carries their ids and the image dimensions.
+    """
+
+    def __init__(self, db):
+        self.fs = gridfs.GridFS(db, collection='images')
+
+    def save(self, processed, owner_id):
+        """Store a ProcessedImage; returns the reference to embed in the post"""
+        file_id = self.fs.put(
+            processed.original,
+            content_type=processed.content_type,
+            owner_id=owner_id,
+            variant='original'
+        )
+        try:
+            thumbnail_id = self.fs.put(
+                processed.thumbnail,
+                content_type='image/jpeg',
+                owner_id=owner_id,
+                variant='thumbnail',
+                original_id=file_id
+            )
+        except Exception:
+            self.fs.delete(file_id)
+            raise
+        return {
+            "file_id": file_id,
+            "thumbnail_id": thumbnail_id,
+            "content_type": processed.content_type,
+            "width": processed.width,
+            "height": processed.height
+        }
+
+    def delete(self, image):
+        """Remove both files of a reference returned by save"""
+        for key in ("file_id", "thumbnail_id"):
+            try:
+                self.fs.delete(image[key])
+            except Exception as e:
+                logger.warning("Error deleting image file %s: %s", image[key], e)
+
+    @staticmethod
+    def original_id(grid_out):
+        """Id of the original upload a stored file belongs to (itself for originals)"""
+        return getattr(grid_out, 'original_id', None) or grid_out._id
+
+    def open(self, file_id):
+        """GridOut for the file, or None if the id is invalid or unknown"""
+        try:
+            return self.fs.get(ObjectId(file_id))
+        except Exception:
+            return None
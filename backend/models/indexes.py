@@ -0,0 +1,135 @@
+from bson import ObjectId
+from datetime import datetime
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from models.leaderboard import RANK_SORT
+from models.pagination import keyset_query
+from models.verification_cache import VERDICT_CACHE_TTL
+
+# Every index the models rely on, keyed by collection name
+INDEXES = {
+    'users': [
+        IndexModel([("username", ASCENDING)], name="username_unique", unique=True),
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        # Sparse so users not yet backfilled by `flask backfill-usernames` don't collide on null
+        IndexModel([("username_lower", ASCENDING)], name="username_lower_unique", unique=True, sparse=True),
+        # Leaderboard order and rank-by-range-count
+        IndexModel([("beijjati_count", DESCENDING), ("_id", ASCENDING)], name="beijjati_count_rank"),
+    ],
+    'posts': [
+        IndexModel(
+            [("visible_to", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+            name="visible_to_created_at"
+        ),
+        IndexModel(
+            [("author_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+            name="author_created_at"
+        ),
+        IndexModel(
+            [("mentioned_users", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+            name="mentioned_users_created_at"
+        ),
+        # Only posts that skipped timeline fan-out
+        IndexModel(
+            [("visible_to", ASCENDING), ("fanned_out", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+            name="unfanned_visible_to_created_at",
+            partialFilterExpression={"fanned_out": False}
+        ),
+        # Sweep for pending verifications lost to a worker restart
+        IndexModel(
+            [("verification_started_at", ASCENDING)],
+            name="pending_verification_started_at",
+            partialFilterExpression={"verification_status": "pending_verification"}
+        ),
+        # Image access checks; most posts have no image
+        IndexModel([("image.file_id", ASCENDING)], name="image_file_id", sparse=True),
+    ],
+    'likes': [
+        IndexModel([("post_id", ASCENDING), ("user_id", ASCENDING)], name="post_user_unique", unique=True),
+    ],
+    'comments': [
+        IndexModel(
+            [("post_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+            name="post_created_at"
+        ),
+    ],
+    'timelines': [
+        IndexModel(
+            [("owner_id", ASCENDING), ("created_at", DESCENDING), ("post_id", DESCENDING)],
+            name="owner_created_at"
+        ),
+        IndexModel(
+            [("owner_id", ASCENDING), ("post_id", ASCENDING)],
+            name="owner_post_unique", unique=True
+        ),
+    ],
+    'image_verdicts': [
+        IndexModel([("created_at", ASCENDING)], name="created_at_ttl", expireAfterSeconds=VERDICT_CACHE_TTL),
+        IndexModel([("phash", ASCENDING)], name="phash"),
+    ],
+}
+
+
+def _sample_queries():
+    """Representative (name, collection, filter, sort) shapes of the model queries"""
+    some_id = ObjectId()
+    some_time = datetime.utcnow()
+    newest_first = [("created_at", DESCENDING), ("_id", DESCENDING)]
+    before = (some_time, some_id)
+
+    return [
+        ("feed", 'posts',
+         {"$or": [{"author_id": some_id}, {"visible_to": some_id}]}, newest_first),
+        ("feed next page", 'posts',
+         keyset_query({"$or": [{"author_id": some_id}, {"visible_to": some_id}]}, before), newest_first),
+        ("posts by user", 'posts', {"author_id": some_id}, newest_first),
+        ("mentions", 'posts', {"mentioned_users": some_id}, newest_first),
+        ("post by image", 'posts', {"image.file_id": some_id}, None),
+        ("stale pending verification", 'posts',
+         {"verification_status": "pending_verification", "verification_started_at": {"$lt": some_time}}, None),
+        ("unfanned posts", 'posts', {"visible_to": some_id, "fanned_out": False}, newest_first),
+        ("timeline", 'timelines', {"owner_id": some_id},
+         [("created_at", DESCENDING), ("post_id", DESCENDING)]),
+        ("timeline next page", 'timelines', keyset_query({"owner_id": some_id}, before, "post_id"),
+         [("created_at", DESCENDING), ("post_id", DESCENDING)]),
+        ("user by username", 'users', {"username": "someone"}, None),
+        ("user by normalized username", 'users', {"username_lower": "someone"}, None),
+        ("user by email", 'users', {"email": "someone@example.com"}, None),
+        ("users by id", 'users', {"_id": {"$in": [some_id, ObjectId()]}}, None),
+        ("leaderboard", 'users', {}, RANK_SORT),
+        ("rank by count", 'users', {"beijjati_count": {"$gt": 3}}, None),
+        ("comments on a post", 'comments', {"post_id": some_id}, newest_first),
+        ("comments next page", 'comments', keyset_query({"post_id": some_id}, before), newest_first),
+        ("viewer likes on a page", 'likes', {"post_id": {"$in": [some_id, ObjectId()]}, "user_id": some_id}, None),
+        ("verdict by perceptual hash", 'image_verdicts', {"phash": "0123456789abcdef"}, None),
+    ]
+
+
+def ensure_indexes(db):
+    """Create every registered index; existing ones are left untouched"""
+    for collection_name, indexes in INDEXES.items():
+        db[collection_name].create_indexes(indexes)
+
+
+def _has_collscan(plan):
+    if isinstance(plan, dict):
+        if plan.get('stage') == 'COLLSCAN':
+            return True
+        return any(_has_collscan(value) for value in plan.values())
+    if isinstance(plan, list):
+        return any(_has_collscan(item) for item in plan)
+    return False
+
+
+def verify_indexes(db):
+    """Explain each model query and raise RuntimeError if any of them scans a collection"""
+    failures = []
+    for name, collection_name, query, sort in _sample_queries():
+        cursor = db[collection_name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        winning_plan = cursor.explain()['queryPlanner']['winningPlan']
+        if _has_collscan(winning_plan):
+            failures.append(f"{name} ({collection_name})")
+
+    if failures:
+        raise RuntimeError(f"Queries without index support: {', '.join(failures)}")
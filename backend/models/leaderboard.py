@@ -0,0 +1,156 @@
+from dotenv import load_dotenv
+from models.cache import per_database
+from models.user_dto import USER_CARD_PROJECTION, UserCard
+from pymongo import ASCENDING, DESCENDING
+import os
+import threading
+import time
+
+load_dotenv()
+
+# Users kept ranked in memory
+LEADERBOARD_SIZE = int(os.getenv('LEADERBOARD_SIZE', '100'))
+# Seconds between full reloads, which pick up increments made by other processes
+LEADERBOARD_REFRESH_INTERVAL = float(os.getenv('LEADERBOARD_REFRESH_INTERVAL', '60'))
+
+# Matches the users.beijjati_count_rank index
+RANK_SORT = [("beijjati_count", DESCENDING), ("_id", ASCENDING)]
+
+
+def _sort_key(entry):
+    return (-entry["beijjati_count"], entry["_id"])
+
+
+def _ranked(entries, limit):
+    """Competition ranking (1, 2, 2, 4): equal counts share a rank"""
+    ranked = []
+    for position, entry in enumerate(entries[:limit]):
+        if position and entry["beijjati_count"] == entries[position - 1]["beijjati_count"]:
+            rank = ranked[-1]["rank"]
+        else:
+            rank = position + 1
+        ranked.append({"rank": rank, "user": UserCard.from_document(entry)})
+    return ranked
+
+
+class Leaderboard:
+    """Top-K users by beijjati_count, kept in memory.
+
+    Loaded with one indexed query, then updated in place by `increment`
+    whenever counts change, so reading the board costs O(K). Ranks outside
+    the top K are a range count on the beijjati_count index, remembered
+    per count until the next reload.
+    """
+
+    def __init__(self, collection, size=LEADERBOARD_SIZE):
+        self.collection = collection
+        self.size = size
+        self._lock = threading.Lock()
+        self._top = []  # user card documents, sorted by _sort_key
+        self._outside_ranks = {}  # beijjati_count -> rank, for counts below the board
+        self._loaded_at = None
+
+    def _sync(self):
+        now = time.monotonic()
+        if self._loaded_at is not None and now - self._loaded_at < LEADERBOARD_REFRESH_INTERVAL:
+            return
+        self._top = list(
+            self.collection.find({}, USER_CARD_PROJECTION).sort(RANK_SORT).limit(self.size)
+        )
+        for entry in self._top:
+            entry["beijjati_count"] = entry.get("beijjati_count") or 0
+        self._outside_ranks = {}
+        self._loaded_at = now
+
+    def _is_complete(self):
+        """Fewer than K users exist, so every user is on the board"""
+        return len(self._top) < self.size
+
+    def _place(self, entry):
+        self._top = [existing for existing in self._top if existing["_id"] != entry["_id"]]
+        threshold = self._top[-1] if self._top else None
+        if self._is_complete() or threshold is None or _sort_key(entry) < _sort_key(threshold):
+            self._top.append(entry)
+            self._top.sort(key=_sort_key)
+            del self._top[self.size:]
+
+    def add(self, user):
+        """Place a newly created user (count 0) if the board has room"""
+        with self._lock:
+            if self._loaded_at is not None and self._is_complete():
+                entry = {field: user.get(field) for field in USER_CARD_PROJECTION}
+                entry["_id"] = user["_id"]
+                entry["beijjati_count"] = user.get("beijjati_count") or 0
+                self._top.append(entry)
+                self._top.sort(key=_sort_key)
+
+    def update(self, user_id, fields):
+        """Apply changed display fields (e.g. profile_picture) to a ranked user"""
+        with self._lock:
+            for entry in self._top:
+                if entry["_id"] == user_id:
+                    entry.update({key: value for key, value in fields.items()
+                                  if key in USER_CARD_PROJECTION and key != "beijjati_count"})
+
+    def increment(self, user_ids):
+        """Pick up beijjati_count increments that were just written to Mongo.
+
+        The users' counts are re-read in one projected query and set, not
+        added, so a reload that already saw the write can't count it twice.
+        Counts only grow, so the larger of the cached and read value wins.
+        """
+        user_ids = list(user_ids)
+        if not user_ids or self._loaded_at is None:
+            return
+        users = list(self.collection.find({"_id": {"$in": user_ids}}, USER_CARD_PROJECTION))
+        with self._lock:
+            ranked = {entry["_id"]: entry for entry in self._top}
+            for user in users:
+                count = user.get("beijjati_count") or 0
+                if user["_id"] in ranked:
+                    entry = ranked[user["_id"]]
+                    entry["beijjati_count"] = max(entry["beijjati_count"], count)
+                else:
+                    user["beijjati_count"] = count
+                    self._place(user)
+            self._top.sort(key=_sort_key)
+            self._outside_ranks = {}
+
+    def top(self, limit=None):
+        """[{rank, user}] for the top `limit` users (at most K)"""
+        with self._lock:
+            self._sync()
+            return _ranked(self._top, min(limit or self.size, self.size))
+
+    def rank_of(self, user):
+        """Global rank of a user document that carries `_id` and `beijjati_count`"""
+        count = user.get("beijjati_count") or 0
+        with self._lock:
+            self._sync()
+            for position, entry in enumerate(self._top):
+                if entry["beijjati_count"] == count:
+                    return position + 1
+            if self._is_complete() or (self._top and count > self._top[-1]["beijjati_count"]):
+                return len([entry for entry in self._top if entry["beijjati_count"] > count]) + 1
+            if count in self._outside_ranks:
+                return self._outside_ranks[count]
+        # Outside the cached top K: one range count on the index, then remembered
+        rank = self.collection.count_documents({"beijjati_count": {"$gt": count}}) + 1
+        with self._lock:
+            self._outside_ranks[count] = rank
+        return rank
+
+    def friends(self, user, limit=None):
+        """[{rank, user}] among a user and their friends"""
+        member_ids = [user["_id"]] + list(user.get("friends", []))
+        members = list(self.collection.find({"_id": {"$in": member_ids}}, USER_CARD_PROJECTION))
+        for member in members:
+            member["beijjati_count"] = member.get("beijjati_count") or 0
+        members.sort(key=_sort_key)
+        return _ranked(members, limit or len(members))
+
+
+@per_database
+def get_leaderboard(db):
+    """Process-wide leaderboard for a database"""
+    return Leaderboard(db.users)
@@ -0,0 +1,77 @@
+from bson import ObjectId
+from datetime import datetime, timedelta
+import base64
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def clamp_page_size(limit):
+    """Clamp a requested page size to [1, MAX_PAGE_SIZE]"""
+    if limit is None:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(int(limit), MAX_PAGE_SIZE))
+
+
+def encode_cursor(created_at, object_id):
+    """Build an opaque cursor from a (created_at, _id) pair"""
+    millis = (created_at - EPOCH) // timedelta(milliseconds=1)
+    raw = f"{millis}:{object_id}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Turn an opaque cursor back into a (created_at, _id) pair.
+
+    Raises ValueError if the cursor is malformed.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        millis, object_id = base64.urlsafe_b64decode(padded).decode('utf-8').split(':')
+        return EPOCH + timedelta(milliseconds=int(millis)), ObjectId(object_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+
+def keyset_query(query, before=None, id_field="_id"):
+    """Restrict a query to documents strictly older than the `before` key.
+
+    The bound is written as a created_at range plus a $nor on the tie-breaker
+    and pushed into each branch of a top-level $or, so every branch keeps
+    tight bounds on its (field, created_at) index.
+    """
+    if before is None:
+        return query
+    created_at, object_id = before
+    older = {
+        "created_at": {"$lte": created_at},
+        "$nor": [{"created_at": created_at, id_field: {"$gte": object_id}}]
+    }
+    if set(query) == {"$or"}:
+        return {"$or": [dict(branch, **older) for branch in query["$or"]]}
+    return dict(query, **older)
+
+
+def fetch_page(collection, query, limit=DEFAULT_PAGE_SIZE, before=None, projection=None, id_field="_id"):
+    """Fetch one newest-first page of documents.
+
+    `id_field` is the tie-breaker for equal created_at values; it defaults to
+    the document _id. Returns (documents, next_cursor); next_cursor is None on
+    the last page.
+    """
+    limit = clamp_page_size(limit)
+    documents = list(
+        collection.find(keyset_query(query, before, id_field), projection)
+        .sort([("created_at", -1), (id_field, -1)])
+        .limit(limit + 1)
+    )
+
+    next_cursor = None
+    if len(documents) > limit:
+        documents = documents[:limit]
+        last = documents[-1]
+        next_cursor = encode_cursor(last["created_at"], last[id_field])
+
+    return documents, next_cursor
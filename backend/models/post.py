@@ -1,12 +1,43 @@
 from bson import ObjectId
 from datetime import datetime
+from models.pagination import DEFAULT_PAGE_SIZE, fetch_page
+from models.cache import get_user_cache
+from models.leaderboard import get_leaderboard
+from models.timeline import Timeline
+from models.transactions import run_in_transaction
+from models.user_dto import USER_CARD_PROJECTION, UserCard
+from models.versions import Versions
+from pymongo import InsertOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Lifecycle of a beijjati post's image verification
+VERIFICATION_PENDING = 'pending_verification'
+VERIFICATION_VERIFIED = 'verified'
+VERIFICATION_REJECTED = 'rejected'
+
+# Fields never sent with a post: legacy embedded like arrays (until migrated)
+# and the unused embedded `comments` array; see models/comment.py
+POST_PROJECTION = {"likes": 0, "comments": 0}
+
+def post_audience(post):
+    """Everyone who sees a post in their feed: the author and their friends at posting time"""
+    return [post["author_id"]] + post.get("visible_to", [])
 
 class Post:
     def __init__(self, db):
+        self.db = db
         self.collection = db.posts
+        self.likes_collection = db.likes
         self.users_collection = db.users
+        self.timeline = Timeline(db)
+        self.user_cache = get_user_cache(db)
+        self.leaderboard = get_leaderboard(db)
+        self.versions = Versions(db)
     
-    def create_post(self, author_id, content, is_beizzati=False, mentioned_users=None):
+    def create_post(self, author_id, content, is_beizzati=False, mentioned_users=None, image=None):
         if mentioned_users is None:
             mentioned_users = []
         
@@ -21,164 +52,396 @@ class Post:
         if not author:
             return None
         
-        # Convert mentioned user IDs to ObjectIds and validate them
+        # Mentions arrive already resolved (User.get_users_by_usernames); only
+        # malformed ids and duplicates are dropped here
         mentioned_object_ids = []
         for mentioned_user_id in mentioned_users:
             try:
                 mentioned_object_id = ObjectId(mentioned_user_id)
-                # Verify the user exists
-                if self.users_collection.find_one({"_id": mentioned_object_id}):
-                    mentioned_object_ids.append(mentioned_object_id)
             except:
                 continue  # Skip invalid IDs
+            if mentioned_object_id not in mentioned_object_ids:
+                mentioned_object_ids.append(mentioned_object_id)
         
-        # If it's a beijjati post, increment mentioned users' beijjati count
-        if is_beizzati and mentioned_object_ids:
-            for mentioned_object_id in mentioned_object_ids:
-                self.users_collection.update_one(
-                    {"_id": mentioned_object_id},
-                    {"$inc": {"beijjati_count": 1}}
-                )
-        
+        friend_ids = author.get('friends', [])
         post_data = {
             "author_id": author_object_id,
             "content": content,
-            "is_beizzati": is_beizzati,
+            # Beijjati posts count only once their image is verified; see complete_verification
+            "is_beizzati": False,
             "mentioned_users": mentioned_object_ids,
-            "visible_to": author.get('friends', []),
-            "likes": [],
-            "comments": [],
+            "visible_to": friend_ids,
+            "like_count": 0,
+            "comment_count": 0,
+            "comment_preview": [],
             "created_at": datetime.utcnow()
         }
         
+        if is_beizzati:
+            post_data["verification_status"] = VERIFICATION_PENDING
+            post_data["verification_started_at"] = post_data["created_at"]
+        
+        # Reference returned by ImageStore.save
+        if image:
+            post_data["image"] = image
+        
+        # In timeline mode, posts from authors with huge friend lists are
+        # only written to the author's timeline and merged in at read time
+        fan_out = False
+        if self.timeline.is_enabled():
+            fan_out = self.timeline.should_fan_out(len(friend_ids))
+            post_data["fanned_out"] = fan_out
+        
         result = self.collection.insert_one(post_data)
+        
+        if self.timeline.is_enabled():
+            recipients = [author_object_id] + (friend_ids if fan_out else [])
+            self.timeline.fan_out(result.inserted_id, post_data["created_at"], recipients)
+        
+        self.versions.bump_posts(author_object_id)
         return str(result.inserted_id)
     
-    def get_posts_for_user(self, user_id):
-        """Get posts visible to a user (from friends and their own posts)"""
+    def complete_verification(self, post_id, verified):
+        """Record the verdict for a pending beijjati post.
+        
+        A verified post increments its mentioned users' beijjati count; a
+        rejected one stays up as a regular post. Only the first verdict for a
+        post is applied, so retried jobs cannot double count. The status change
+        and the single ``update_many`` of the counts share a transaction when
+        MONGO_TRANSACTIONS is on.
+        """
+        def apply(session):
+            post = self.collection.find_one_and_update(
+                {"_id": ObjectId(post_id), "verification_status": VERIFICATION_PENDING},
+                {"$set": {
+                    "verification_status": VERIFICATION_VERIFIED if verified else VERIFICATION_REJECTED,
+                    "is_beizzati": bool(verified)
+                }},
+                projection={"author_id": 1, "mentioned_users": 1},
+                return_document=ReturnDocument.AFTER,
+                session=session
+            )
+            if post and verified and post.get("mentioned_users"):
+                self.users_collection.update_many(
+                    {"_id": {"$in": post["mentioned_users"]}},
+                    {"$inc": {"beijjati_count": 1}},
+                    session=session
+                )
+            return post
+        
+        post = run_in_transaction(self.db, apply)
+        if not post:
+            return False
+        self.versions.bump_posts(post["author_id"])
+        if not verified:
+            return True
+        
+        mentioned_object_ids = post.get("mentioned_users", [])
+        self.user_cache.invalidate(*mentioned_object_ids)
+        self.leaderboard.increment(mentioned_object_ids)
+        self.versions.bump_cards(mentioned_object_ids)
+        return True
+    
+    def claim_stale_verification(self, stale_before):
+        """Claim one pending post whose verification started before `stale_before`.
+        
+        The start time is reset in the same update, so concurrent workers
+        never claim the same post. Returns the post's _id and image, or None.
+        """
+        try:
+            return self.collection.find_one_and_update(
+                {
+                    "verification_status": VERIFICATION_PENDING,
+                    # Also matches posts created before the field existed
+                    "verification_started_at": {"$not": {"$gte": stale_before}}
+                },
+                {"$set": {"verification_started_at": datetime.utcnow()}},
+                projection={"image": 1}
+            )
+        except Exception as e:
+            logger.error("Error in claim_stale_verification: %s", e)
+            return None
+    
+    def _hydrate_posts(self, posts, viewer_id=None):
+        """Attach author and mentioned user details to a list of posts.
+
+        Every author and mentioned user across the whole result set is fetched
+        in a single projected ``$in`` query instead of one lookup per post.
+        The viewer's likes for the page are likewise looked up in one query
+        and reported as `liked_by_me`.
+        """
+        user_ids = set()
+        for post in posts:
+            user_ids.add(post["author_id"])
+            user_ids.update(post.get("mentioned_users", []))
+            user_ids.update(comment["author_id"] for comment in post.get("comment_preview", []))
+        
+        users_by_id = {}
+        if user_ids:
+            for user in self.users_collection.find(
+                {"_id": {"$in": list(user_ids)}},
+                USER_CARD_PROJECTION
+            ):
+                users_by_id[user["_id"]] = UserCard.from_document(user)
+        
+        liked_post_ids = set()
+        if viewer_id is not None and posts:
+            liked_post_ids = {
+                like["post_id"]
+                for like in self.likes_collection.find(
+                    {"post_id": {"$in": [post["_id"] for post in posts]}, "user_id": ObjectId(viewer_id)},
+                    {"post_id": 1, "_id": 0}
+                )
+            }
+        
+        for post in posts:
+            post.setdefault("like_count", 0)
+            post.setdefault("comment_count", 0)
+            # Commenters need not be the viewer's friends, so their card
+            # changes don't reach the feed ETag; previews carry only the
+            # fields that never change, like mentions below
+            for comment in post.setdefault("comment_preview", []):
+                commenter = users_by_id.get(comment["author_id"])
+                comment["author"] = {"_id": commenter._id, "username": commenter.username} if commenter else None
+            post["liked_by_me"] = post["_id"] in liked_post_ids
+            post["author"] = users_by_id.get(post["author_id"])
+            
+            mentioned_users = []
+            for mentioned_id in post.get("mentioned_users", []):
+                mentioned_user = users_by_id.get(mentioned_id)
+                if mentioned_user:
+                    mentioned_users.append({
+                        "_id": mentioned_user._id,
+                        "username": mentioned_user.username
+                    })
+            post["mentioned_users_details"] = mentioned_users
+        
+        return posts
+    
+    def get_post(self, post_id, viewer_id=None):
+        """A single hydrated post, or None"""
+        try:
+            post = self.collection.find_one({"_id": ObjectId(post_id)}, POST_PROJECTION)
+            return self._hydrate_posts([post], viewer_id)[0] if post else None
+        except Exception as e:
+            logger.error("Error in get_post: %s", e)
+            return None
+    
+    def get_post_summary(self, post_id):
+        """Author, audience and counters of a post without hydration, or None"""
+        try:
+            return self.collection.find_one({"_id": ObjectId(post_id)}, {
+                "author_id": 1, "visible_to": 1, "mentioned_users": 1, "like_count": 1,
+                "comment_count": 1, "verification_status": 1, "is_beizzati": 1
+            })
+        except Exception as e:
+            logger.error("Error in get_post_summary: %s", e)
+            return None
+    
+    def can_view_image(self, file_id, viewer_id):
+        """Whether the viewer is the author or in the audience of the post with this original image"""
+        try:
+            viewer_object_id = ObjectId(viewer_id)
+            return self.collection.find_one(
+                {
+                    "image.file_id": ObjectId(file_id),
+                    "$or": [{"author_id": viewer_object_id}, {"visible_to": viewer_object_id}]
+                },
+                {"_id": 1}
+            ) is not None
+        except Exception as e:
+            logger.error("Error in can_view_image: %s", e)
+            return False
+    
+    def get_posts_for_user(self, user_id, limit=DEFAULT_PAGE_SIZE, before=None):
+        """Get a page of posts visible to a user (from friends and their own posts).
+
+        `before` is a decoded (created_at, _id) cursor; returns (posts, next_cursor).
+        """
         try:
             user_object_id = ObjectId(user_id)
-            user = self.users_collection.find_one({"_id": user_object_id})
+            user = self.users_collection.find_one({"_id": user_object_id}, {"_id": 1})
             if not user:
-                return []
+                return [], None
+            
+            if self.timeline.is_enabled():
+                return self._get_timeline_page(user_object_id, limit, before)
             
             # Posts visible to user: their own posts + posts from friends
-            visible_posts = list(self.collection.find({
+            visible_posts, next_cursor = fetch_page(self.collection, {
                 "$or": [
                     {"author_id": user_object_id},  # User's own posts
                     {"visible_to": user_object_id}  # Posts user is in visible_to list
                 ]
-            }).sort("created_at", -1))
-            
-            # Populate author information
-            for post in visible_posts:
-                author = self.users_collection.find_one(
-                    {"_id": post["author_id"]},
-                    {"password_hash": 0}
-                )
-                post["author"] = author
-                
-                # Populate mentioned users
-                mentioned_users = []
-                for mentioned_id in post.get("mentioned_users", []):
-                    mentioned_user = self.users_collection.find_one(
-                        {"_id": mentioned_id},
-                        {"username": 1, "_id": 1}
-                    )
-                    if mentioned_user:
-                        mentioned_users.append(mentioned_user)
-                post["mentioned_users_details"] = mentioned_users
+            }, limit, before, POST_PROJECTION)
             
-            return visible_posts
+            return self._hydrate_posts(visible_posts, user_object_id), next_cursor
         except Exception as e:
-            print(f"Error in get_posts_for_user: {e}")
-            return []
+            logger.error("Error in get_posts_for_user: %s", e)
+            return [], None
     
-    def get_posts_by_user(self, user_id):
-        """Get all posts by a specific user"""
+    def _get_timeline_page(self, user_object_id, limit, before):
+        """Read a feed page from the materialized timeline"""
+        keys, next_cursor = self.timeline.get_page(user_object_id, limit, before)
+        post_ids = [post_id for _, post_id in keys]
+        if not post_ids:
+            return [], next_cursor
+        
+        posts_by_id = {
+            post["_id"]: post
+            for post in self.collection.find({"_id": {"$in": post_ids}}, POST_PROJECTION)
+        }
+        posts = [posts_by_id[post_id] for post_id in post_ids if post_id in posts_by_id]
+        
+        return self._hydrate_posts(posts, user_object_id), next_cursor
+    
+    def get_posts_by_user(self, user_id, limit=DEFAULT_PAGE_SIZE, before=None, viewer_id=None):
+        """Get a page of posts by a specific user"""
         try:
             user_object_id = ObjectId(user_id)
-            posts = list(self.collection.find({
+            posts, next_cursor = fetch_page(self.collection, {
                 "author_id": user_object_id
-            }).sort("created_at", -1))
-            
-            # Populate author information
-            author = self.users_collection.find_one(
-                {"_id": user_object_id},
-                {"password_hash": 0}
-            )
-            
-            for post in posts:
-                post["author"] = author
-                
-                # Populate mentioned users
-                mentioned_users = []
-                for mentioned_id in post.get("mentioned_users", []):
-                    mentioned_user = self.users_collection.find_one(
-                        {"_id": mentioned_id},
-                        {"username": 1, "_id": 1}
-                    )
-                    if mentioned_user:
-                        mentioned_users.append(mentioned_user)
-                post["mentioned_users_details"] = mentioned_users
+            }, limit, before, POST_PROJECTION)
             
-            return posts
+            return self._hydrate_posts(posts, viewer_id), next_cursor
         except Exception as e:
-            print(f"Error in get_posts_by_user: {e}")
-            return []
+            logger.error("Error in get_posts_by_user: %s", e)
+            return [], None
     
-    def get_mentions_for_user(self, user_id):
-        """Get posts where user is mentioned"""
+    def get_mentions_for_user(self, user_id, limit=DEFAULT_PAGE_SIZE, before=None, viewer_id=None):
+        """Get a page of posts where user is mentioned"""
         try:
             user_object_id = ObjectId(user_id)
-            posts = list(self.collection.find({
+            posts, next_cursor = fetch_page(self.collection, {
                 "mentioned_users": user_object_id
-            }).sort("created_at", -1))
+            }, limit, before, POST_PROJECTION)
             
-            # Populate author information
-            for post in posts:
-                author = self.users_collection.find_one(
-                    {"_id": post["author_id"]},
-                    {"password_hash": 0}
-                )
-                post["author"] = author
-                
-                # Populate mentioned users
-                mentioned_users = []
-                for mentioned_id in post.get("mentioned_users", []):
-                    mentioned_user = self.users_collection.find_one(
-                        {"_id": mentioned_id},
-                        {"username": 1, "_id": 1}
-                    )
-                    if mentioned_user:
-                        mentioned_users.append(mentioned_user)
-                post["mentioned_users_details"] = mentioned_users
-            
-            return posts
+            return self._hydrate_posts(posts, viewer_id), next_cursor
+        except Exception as e:
+            logger.error("Error in get_mentions_for_user: %s", e)
+            return [], None
+    
+    def count_posts_by_user(self, user_id):
+        """Number of posts by a user, counted on the author index"""
+        try:
+            return self.collection.count_documents({"author_id": ObjectId(user_id)})
         except Exception as e:
-            print(f"Error in get_mentions_for_user: {e}")
-            return []
+            logger.error("Error in count_posts_by_user: %s", e)
+            return 0
     
-    def like_post(self, post_id, user_id):
+    def count_mentions_for_user(self, user_id):
+        """Number of posts mentioning a user, counted on the mentions index"""
+        try:
+            return self.collection.count_documents({"mentioned_users": ObjectId(user_id)})
+        except Exception as e:
+            logger.error("Error in count_mentions_for_user: %s", e)
+            return 0
+    
+    def like_post(self, post, user_id):
+        """Record a like on a post returned by Comment.get_visible_post.
+
+        The unique (post_id, user_id) index makes repeats a no-op.
+        """
         try:
-            return self.collection.update_one(
-                {"_id": ObjectId(post_id)},
-                {"$addToSet": {"likes": ObjectId(user_id)}}
+            post_object_id = post["_id"]
+            user_object_id = ObjectId(user_id)
+            try:
+                self.likes_collection.insert_one({
+                    "post_id": post_object_id,
+                    "user_id": user_object_id,
+                    "created_at": datetime.utcnow()
+                })
+            except DuplicateKeyError:
+                class MockResult:
+                    modified_count = 0
+                return MockResult()
+            
+            post = self.collection.find_one_and_update(
+                {"_id": post_object_id}, {"$inc": {"like_count": 1}}, projection={"author_id": 1}
             )
+            if not post:
+                # Deleted since the visibility check; don't keep a dangling like
+                self.likes_collection.delete_one({"post_id": post_object_id, "user_id": user_object_id})
+            else:
+                self.versions.bump_posts(post["author_id"])
+            class MockResult:
+                modified_count = 1 if post else 0
+            return MockResult()
         except Exception as e:
-            print(f"Error in like_post: {e}")
+            logger.error("Error in like_post: %s", e)
             class MockResult:
                 modified_count = 0
             return MockResult()
     
-    def unlike_post(self, post_id, user_id):
+    def migrate_embedded_likes(self, batch_size=500):
+        """Move legacy `likes` arrays into the likes collection and set `like_count`.
+        
+        Safe to re-run: existing likes are skipped by the unique index and
+        counts are recomputed from the collection. Returns (posts, likes) migrated.
+        """
+        migrated_posts = 0
+        inserted_likes = 0
+        
+        while True:
+            posts = list(self.collection.find({"likes": {"$exists": True}}, {"likes": 1, "created_at": 1}).limit(batch_size))
+            if not posts:
+                break
+            
+            inserts = [
+                InsertOne({"post_id": post["_id"], "user_id": user_id, "created_at": post.get("created_at")})
+                for post in posts
+                for user_id in post.get("likes", [])
+            ]
+            if inserts:
+                try:
+                    inserted_likes += self.likes_collection.bulk_write(inserts, ordered=False).inserted_count
+                except BulkWriteError as e:
+                    # Duplicates are likes that already moved
+                    if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+                        raise
+                    inserted_likes += e.details.get("nInserted", 0)
+            
+            post_ids = [post["_id"] for post in posts]
+            counts = {
+                row["_id"]: row["count"]
+                for row in self.likes_collection.aggregate([
+                    {"$match": {"post_id": {"$in": post_ids}}},
+                    {"$group": {"_id": "$post_id", "count": {"$sum": 1}}}
+                ])
+            }
+            self.collection.bulk_write([
+                UpdateOne(
+                    {"_id": post_id},
+                    {"$set": {"like_count": counts.get(post_id, 0)}, "$unset": {"likes": ""}}
+                )
+                for post_id in post_ids
+            ], ordered=False)
+            migrated_posts += len(post_ids)
+        
+        return migrated_posts, inserted_likes
+    
+    def unlike_post(self, post, user_id):
+        """Remove a like from a post returned by Comment.get_visible_post"""
         try:
-            return self.collection.update_one(
-                {"_id": ObjectId(post_id)},
-                {"$pull": {"likes": ObjectId(user_id)}}
+            post_object_id = post["_id"]
+            deleted = self.likes_collection.delete_one({
+                "post_id": post_object_id,
+                "user_id": ObjectId(user_id)
+            })
+            if deleted.deleted_count == 0:
+                class MockResult:
+                    modified_count = 0
+                return MockResult()
+            post = self.collection.find_one_and_update(
+                {"_id": post_object_id}, {"$inc": {"like_count": -1}}, projection={"author_id": 1}
             )
+            if post:
+                self.versions.bump_posts(post["author_id"])
+            class MockResult:
+                modified_count = 1 if post else 0
+            return MockResult()
         except Exception as e:
-            print(f"Error in unlike_post: {e}")
+            logger.error("Error in unlike_post: %s", e)
             class MockResult:
                 modified_count = 0
             return MockResult()
@@ -0,0 +1,131 @@
+from pymongo import UpdateOne
+from models.pagination import DEFAULT_PAGE_SIZE, clamp_page_size, encode_cursor, fetch_page
+from dotenv import load_dotenv
+import os
+import random
+
+load_dotenv()
+
+# 'read' builds the feed at request time; 'timeline' reads it from the
+# materialized timelines collection filled on post creation.
+FEED_MODE = os.getenv('FEED_MODE', 'read')
+# Entries kept per user; older ones are trimmed.
+TIMELINE_MAX_ENTRIES = int(os.getenv('TIMELINE_MAX_ENTRIES', '1000'))
+# Authors with more friends than this are not fanned out on write; their
+# posts are merged into readers' feeds at read time instead.
+TIMELINE_FANOUT_LIMIT = int(os.getenv('TIMELINE_FANOUT_LIMIT', '5000'))
+# Fraction of writes per owner that also trim that owner's timeline.
+TIMELINE_TRIM_SAMPLE_RATE = float(os.getenv('TIMELINE_TRIM_SAMPLE_RATE', '0.05'))
+
+
+class Timeline:
+    """Materialized home feeds: one (owner_id, created_at, post_id) entry per visible post"""
+
+    def __init__(self, db):
+        self.collection = db.timelines
+        self.posts_collection = db.posts
+
+    @staticmethod
+    def is_enabled():
+        return FEED_MODE == 'timeline'
+
+    @staticmethod
+    def should_fan_out(recipient_count):
+        return recipient_count <= TIMELINE_FANOUT_LIMIT
+
+    def fan_out(self, post_id, created_at, owner_ids):
+        """Add a freshly created post to each owner's timeline"""
+        if not owner_ids:
+            return
+
+        self.collection.insert_many([
+            {"owner_id": owner_id, "created_at": created_at, "post_id": post_id}
+            for owner_id in owner_ids
+        ], ordered=False)
+
+        for owner_id in owner_ids:
+            if random.random() < TIMELINE_TRIM_SAMPLE_RATE:
+                self.trim(owner_id)
+
+    def add_entries(self, owner_id, posts):
+        """Idempotently add existing posts (with _id and created_at) to a timeline"""
+        if not posts:
+            return
+
+        self.collection.bulk_write([
+            UpdateOne(
+                {"owner_id": owner_id, "post_id": post["_id"]},
+                {"$setOnInsert": {"created_at": post["created_at"]}},
+                upsert=True
+            )
+            for post in posts
+        ], ordered=False)
+        self.trim(owner_id)
+
+    def trim(self, owner_id):
+        """Drop everything past the newest TIMELINE_MAX_ENTRIES entries"""
+        boundary = self.collection.find_one(
+            {"owner_id": owner_id},
+            {"created_at": 1, "post_id": 1},
+            sort=[("created_at", -1), ("post_id", -1)],
+            skip=TIMELINE_MAX_ENTRIES
+        )
+        if not boundary:
+            return
+
+        self.collection.delete_many({
+            "owner_id": owner_id,
+            "$or": [
+                {"created_at": {"$lt": boundary["created_at"]}},
+                {"created_at": boundary["created_at"], "post_id": {"$lte": boundary["post_id"]}}
+            ]
+        })
+
+    def rebuild(self, owner_id):
+        """Rebuild a user's timeline from the posts collection.
+
+        Other authors' posts that skipped fan-out stay out; get_page merges them in.
+        """
+        posts = list(self.posts_collection.find(
+            {"$or": [
+                {"author_id": owner_id},
+                {"visible_to": owner_id, "fanned_out": {"$ne": False}}
+            ]},
+            {"_id": 1, "created_at": 1}
+        ).sort("created_at", -1).limit(TIMELINE_MAX_ENTRIES))
+        self.add_entries(owner_id, posts)
+
+    def get_page(self, owner_id, limit=DEFAULT_PAGE_SIZE, before=None):
+        """Return one page of (created_at, post_id) keys for the owner's feed.
+
+        Posts that skipped fan-out (authors above TIMELINE_FANOUT_LIMIT) are
+        merged in from the posts collection. Returns (keys, next_cursor).
+        """
+        limit = clamp_page_size(limit)
+        entries, entries_cursor = fetch_page(
+            self.collection,
+            {"owner_id": owner_id},
+            limit, before,
+            projection={"created_at": 1, "post_id": 1},
+            id_field="post_id"
+        )
+        unfanned, unfanned_cursor = fetch_page(
+            self.posts_collection,
+            {"visible_to": owner_id, "fanned_out": False},
+            limit, before,
+            projection={"created_at": 1}
+        )
+
+        # A set, since timelines rebuilt before unfanned posts were excluded may hold them too
+        keys = {(entry["created_at"], entry["post_id"]) for entry in entries}
+        keys.update((post["created_at"], post["_id"]) for post in unfanned)
+        keys = sorted(keys, reverse=True)
+
+        has_more = len(keys) > limit or entries_cursor or unfanned_cursor
+        keys = keys[:limit]
+
+        next_cursor = None
+        if has_more and keys:
+            next_cursor = encode_cursor(*keys[-1])
+
+        return keys, next_cursor
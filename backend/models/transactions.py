@@ -0,0 +1,20 @@
+from dotenv import load_dotenv
+import os
+
+load_dotenv()
+
+# Multi-document transactions need a replica set or sharded cluster
+MONGO_TRANSACTIONS = os.getenv('MONGO_TRANSACTIONS', 'false').lower() == 'true'
+
+
+def run_in_transaction(db, callback):
+    """Run `callback(session)` inside a transaction when MONGO_TRANSACTIONS is on.
+
+    Otherwise the callback gets `session=None` and its writes apply one by
+    one. With a transaction, pymongo retries the callback on transient errors,
+    so it must be safe to run more than once.
+    """
+    if not MONGO_TRANSACTIONS:
+        return callback(None)
+    with db.client.start_session() as session:
+        return session.with_transaction(callback)
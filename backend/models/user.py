@@ -1,21 +1,43 @@
 from bson import ObjectId
 from datetime import datetime
-import bcrypt
+from pymongo import UpdateMany, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from models.cache import get_user_cache
+from models.friend_graph import get_friend_graph
+from models.leaderboard import get_leaderboard
+from models.transactions import run_in_transaction
+from models.user_dto import USER_CARD_PROJECTION, UserCard
+from models.user_search import get_user_search_index
+from models.versions import FEED, FRIENDS, USER, Versions, stamp
+from services.passwords import check_password, hash_password, needs_rehash
+import logging
+
+logger = logging.getLogger(__name__)
+
+def normalize_username(username):
+    """Case-folded form of a username, stored as `username_lower` for exact indexed lookups"""
+    return username.strip().lower()
+
+# Never sent to clients: the bcrypt hash and the ETag version stamps
+USER_PROJECTION = {"password_hash": 0, "versions": 0}
 
 class User:
     def __init__(self, db):
+        self.db = db
         self.collection = db.users
+        self.search_index = get_user_search_index(db)
+        self.cache = get_user_cache(db)
+        self.leaderboard = get_leaderboard(db)
+        self.friend_graph = get_friend_graph(db)
+        self.versions = Versions(db)
     
     def create_user(self, username, email, password):
-        # Check if user already exists
-        if self.collection.find_one({"$or": [{"username": username}, {"email": email}]}):
-            return None
-        
-        # Hash password
-        password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+        # Hash password (off the request thread, at BCRYPT_ROUNDS)
+        password_hash = hash_password(password)
         
         user_data = {
             "username": username,
+            "username_lower": normalize_username(username),
             "email": email,
             "password_hash": password_hash,
             "profile_picture": "",
@@ -27,41 +49,144 @@ class User:
             "created_at": datetime.utcnow()
         }
         
-        result = self.collection.insert_one(user_data)
+        # Unique indexes on username and email reject duplicates atomically
+        try:
+            result = self.collection.insert_one(user_data)
+        except DuplicateKeyError:
+            return None
+        
+        self.search_index.add(user_data)
+        self.leaderboard.add(user_data)
         return str(result.inserted_id)
     
     def authenticate_user(self, username, password):
         try:
             user = self.collection.find_one({"username": username})
-            if user and user.get('password_hash') and bcrypt.checkpw(password.encode('utf-8'), user['password_hash']):
+            if user and user.get('password_hash') and check_password(password, user['password_hash']):
+                if needs_rehash(user['password_hash']):
+                    self._rehash_password(user, password)
                 return user
             return None
         except Exception as e:
-            print(f"Error in authenticate_user: {e}")
+            logger.error("Error in authenticate_user: %s", e)
             return None
     
-    def get_user_by_id(self, user_id):
+    def _rehash_password(self, user, password):
+        """Upgrade a hash made with an outdated cost factor; the password was just verified"""
         try:
-            return self.collection.find_one({"_id": ObjectId(user_id)})
+            # Guarded on the old hash so a concurrent password change wins
+            self.collection.update_one(
+                {"_id": user["_id"], "password_hash": user["password_hash"]},
+                {"$set": {"password_hash": hash_password(password)}}
+            )
+        except Exception as e:
+            logger.error("Error in _rehash_password: %s", e)
+    
+    def get_user_by_id(self, user_id, fresh=False):
+        """Get a user (without password_hash), served from the user cache when possible.
+        
+        `fresh` skips the cache read, for responses tagged with the stored
+        version stamp, which another process may have changed.
+        """
+        try:
+            user_object_id = ObjectId(user_id)
         except:
             return None
+        
+        user = None if fresh else self.cache.get_by_id(user_object_id)
+        if user is None:
+            user = self.collection.find_one({"_id": user_object_id}, USER_PROJECTION)
+            if user:
+                self.cache.put(user)
+        return user
+    
+    def get_user_by_username(self, username, fresh=False):
+        """Get a user (without password_hash) by case-insensitive username"""
+        username_lower = normalize_username(username)
+        user = None if fresh else self.cache.get_by_username(username_lower)
+        if user is None:
+            user = self.collection.find_one({"username_lower": username_lower}, USER_PROJECTION)
+            if user:
+                self.cache.put(user)
+        return user
     
-    def get_user_by_username(self, username):
-        return self.collection.find_one({"username": {"$regex": f"^{username}$", "$options": "i"}})
+    def get_users_by_usernames(self, usernames, limit=50):
+        """Resolve usernames (case-insensitive) to user cards with one `$in` query.
+        
+        Unknown names are skipped; results follow the order of `usernames`.
+        At most `limit` distinct names are looked up.
+        """
+        wanted = []
+        for username in usernames:
+            if not isinstance(username, str):
+                continue
+            username_lower = normalize_username(username)
+            if username_lower and username_lower not in wanted:
+                wanted.append(username_lower)
+        wanted = wanted[:limit]
+        if not wanted:
+            return []
+        
+        projection = dict(USER_CARD_PROJECTION, username_lower=1)
+        found = {
+            user["username_lower"]: user
+            for user in self.collection.find({"username_lower": {"$in": wanted}}, projection)
+        }
+        return [UserCard.from_document(found[name]) for name in wanted if name in found]
+    
+    def backfill_username_lower(self, batch_size=1000):
+        """Set `username_lower` on users created before it existed.
+        
+        Returns (updated_count, conflicting_usernames).
+        """
+        updated = 0
+        conflicts = []
+        batch = []
+        batch_usernames = []
+        
+        def flush():
+            nonlocal updated
+            try:
+                updated += self.collection.bulk_write(batch, ordered=False).modified_count
+            except BulkWriteError as e:
+                updated += e.details.get('nModified', 0)
+                for error in e.details.get('writeErrors', []):
+                    conflicts.append(batch_usernames[error['index']])
+            batch.clear()
+            batch_usernames.clear()
+        
+        for user in self.collection.find({"username_lower": {"$exists": False}}, {"username": 1}):
+            username_lower = normalize_username(user["username"])
+            batch.append(UpdateOne(
+                {"_id": user["_id"]},
+                {"$set": {"username_lower": username_lower}}
+            ))
+            batch_usernames.append(username_lower)
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+        
+        return updated, conflicts
     
-    def search_users(self, query):
-        return list(self.collection.find({
-            "username": {"$regex": query, "$options": "i"}
-        }).limit(20))
+    def search_users(self, query, limit=10):
+        """Prefix search over usernames, served from the in-process search index"""
+        return self.search_index.search(normalize_username(query), limit)
     
     def update_profile(self, user_id, profile_data):
         try:
-            return self.collection.update_one(
-                {"_id": ObjectId(user_id)},
+            user_object_id = ObjectId(user_id)
+            result = self.collection.update_one(
+                {"_id": user_object_id},
                 {"$set": profile_data}
             )
+            self.cache.invalidate(user_object_id)
+            self.leaderboard.update(user_object_id, profile_data)
+            self.search_index.update(user_object_id, profile_data)
+            self.versions.bump_cards([user_object_id])
+            return result
         except Exception as e:
-            print(f"Error in update_profile: {e}")
+            logger.error("Error in update_profile: %s", e)
             class MockResult:
                 modified_count = 0
             return MockResult()
@@ -71,100 +196,261 @@ class User:
             sender_object_id = ObjectId(sender_id)
             receiver_object_id = ObjectId(receiver_id)
             
-            # Add to sender's sent requests
-            self.collection.update_one(
-                {"_id": sender_object_id},
-                {"$addToSet": {"friend_requests_sent": receiver_object_id}}
-            )
+            # Sender's sent requests and receiver's received requests in one round trip
+            result = self._write_friend_ops([
+                UpdateOne(
+                    {"_id": sender_object_id},
+                    {"$addToSet": {"friend_requests_sent": receiver_object_id}, "$set": stamp(USER)}
+                ),
+                UpdateOne(
+                    {"_id": receiver_object_id},
+                    {"$addToSet": {"friend_requests_received": sender_object_id}, "$set": stamp(USER)}
+                )
+            ])
             
-            # Add to receiver's received requests
-            return self.collection.update_one(
-                {"_id": receiver_object_id},
-                {"$addToSet": {"friend_requests_received": sender_object_id}}
-            )
+            self.cache.invalidate(sender_object_id, receiver_object_id)
+            return result
         except Exception as e:
-            print(f"Error in send_friend_request: {e}")
+            logger.error("Error in send_friend_request: %s", e)
             # Return a mock result object for consistency
             class MockResult:
                 modified_count = 0
             return MockResult()
     
-    def accept_friend_request(self, user_id, friend_id):
-        try:
-            user_object_id = ObjectId(user_id)
-            friend_object_id = ObjectId(friend_id)
-            
-            # Add each other as friends
-            self.collection.update_one(
+    def _write_friend_ops(self, operations):
+        """Apply both sides of a friend-graph change as one ordered bulk_write.
+        
+        Runs in a transaction when MONGO_TRANSACTIONS is on, so the graph is
+        never left half-updated.
+        """
+        return run_in_transaction(
+            self.db,
+            lambda session: self.collection.bulk_write(operations, ordered=True, session=session)
+        )
+    
+    def _pending_request_ids(self, user_object_id, friend_ids=None):
+        """Ids from `friend_ids` (or all of them if None) that really sent `user` a request"""
+        user = self.collection.find_one({"_id": user_object_id}, {"friend_requests_received": 1})
+        pending = user.get("friend_requests_received", []) if user else []
+        if friend_ids is None:
+            return list(pending)
+        wanted = set()
+        for friend_id in friend_ids:
+            try:
+                wanted.add(ObjectId(friend_id))
+            except:
+                continue  # Skip invalid IDs
+        return [friend_id for friend_id in pending if friend_id in wanted]
+    
+    def _accept(self, user_object_id, friend_object_ids):
+        # Add each other as friends
+        result = self._write_friend_ops([
+            UpdateOne(
                 {"_id": user_object_id},
                 {
-                    "$addToSet": {"friends": friend_object_id},
-                    "$pull": {"friend_requests_received": friend_object_id}
+                    "$addToSet": {"friends": {"$each": friend_object_ids}},
+                    "$pull": {"friend_requests_received": {"$in": friend_object_ids}},
+                    "$set": stamp(USER, FEED, FRIENDS)
                 }
-            )
-            
-            return self.collection.update_one(
-                {"_id": friend_object_id},
+            ),
+            UpdateMany(
+                {"_id": {"$in": friend_object_ids}},
                 {
                     "$addToSet": {"friends": user_object_id},
-                    "$pull": {"friend_requests_sent": user_object_id}
+                    "$pull": {"friend_requests_sent": user_object_id},
+                    "$set": stamp(USER, FEED, FRIENDS)
                 }
             )
+        ])
+        self.cache.invalidate(user_object_id, *friend_object_ids)
+        self.friend_graph.add_friendships(user_object_id, friend_object_ids)
+        # No timeline backfill: a post's audience is fixed when it is created,
+        # so a new friend sees only later posts, in either feed mode
+        
+        return result
+    
+    def accept_friend_request(self, user_id, friend_id):
+        try:
+            user_object_id = ObjectId(user_id)
+            friend_object_ids = self._pending_request_ids(user_object_id, [friend_id])
+            if not friend_object_ids:
+                class MockResult:
+                    modified_count = 0
+                return MockResult()
+            return self._accept(user_object_id, friend_object_ids)
         except Exception as e:
-            print(f"Error in accept_friend_request: {e}")
+            logger.error("Error in accept_friend_request: %s", e)
             class MockResult:
                 modified_count = 0
             return MockResult()
     
+    def accept_friend_requests(self, user_id, friend_ids=None):
+        """Accept the given pending requests (all of them if friend_ids is None).
+        
+        Any number of requests costs one read and one bulk_write. Returns the
+        ids of the users whose requests were accepted.
+        """
+        try:
+            user_object_id = ObjectId(user_id)
+            friend_object_ids = self._pending_request_ids(user_object_id, friend_ids)
+            if friend_object_ids:
+                self._accept(user_object_id, friend_object_ids)
+            return friend_object_ids
+        except Exception as e:
+            logger.error("Error in accept_friend_requests: %s", e)
+            return []
+    
     def reject_friend_request(self, user_id, friend_id):
         try:
             user_object_id = ObjectId(user_id)
             friend_object_id = ObjectId(friend_id)
             
             # Remove from both sent and received requests
-            self.collection.update_one(
-                {"_id": user_object_id},
-                {"$pull": {"friend_requests_received": friend_object_id}}
-            )
+            result = self._write_friend_ops([
+                UpdateOne(
+                    {"_id": user_object_id},
+                    {"$pull": {"friend_requests_received": friend_object_id}, "$set": stamp(USER)}
+                ),
+                UpdateOne(
+                    {"_id": friend_object_id},
+                    {"$pull": {"friend_requests_sent": user_object_id}, "$set": stamp(USER)}
+                )
+            ])
             
-            return self.collection.update_one(
-                {"_id": friend_object_id},
-                {"$pull": {"friend_requests_sent": user_object_id}}
-            )
+            self.cache.invalidate(user_object_id, friend_object_id)
+            return result
         except Exception as e:
-            print(f"Error in reject_friend_request: {e}")
+            logger.error("Error in reject_friend_request: %s", e)
             class MockResult:
                 modified_count = 0
             return MockResult()
     
+    def reject_friend_requests(self, user_id, friend_ids=None):
+        """Reject the given pending requests (all of them if friend_ids is None) in one bulk_write.
+        
+        Returns the ids of the users whose requests were rejected.
+        """
+        try:
+            user_object_id = ObjectId(user_id)
+            friend_object_ids = self._pending_request_ids(user_object_id, friend_ids)
+            if not friend_object_ids:
+                return []
+            
+            self._write_friend_ops([
+                UpdateOne(
+                    {"_id": user_object_id},
+                    {"$pull": {"friend_requests_received": {"$in": friend_object_ids}}, "$set": stamp(USER)}
+                ),
+                UpdateMany(
+                    {"_id": {"$in": friend_object_ids}},
+                    {"$pull": {"friend_requests_sent": user_object_id}, "$set": stamp(USER)}
+                )
+            ])
+            
+            self.cache.invalidate(user_object_id, *friend_object_ids)
+            return friend_object_ids
+        except Exception as e:
+            logger.error("Error in reject_friend_requests: %s", e)
+            return []
+    
     def increment_beijjati_count(self, user_id):
         try:
-            return self.collection.update_one(
-                {"_id": ObjectId(user_id)},
+            user_object_id = ObjectId(user_id)
+            result = self.collection.update_one(
+                {"_id": user_object_id},
                 {"$inc": {"beijjati_count": 1}}
             )
+            self.cache.invalidate(user_object_id)
+            self.leaderboard.increment([user_object_id])
+            self.versions.bump_cards([user_object_id])
+            return result
         except Exception as e:
-            print(f"Error in increment_beijjati_count: {e}")
+            logger.error("Error in increment_beijjati_count: %s", e)
             class MockResult:
                 modified_count = 0
             return MockResult()
     
-    def get_friends(self, user_id):
+    def get_leaderboard(self, viewer_id, scope='global', limit=20):
+        """Ranked users for the `global` or `friends` scope.
+        
+        Returns (entries, viewer_rank) where entries are {rank, user} and
+        viewer_rank is the viewer's rank within the same scope.
+        """
+        try:
+            viewer = self.get_user_by_id(viewer_id)
+            if not viewer:
+                return [], None
+            
+            if scope == 'friends':
+                ranked = self.leaderboard.friends(viewer)
+                viewer_rank = next(
+                    (entry["rank"] for entry in ranked if entry["user"]._id == viewer["_id"]), None
+                )
+                return ranked[:limit], viewer_rank
+            
+            return self.leaderboard.top(limit), self.leaderboard.rank_of(viewer)
+        except Exception as e:
+            logger.error("Error in get_leaderboard: %s", e)
+            return [], None
+    
+    def _cards_by_id(self, user_ids):
+        """User cards for `user_ids` in one projected query, keyed by _id"""
+        if not user_ids:
+            return {}
+        return {
+            user["_id"]: UserCard.from_document(user)
+            for user in self.collection.find({"_id": {"$in": list(user_ids)}}, USER_CARD_PROJECTION)
+        }
+    
+    def get_mutual_friends(self, user_id, other_id):
+        """Friends two users have in common, as user cards"""
+        try:
+            mutual_ids = self.friend_graph.mutual_friends(ObjectId(user_id), ObjectId(other_id))
+            cards = self._cards_by_id(mutual_ids)
+            return [cards[mutual_id] for mutual_id in mutual_ids if mutual_id in cards]
+        except Exception as e:
+            logger.error("Error in get_mutual_friends: %s", e)
+            return []
+    
+    def get_friend_suggestions(self, user_id, limit=10):
+        """Friends of friends, ranked by mutual friend count.
+        
+        Returns [{user, mutual_count}], skipping users with a pending request
+        either way.
+        """
         try:
             user = self.get_user_by_id(user_id)
             if not user:
                 return []
             
+            pending = user.get("friend_requests_sent", []) + user.get("friend_requests_received", [])
+            ranked = self.friend_graph.suggestions(user["_id"], limit, exclude=pending)
+            cards = self._cards_by_id([suggested_id for suggested_id, _ in ranked])
+            return [
+                {"user": cards[suggested_id], "mutual_count": count}
+                for suggested_id, count in ranked
+                if suggested_id in cards
+            ]
+        except Exception as e:
+            logger.error("Error in get_friend_suggestions: %s", e)
+            return []
+    
+    def get_friends(self, user_id, fresh=False):
+        try:
+            user = self.get_user_by_id(user_id, fresh)
+            if not user:
+                return []
+            
             friend_ids = user.get('friends', [])
             if not friend_ids:  # If no friends, return empty list
                 return []
             
-            return list(self.collection.find(
-                {"_id": {"$in": friend_ids}},
-                {"password_hash": 0}
-            ))
+            return [
+                UserCard.from_document(friend)
+                for friend in self.collection.find({"_id": {"$in": friend_ids}}, USER_CARD_PROJECTION)
+            ]
         except Exception as e:
-            print(f"Error in get_friends: {e}")
+            logger.error("Error in get_friends: %s", e)
             return []
     
     def get_friend_requests(self, user_id):
@@ -177,10 +463,10 @@ class User:
             if not request_ids:  # If no friend requests, return empty list
                 return []
             
-            return list(self.collection.find(
-                {"_id": {"$in": request_ids}},
-                {"password_hash": 0}
-            ))
+            return [
+                UserCard.from_document(requester)
+                for requester in self.collection.find({"_id": {"$in": request_ids}}, USER_CARD_PROJECTION)
+            ]
         except Exception as e:
-            print(f"Error in get_friend_requests: {e}")
+            logger.error("Error in get_friend_requests: %s", e)
             return []
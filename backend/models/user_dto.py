@@ -0,0 +1,88 @@
+USER_CARD_PROJECTION = {"username": 1, "profile_picture": 1, "beijjati_count": 1}
+
+
+class UserCard:
+    """Compact user shape for lists: friends, friend requests, search results, post authors"""
+
+    __slots__ = ("_id", "username", "profile_picture", "beijjati_count")
+
+    def __init__(self, _id, username, profile_picture="", beijjati_count=0):
+        self._id = _id
+        self.username = username
+        self.profile_picture = profile_picture
+        self.beijjati_count = beijjati_count
+
+    @classmethod
+    def from_document(cls, user):
+        return cls(
+            user["_id"],
+            user["username"],
+            user.get("profile_picture") or "",
+            user.get("beijjati_count", 0)
+        )
+
+    def to_dict(self):
+        return {
+            "_id": self._id,
+            "username": self.username,
+            "profile_picture": self.profile_picture,
+            "beijjati_count": self.beijjati_count
+        }
+
+
+class CurrentUser:
+    """The signed-in user's own account, as returned by /api/auth/me.
+
+    Like FullProfile it carries counts instead of the `friends` /
+    `friend_requests_*` id arrays; the lists themselves are served as
+    user cards by the friends and friend-request endpoints.
+    """
+
+    __slots__ = (
+        "_id", "username", "email", "bio", "profile_picture", "beijjati_count", "created_at",
+        "friends_count", "friend_requests_sent_count", "friend_requests_received_count"
+    )
+
+    def __init__(self, user):
+        self._id = user["_id"]
+        self.username = user["username"]
+        self.email = user.get("email")
+        self.bio = user.get("bio") or ""
+        self.profile_picture = user.get("profile_picture") or ""
+        self.beijjati_count = user.get("beijjati_count", 0)
+        self.created_at = user.get("created_at")
+        self.friends_count = len(user.get("friends", []))
+        self.friend_requests_sent_count = len(user.get("friend_requests_sent", []))
+        self.friend_requests_received_count = len(user.get("friend_requests_received", []))
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.__slots__}
+
+
+class FullProfile:
+    """Profile page shape: public fields, friend count and the viewer's relationship to the user.
+
+    Carries no id arrays; the relationship flags are computed against the
+    viewer instead of shipping `friends` / `friend_requests_*` to the client.
+    """
+
+    __slots__ = (
+        "_id", "username", "bio", "profile_picture", "beijjati_count", "created_at",
+        "friends_count", "is_friend", "friend_request_sent", "friend_request_received"
+    )
+
+    def __init__(self, user, viewer_id=None):
+        self._id = user["_id"]
+        self.username = user["username"]
+        self.bio = user.get("bio") or ""
+        self.profile_picture = user.get("profile_picture") or ""
+        self.beijjati_count = user.get("beijjati_count", 0)
+        self.created_at = user.get("created_at")
+        self.friends_count = len(user.get("friends", []))
+        self.is_friend = viewer_id in user.get("friends", [])
+        # Viewer already asked this user / this user asked the viewer
+        self.friend_request_sent = viewer_id in user.get("friend_requests_received", [])
+        self.friend_request_received = viewer_id in user.get("friend_requests_sent", [])
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.__slots__}
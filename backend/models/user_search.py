@@ -0,0 +1,141 @@
+from dotenv import load_dotenv
+from models.cache import per_database
+import bisect
+import os
+import threading
+import time
+
+load_dotenv()
+
+# Seconds between full reloads, which pick up users and pictures changed by other processes
+USER_SEARCH_REFRESH_INTERVAL = float(os.getenv('USER_SEARCH_REFRESH_INTERVAL', '60'))
+# Upper bound on prefix matches considered for ranking
+USER_SEARCH_MAX_CANDIDATES = 500
+
+# Fields shipped in search and autocomplete results. beijjati_count changes
+# on every verified post, so it is left to the profile and leaderboard.
+SEARCH_FIELDS = ("_id", "username", "profile_picture")
+SEARCH_PROJECTION = {"username_lower": 1, "username": 1, "profile_picture": 1}
+
+
+def _entry(user):
+    entry = {field: user.get(field) for field in SEARCH_FIELDS}
+    entry["profile_picture"] = entry["profile_picture"] or ""
+    return entry
+
+
+class UserSearchIndex:
+    """In-process sorted prefix index over normalized usernames.
+
+    Keys are the stored `username_lower` values, each holding a slim card,
+    so searches are answered from memory without touching Mongo. Like the
+    leaderboard, the index is reloaded every USER_SEARCH_REFRESH_INTERVAL
+    seconds to pick up changes made by other processes; `add` and `update`
+    calls from the User model apply this process's own changes at once.
+    Reloads are built outside the lock and swapped in, so searches keep
+    using the previous copy meanwhile.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()  # held by the one thread rebuilding
+        self._keys = []  # sorted (username_lower, _id)
+        self._entries = {}  # _id -> slim card
+        self._pending = None  # changes made while a rebuild runs, replayed onto it
+        self._loaded_at = None
+
+    @staticmethod
+    def _insert(keys, entries, username_lower, user):
+        if user["_id"] not in entries:
+            bisect.insort(keys, (username_lower, user["_id"]))
+        entries[user["_id"]] = _entry(user)
+
+    @staticmethod
+    def _update(entries, user_id, fields):
+        entry = entries.get(user_id)
+        if entry is not None:
+            entries[user_id] = _entry({**entry, **fields})
+
+    def _apply(self, change):
+        with self._lock:
+            if self._loaded_at is not None:
+                change(self._keys, self._entries)
+            if self._pending is not None:
+                self._pending.append(change)
+
+    def _reload(self):
+        with self._lock:
+            self._pending = []
+        try:
+            keys, entries = [], {}
+            for user in self.collection.find({"username_lower": {"$exists": True}}, SEARCH_PROJECTION):
+                keys.append((user["username_lower"], user["_id"]))
+                entries[user["_id"]] = _entry(user)
+            keys.sort()
+        except Exception:
+            with self._lock:
+                self._pending = None
+            raise
+
+        with self._lock:
+            for change in self._pending:
+                change(keys, entries)
+            self._keys, self._entries = keys, entries
+            self._pending = None
+            self._loaded_at = time.monotonic()
+
+    def _sync(self):
+        """Load the index on first use, then rebuild it once it is older than the refresh interval.
+
+        Only the first load makes callers wait; later rebuilds are done by
+        whichever caller gets the reload lock while the rest read the old copy.
+        """
+        if self._loaded_at is None:
+            with self._reload_lock:
+                if self._loaded_at is None:
+                    self._reload()
+            return
+        if time.monotonic() - self._loaded_at < USER_SEARCH_REFRESH_INTERVAL:
+            return
+        if self._reload_lock.acquire(blocking=False):
+            try:
+                self._reload()
+            finally:
+                self._reload_lock.release()
+
+    def add(self, user):
+        """Index a newly created user"""
+        username_lower = user["username_lower"]
+        self._apply(lambda keys, entries: self._insert(keys, entries, username_lower, user))
+
+    def update(self, user_id, fields):
+        """Apply changed card fields (e.g. profile_picture) to an indexed user"""
+        fields = {field: value for field, value in fields.items() if field in SEARCH_FIELDS[1:]}
+        if fields:
+            self._apply(lambda keys, entries: self._update(entries, user_id, fields))
+
+    def search(self, prefix, limit=10):
+        """Return up to `limit` users whose normalized username starts with `prefix`.
+
+        Exact matches rank first, then shorter usernames, then alphabetical.
+        """
+        if not prefix:
+            return []
+
+        self._sync()
+        with self._lock:
+            start = bisect.bisect_left(self._keys, (prefix,))
+            candidates = []
+            for username_lower, user_id in self._keys[start:start + USER_SEARCH_MAX_CANDIDATES]:
+                if not username_lower.startswith(prefix):
+                    break
+                candidates.append((username_lower != prefix, len(username_lower), username_lower, user_id))
+            candidates.sort()
+            return [dict(self._entries[user_id]) for *_, user_id in candidates[:limit]]
+
+
+@per_database
+def get_user_search_index(db):
+    """Process-wide search index for a database"""
+    return UserSearchIndex(db.users)
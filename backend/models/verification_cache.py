@@ -0,0 +1,124 @@
+from collections import OrderedDict
+from datetime import datetime
+from dotenv import load_dotenv
+from models.cache import TTLCache
+import hashlib
+import io
+import os
+import threading
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+load_dotenv()
+
+# How long a verdict is remembered (Mongo TTL index and in-memory entries)
+VERDICT_CACHE_TTL = int(os.getenv('VERDICT_CACHE_TTL', str(7 * 24 * 3600)))
+VERDICT_CACHE_SIZE = int(os.getenv('VERDICT_CACHE_SIZE', '2048'))
+# Max differing bits for two perceptual hashes to count as the same image. Off (-1)
+# by default: unrelated screenshots can share a dHash, and a match skips verification
+VERDICT_PHASH_DISTANCE = int(os.getenv('VERDICT_PHASH_DISTANCE', '-1'))
+# Hashes with fewer set (or unset) bits than this come from mostly flat images
+# and are never matched
+PHASH_MIN_BITS = 8
+
+
+def content_hash(image_bytes):
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def perceptual_hash(image_bytes):
+    """64-bit difference hash (dHash) as 16 hex digits, or None without Pillow or on undecodable input"""
+    if Image is None:
+        return None
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            pixels = list(image.convert('L').resize((9, 8)).getdata())
+    except Exception:
+        return None
+
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return f"{bits:016x}"
+
+
+def _informative(phash):
+    bits = bin(int(phash, 16)).count('1')
+    return PHASH_MIN_BITS <= bits <= 64 - PHASH_MIN_BITS
+
+
+def _distance(phash_a, phash_b):
+    return bin(int(phash_a, 16) ^ int(phash_b, 16)).count('1')
+
+
+class VerdictCache:
+    """Image verification verdicts keyed by SHA-256 of the image bytes.
+
+    Persisted in the `image_verdicts` collection (expired by a TTL index) and
+    fronted by an in-memory LRU. When VERDICT_PHASH_DISTANCE is set,
+    near-duplicates (re-encoded or resized screenshots) are also matched by
+    perceptual hash: exactly in Mongo, and within that many bits against
+    recently seen images in memory. Low-entropy hashes are never matched.
+    """
+
+    def __init__(self, db):
+        self.collection = db.image_verdicts
+        self.verdicts = TTLCache(VERDICT_CACHE_SIZE, VERDICT_CACHE_TTL)
+        self._recent_phashes = OrderedDict()  # phash -> verdict
+        self._lock = threading.Lock()
+
+    def _remember_phash(self, phash, verified):
+        if phash is None:
+            return
+        with self._lock:
+            self._recent_phashes[phash] = verified
+            self._recent_phashes.move_to_end(phash)
+            while len(self._recent_phashes) > VERDICT_CACHE_SIZE:
+                self._recent_phashes.popitem(last=False)
+
+    def _near_duplicate(self, phash):
+        if phash is None:
+            return None
+        with self._lock:
+            for known_phash, verified in self._recent_phashes.items():
+                if _distance(phash, known_phash) <= VERDICT_PHASH_DISTANCE:
+                    return verified
+        return None
+
+    def lookup(self, image_bytes):
+        """Return (verdict, sha256, phash); verdict is None on a miss"""
+        sha256 = content_hash(image_bytes)
+        verified = self.verdicts.get(sha256)
+        if verified is not None:
+            return verified, sha256, None
+
+        phash = None
+        if VERDICT_PHASH_DISTANCE >= 0:
+            phash = perceptual_hash(image_bytes)
+            if phash is not None and not _informative(phash):
+                phash = None
+
+        document = self.collection.find_one({"_id": sha256}, {"verified": 1})
+        if document is None and phash is not None:
+            document = self.collection.find_one({"phash": phash}, {"verified": 1})
+        if document is not None:
+            verified = document["verified"]
+        else:
+            verified = self._near_duplicate(phash)
+
+        if verified is not None:
+            self.verdicts.set(sha256, verified)
+        return verified, sha256, phash
+
+    def store(self, sha256, phash, verified):
+        self.verdicts.set(sha256, verified)
+        self._remember_phash(phash, verified)
+        self.collection.update_one(
+            {"_id": sha256},
+            {"$set": {"verified": verified, "phash": phash, "created_at": datetime.utcnow()}},
+            upsert=True
+        )
@@ -0,0 +1,94 @@
+from bson import ObjectId
+import hashlib
+
+# What a version stamp covers. Stamps live on the user document under
+# `versions` and are replaced with a fresh ObjectId on every change, so a
+# stamp never repeats even if the field is lost.
+USER = 'user'  # the user document itself: profile, counts, friend requests
+FEED = 'feed'  # who and what the user's feed draws from: friendships and friends' cards
+FRIENDS = 'friends'  # the user's friend list and those friends' cards
+POSTS = 'posts'  # the user's own posts: new ones, likes, comments, verification
+
+# Bump when the JSON shape of a covered response changes, so clients drop
+# copies cached under the old shape
+ETAG_FORMAT = '1'
+
+
+def stamp(*scopes):
+    """`$set` fields that give each scope a new version"""
+    value = ObjectId()
+    return {f"versions.{scope}": value for scope in scopes}
+
+
+class Versions:
+    """Per-user version stamps for conditional GETs.
+
+    Model write methods bump the stamps of every user whose responses they
+    change; routes hash the stamps into an ETag and answer a matching
+    `If-None-Match` with 304 after small indexed reads. A change to one post
+    bumps only its author's POSTS stamp, and the feed ETag reads the POSTS
+    stamps of every author the feed can include, so likes and comments cost
+    one write however many friends see the post.
+    """
+
+    def __init__(self, db):
+        self.collection = db.users
+
+    def bump(self, user_ids, *scopes):
+        """New versions for `scopes` on each of `user_ids`, in one update_many"""
+        user_ids = list(user_ids)
+        if user_ids:
+            self.collection.update_many({"_id": {"$in": user_ids}}, {"$set": stamp(*scopes)})
+
+    def bump_posts(self, author_id):
+        """One of the author's posts was created or changed"""
+        self.collection.update_one({"_id": author_id}, {"$set": stamp(POSTS)})
+
+    def bump_cards(self, user_ids):
+        """A user card changed (username, picture, beijjati count).
+
+        Cards show up on the user's own profile and posts, and in their
+        friends' feeds and friend lists.
+        """
+        user_ids = list(user_ids)
+        if not user_ids:
+            return
+        friend_ids = set()
+        for user in self.collection.find({"_id": {"$in": user_ids}}, {"friends": 1}):
+            friend_ids.update(user.get("friends", []))
+        self.bump(user_ids, USER, FEED)
+        self.bump(friend_ids.difference(user_ids), FEED, FRIENDS)
+
+    def etag(self, query, scope, *parts):
+        """ETag for a response built from the user matching `query`.
+
+        `parts` are whatever else the response depends on (viewer, query
+        string). Returns None when no user matches.
+        """
+        user = self.collection.find_one(query, {f"versions.{scope}": 1})
+        if user is None:
+            return None
+        version = user.get("versions", {}).get(scope)
+        return _hash([user["_id"], scope, version] + list(parts))
+
+    def feed_etag(self, user_id, *parts):
+        """ETag for a user's feed, or None when no user matches.
+
+        The feed only holds posts by the user and their friends (friendships
+        are never removed), so it depends on the user's FEED stamp and on
+        the POSTS stamps of exactly those authors.
+        """
+        user = self.collection.find_one({"_id": user_id}, {f"versions.{FEED}": 1, "friends": 1})
+        if user is None:
+            return None
+        authors = [user_id] + user.get("friends", [])
+        posts_versions = sorted(
+            (str(author["_id"]), str(author.get("versions", {}).get(POSTS)))
+            for author in self.collection.find({"_id": {"$in": authors}}, {f"versions.{POSTS}": 1})
+        )
+        return _hash([user_id, FEED, user.get("versions", {}).get(FEED), posts_versions] + list(parts))
+
+
+def _hash(parts):
+    key = "|".join([ETAG_FORMAT] + [str(part) for part in parts])
+    return hashlib.sha1(key.encode()).hexdigest()
@@ -1,6 +1,9 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 from models.user import User
+from models.user_dto import CurrentUser
+from models.versions import USER, Versions
+from routes.conditional import not_modified, with_etag
 from bson import ObjectId
 import json
 
@@ -8,6 +11,7 @@ auth_bp = Blueprint('auth', __name__)
 
 def init_auth_routes(mongo):
     user_model = User(mongo.db)
+    versions = Versions(mongo.db)
     
     @auth_bp.route('/register', methods=['POST'])
     def register():
@@ -68,19 +72,18 @@ def init_auth_routes(mongo):
     def get_current_user():
         try:
             current_user_id = get_jwt_identity()
-            user = user_model.get_user_by_id(current_user_id)
+            etag = versions.etag({'_id': ObjectId(current_user_id)}, USER)
+            cached = not_modified(etag)
+            if cached:
+                return cached
+            
+            user = user_model.get_user_by_id(current_user_id, fresh=True)
             
             if not user:
                 return jsonify({'error': 'User not found'}), 404
             
-            # Remove sensitive information and convert ObjectId to string
-            user.pop('password_hash', None)
-            user['_id'] = str(user['_id'])
-            user['friends'] = [str(friend_id) for friend_id in user.get('friends', [])]
-            user['friend_requests_sent'] = [str(req_id) for req_id in user.get('friend_requests_sent', [])]
-            user['friend_requests_received'] = [str(req_id) for req_id in user.get('friend_requests_received', [])]
-            
-            return jsonify({'user': user}), 200
+            # Counts rather than id arrays; ObjectIds are encoded by the JSON provider
+            return with_etag(jsonify({'user': CurrentUser(user)}), etag), 200
             
         except Exception as e:
             return jsonify({'error': str(e)}), 500
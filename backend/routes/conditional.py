@@ -0,0 +1,18 @@
+from flask import make_response, request
+
+
+def not_modified(etag):
+    """A 304 for `etag` if the client already has it, else None"""
+    if etag is None or etag not in request.if_none_match:
+        return None
+    response = make_response('', 304)
+    response.set_etag(etag)
+    return response
+
+
+def with_etag(response, etag):
+    """Tag a JSON response; `no-cache` makes clients revalidate before reuse"""
+    if etag is not None:
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+    return response
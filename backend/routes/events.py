@@ -0,0 +1,46 @@
+from flask import Blueprint, Response, current_app, request, jsonify
+from flask_jwt_extended import decode_token
+from services.events import EVENTS_HEARTBEAT, event_bus
+
+events_bp = Blueprint('events', __name__)
+
+def init_events_routes(mongo):
+
+    @events_bp.route('/stream', methods=['GET'])
+    def stream():
+        """Server-sent events for the current user.
+
+        EventSource can't send an Authorization header, so the access token
+        comes in the `token` query parameter.
+        """
+        try:
+            user_id = decode_token(request.args.get('token', ''))[current_app.config['JWT_IDENTITY_CLAIM']]
+        except Exception:
+            return jsonify({'error': 'Invalid or missing token'}), 401
+
+        subscription = event_bus.subscribe(user_id)
+        if subscription is None:
+            return jsonify({'error': 'Too many open event streams, please retry'}), 503
+
+        json_provider = current_app.json
+
+        def generate():
+            try:
+                yield "retry: 5000\n\n"
+                while True:
+                    event = subscription.get(timeout=EVENTS_HEARTBEAT)
+                    if event is None:
+                        yield ": ping\n\n"
+                        continue
+                    event_type, data = event
+                    yield f"event: {event_type}\ndata: {json_provider.dumps(data)}\n\n"
+            finally:
+                # Runs when the client disconnects and the server closes the generator
+                event_bus.unsubscribe(subscription)
+
+        return Response(generate(), mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        })
+
+    return events_bp
@@ -0,0 +1,60 @@
+from flask import Blueprint, Response, g, request
+from models.cache import get_user_cache
+from services.events import event_bus
+from services.metrics import COMMAND_COUNT_BUCKETS, METRICS, end_request_tally, start_request_tally
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+metrics_bp = Blueprint('metrics', __name__)
+
+def init_metrics_routes(mongo):
+    user_cache = get_user_cache(mongo.db)
+    
+    @metrics_bp.before_app_request
+    def start_timer():
+        g.request_started = time.perf_counter()
+        g.mongo_tally, g.mongo_tally_token = start_request_tally()
+    
+    @metrics_bp.after_app_request
+    def record_request(response):
+        started = g.pop('request_started', None)
+        tally = g.pop('mongo_tally', None)
+        if started is None or tally is None:
+            return response
+        elapsed = time.perf_counter() - started
+        # The URL rule, not the path, so ids don't explode the label set
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        
+        METRICS.observe('http_request_seconds', elapsed, 'Request handling time by route',
+                        method=request.method, route=route, status=response.status_code)
+        METRICS.observe('http_request_mongo_commands', tally.commands, 'Mongo commands issued per request',
+                        buckets=COMMAND_COUNT_BUCKETS, method=request.method, route=route)
+        METRICS.observe('http_request_mongo_seconds', tally.seconds, 'Time spent in Mongo per request',
+                        method=request.method, route=route)
+        response.headers['Server-Timing'] = (
+            f'app;dur={elapsed * 1000:.1f}, db;dur={tally.seconds * 1000:.1f};desc="{tally.commands} commands"'
+        )
+        logger.debug("%s %s %s %.1fms %d mongo commands", request.method, request.path,
+                     response.status_code, elapsed * 1000, tally.commands)
+        return response
+    
+    @metrics_bp.teardown_app_request
+    def stop_tally(exception=None):
+        token = g.pop('mongo_tally_token', None)
+        if token is not None:
+            end_request_tally(token)
+    
+    @metrics_bp.route('', methods=['GET'])
+    def metrics():
+        """Prometheus text exposition for this worker process"""
+        for cache_name, stats in user_cache.stats().items():
+            for key in ('hits', 'misses', 'size'):
+                METRICS.set(f'user_cache_{key}', stats[key], 'User cache counters', cache=cache_name)
+        stream_stats = event_bus.stats()
+        METRICS.set('event_streams', stream_stats['subscribers'], 'Open server-sent event streams')
+        METRICS.set('event_stream_users', stream_stats['users'], 'Users with at least one open event stream')
+        return Response(METRICS.render(), mimetype='text/plain; version=0.0.4')
+    
+    return metrics_bp
@@ -1,34 +1,104 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, send_file
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models.post import Post
+from models.post import Post, VERIFICATION_PENDING, post_audience
+from models.comment import COMMENT_MAX_LENGTH, Comment
 from models.user import User
+from models.user_dto import UserCard
+from models.pagination import clamp_page_size, decode_cursor
+from models.versions import Versions
+from routes.conditional import not_modified, with_etag
 from bson import ObjectId
+from werkzeug.exceptions import RequestEntityTooLarge
 import json
-import pytesseract
-import google.generativeai as genai
-from PIL import Image
-import io
-import os
+from models.verification_cache import VerdictCache
+from models.image_store import ImageStore
+from services.images import ImageRejected, process_image, read_upload
+from services.events import event_bus
+from services.verification import (
+    VERIFICATION_STALE_AFTER, VERIFICATION_STATS, CachingVerifier, VerificationPipeline, build_verifier
+)
+from datetime import datetime, timedelta
+import logging
 from dotenv import load_dotenv
 load_dotenv()
-GEMINI_KEY=os.getenv('GEMINI_KEY')
-genai.configure(api_key=GEMINI_KEY)
+logger = logging.getLogger(__name__)
 posts_bp = Blueprint('posts', __name__)
 
-def convert_objectids_to_strings(obj):
-    """Recursively convert all ObjectId instances to strings in a data structure"""
-    if isinstance(obj, ObjectId):
-        return str(obj)
-    elif isinstance(obj, dict):
-        return {key: convert_objectids_to_strings(value) for key, value in obj.items()}
-    elif isinstance(obj, list):
-        return [convert_objectids_to_strings(item) for item in obj]
-    else:
-        return obj
+def parse_page_args():
+    """Read `limit` and `before` from the query string.
+
+    Raises ValueError if either is malformed.
+    """
+    limit = clamp_page_size(request.args.get('limit', type=int))
+    before = request.args.get('before')
+    return limit, decode_cursor(before) if before else None
 
 def init_posts_routes(mongo):
     post_model = Post(mongo.db)
     user_model = User(mongo.db)
+    comment_model = Comment(mongo.db)
+    versions = Versions(mongo.db)
+    image_store = ImageStore(mongo.db)
+    verifier = CachingVerifier(build_verifier(), VerdictCache(mongo.db))
+    
+    def notify_post_author(post_id, actor_id, event_type, data):
+        """Tell a post's author about someone else's activity on it"""
+        post = post_model.get_post_summary(post_id)
+        if post and str(post["author_id"]) != str(actor_id):
+            actor = user_model.get_user_by_id(actor_id)
+            data = dict(data, post_id=post["_id"], like_count=post.get("like_count", 0),
+                        comment_count=post.get("comment_count", 0))
+            if actor:
+                data["user"] = UserCard.from_document(actor)
+            event_bus.publish([post["author_id"]], event_type, data)
+    
+    def complete_verification(post_id, verified):
+        applied = post_model.complete_verification(post_id, verified)
+        if applied:
+            post = post_model.get_post_summary(post_id)
+            if post:
+                event_bus.publish(post_audience(post), 'post_verified', {
+                    'post_id': post["_id"],
+                    'verification_status': post.get("verification_status"),
+                    'is_beizzati': post.get("is_beizzati", False)
+                })
+        return applied
+    
+    verification_pipeline = VerificationPipeline(verifier, complete_verification)
+    
+    def resume_stale_verifications():
+        """Queue again pending posts whose verification job was lost.
+        
+        Jobs live only in this process, so a restart drops them. Each stale
+        post is claimed in Mongo first, so one worker resumes it; posts whose
+        image is gone or no longer decodes are rejected.
+        """
+        stale_before = datetime.utcnow() - timedelta(seconds=VERIFICATION_STALE_AFTER)
+        while verification_pipeline.reserve():
+            post = post_model.claim_stale_verification(stale_before)
+            if post is None:
+                verification_pipeline.release()
+                return
+            
+            post_id = str(post["_id"])
+            grid_out = image_store.open(post["image"]["file_id"]) if post.get("image") else None
+            try:
+                if grid_out is None:
+                    raise ImageRejected("Image not found")
+                processed = process_image(grid_out.read())
+            except Exception as e:
+                logger.warning("Rejecting pending post %s: %s", post_id, e)
+                verification_pipeline.release()
+                complete_verification(post_id, False)
+                continue
+            
+            logger.info("Resuming verification of post %s", post_id)
+            verification_pipeline.submit(post_id, processed.verification, 'image/jpeg')
+    
+    # Started by the first request, so CLI commands don't pick up verification work
+    @posts_bp.before_app_request
+    def start_verification_sweeper():
+        verification_pipeline.start_sweeper(resume_stale_verifications)
     
     @posts_bp.route('', methods=['POST'])
     @posts_bp.route('/', methods=['POST'])
@@ -45,142 +115,225 @@ def init_posts_routes(mongo):
             if not content:
                 return jsonify({'error': 'Content is required'}), 400
 
-            if is_beizzati:
-                if not image_file:
-                    return jsonify({'error': 'Image is required for Beijjati post'}), 400
-                if not verify_image_contains_beijjati_evidence(image_file):
-                    return jsonify({'error': 'Image does not qualify as Beijjati'}), 400
-
-            # Get mentioned user IDs
-            mentioned_user_ids = []
-            for username in mentioned_usernames:
-                user = user_model.get_user_by_username(username)
-                if user:
-                    mentioned_user_ids.append(str(user['_id']))
-                    print("✅ Final unique mentioned_user_ids:", mentioned_user_ids)
-                    if is_beizzati:
-                        user_model.increment_beijjati_count(user['_id'])
-
-            post_id = post_model.create_post(
-                current_user_id,
-                content,
-                is_beizzati,
-                mentioned_user_ids
-            )
+            if is_beizzati and not image_file:
+                return jsonify({'error': 'Image is required for Beijjati post'}), 400
+
+            # Resolve all mentioned usernames in one query
+            if not isinstance(mentioned_usernames, list):
+                return jsonify({'error': 'mentioned_users must be a list'}), 400
+            mentioned_user_ids = [str(card._id) for card in user_model.get_users_by_usernames(mentioned_usernames)]
+
+            # Read in bounded chunks and decode once, before anything is stored
+            processed = None
+            if image_file:
+                try:
+                    processed = process_image(read_upload(image_file))
+                except ImageRejected as e:
+                    return jsonify({'error': str(e)}), 400
+
+            # Beijjati posts are created as pending and verified in the background
+            if is_beizzati and not verification_pipeline.reserve():
+                return jsonify({'error': 'Image verification is busy, please try again shortly'}), 503
+
+            image = None
+            try:
+                if processed:
+                    image = image_store.save(processed, ObjectId(current_user_id))
+                post_id = post_model.create_post(
+                    current_user_id,
+                    content,
+                    is_beizzati,
+                    mentioned_user_ids,
+                    image
+                )
+            except Exception:
+                if is_beizzati:
+                    verification_pipeline.release()
+                if image:
+                    image_store.delete(image)
+                raise
 
             if not post_id:
+                if is_beizzati:
+                    verification_pipeline.release()
+                if image:
+                    image_store.delete(image)
                 return jsonify({'error': 'Failed to create post'}), 400
 
+            if is_beizzati:
+                # The downscaled copy is verified, not the original upload
+                verification_pipeline.submit(post_id, processed.verification, 'image/jpeg')
+            
+            post = post_model.get_post(post_id)
+            if post:
+                event_bus.publish(post_audience(post), 'post_created', {'post': post})
+                if post.get("mentioned_users"):
+                    event_bus.publish(post["mentioned_users"], 'mention', {
+                        'post_id': post["_id"],
+                        'user': post["author"]
+                    })
+
             return jsonify({
                 'message': 'Post created successfully',
-                'post_id': post_id
+                'post_id': post_id,
+                'verification_status': VERIFICATION_PENDING if is_beizzati else None
             }), 201
 
+        except RequestEntityTooLarge:
+            return jsonify({'error': 'Upload is too large'}), 413
         except Exception as e:
             return jsonify({'error': str(e)}), 500
 
 
-    def verify_image_contains_beijjati_evidence(image_file):
-        try:
-            # Convert file stream to bytes
-            image_bytes = image_file.read()
-            image_file.seek(0)  # Reset pointer so Flask can use it again if needed
-
-            model = genai.GenerativeModel("gemini-1.5-flash")
-            
-            response = model.generate_content([
-                "Does this image show proof of solving a coding question like 'Q1', 'Q2', 'Q3' or 'Q4' with 'solved'? Respond with 'yes' or 'no' and optionally mention keywords found.",
-                {
-                    'mime_type': image_file.mimetype,
-                    'data': image_bytes,
-                }
-            ])
-
-            text = response.text.strip().lower()
-            print("Gemini response:", text)
-            print("Gemini response:", text)
-            print("Gemini response:", text)
-            print("Gemini response:", text)
-            print("Gemini response:", text)
-            print("Gemini response:", text)
-            print("Gemini response:", text)
-            print("Gemini response:", text)
-            print("Gemini response:", text)
-            print("Gemini response:", text)
-
-            return 'yes' in text  # Gemini responds with "yes" or "no"
+    @posts_bp.route('/images/<file_id>', methods=['GET'])
+    @jwt_required()
+    def get_image(file_id):
+        """Serve a stored post image to the post's author and audience.
 
-        except Exception as e:
-            print(f"Gemini OCR error: {e}")
-            print(f"Gemini OCR error: {e}")
-            print(f"Gemini OCR error: {e}")
-            print(f"Gemini OCR error: {e}")
-            print(f"Gemini OCR error: {e}")
-            print(f"Gemini OCR error: {e}")
-            return False
+        File ids are immutable, so the response is cached for a long time, but
+        only privately: another viewer must pass the same check.
+        """
+        grid_out = image_store.open(file_id)
+        # Unknown and not-visible images look the same, so ids can't be probed
+        if grid_out is None or not post_model.can_view_image(ImageStore.original_id(grid_out), get_jwt_identity()):
+            return jsonify({'error': 'Image not found'}), 404
+        response = send_file(
+            grid_out,
+            mimetype=grid_out.content_type or 'application/octet-stream',
+            max_age=365 * 24 * 3600,
+            etag=str(grid_out._id),
+            conditional=True
+        )
+        response.cache_control.immutable = True
+        response.cache_control.public = False  # Set by send_file
+        response.cache_control.private = True
+        return response
+    
+    @posts_bp.route('/verification/stats', methods=['GET'])
+    @jwt_required()
+    def get_verification_stats():
+        """Per-tier decision counts and latency of image verification in this worker"""
+        return jsonify({'tiers': VERIFICATION_STATS.snapshot()}), 200
     
     @posts_bp.route('/feed', methods=['GET'])
     @jwt_required()
     def get_feed():
         try:
             current_user_id = get_jwt_identity()
-            print(f"DEBUG: Getting feed for user: {current_user_id}")
+            logger.debug("Getting feed for user: %s", current_user_id)
             
-            posts = post_model.get_posts_for_user(current_user_id)
-            print(f"DEBUG: Found {len(posts)} posts")
-
-            # Convert all ObjectId fields to strings recursively
-            posts = convert_objectids_to_strings(posts)
+            try:
+                limit, before = parse_page_args()
+            except ValueError:
+                return jsonify({'error': 'Invalid pagination parameters'}), 400
+            
+            etag = versions.feed_etag(ObjectId(current_user_id), limit, request.args.get('before', ''))
+            cached = not_modified(etag)
+            if cached:
+                return cached
+            
+            posts, next_cursor = post_model.get_posts_for_user(current_user_id, limit, before)
+            logger.debug("Found %s posts", len(posts))
 
-            print(f"DEBUG: Successfully processed all posts")
-            return jsonify({'posts': posts}), 200
+            return with_etag(jsonify({'posts': posts, 'next_cursor': next_cursor}), etag), 200
 
         except Exception as e:
-            print(f"DEBUG: Exception in get_feed: {str(e)}")
-            import traceback
-            print(f"DEBUG: Traceback: {traceback.format_exc()}")
+            logger.exception("Error in get_feed")
             return jsonify({'error': str(e)}), 500
     
     @posts_bp.route('/user/<username>', methods=['GET'])
     @jwt_required()
     def get_user_posts(username):
         try:
+            try:
+                limit, before = parse_page_args()
+            except ValueError:
+                return jsonify({'error': 'Invalid pagination parameters'}), 400
+            
             user = user_model.get_user_by_username(username)
             if not user:
                 return jsonify({'error': 'User not found'}), 404
             
-            posts = post_model.get_posts_by_user(str(user['_id']))
+            posts, next_cursor = post_model.get_posts_by_user(str(user['_id']), limit, before, get_jwt_identity())
+            page = {'posts': posts, 'next_cursor': next_cursor}
+            # Counted once, on the first page
+            if before is None:
+                page['total'] = post_model.count_posts_by_user(user['_id'])
             
-            # Convert all ObjectId fields to strings recursively
-            posts = convert_objectids_to_strings(posts)
-            
-            return jsonify({'posts': posts}), 200
+            return jsonify(page), 200
             
         except Exception as e:
-            print(f"DEBUG: Exception in get_user_posts: {str(e)}")
-            import traceback
-            print(f"DEBUG: Traceback: {traceback.format_exc()}")
+            logger.exception("Error in get_user_posts")
             return jsonify({'error': str(e)}), 500
     
     @posts_bp.route('/mentions/<username>', methods=['GET'])
     @jwt_required()
     def get_user_mentions(username):
         try:
+            try:
+                limit, before = parse_page_args()
+            except ValueError:
+                return jsonify({'error': 'Invalid pagination parameters'}), 400
+            
             user = user_model.get_user_by_username(username)
             if not user:
                 return jsonify({'error': 'User not found'}), 404
             
-            posts = post_model.get_mentions_for_user(str(user['_id']))
+            posts, next_cursor = post_model.get_mentions_for_user(str(user['_id']), limit, before, get_jwt_identity())
+            page = {'posts': posts, 'next_cursor': next_cursor}
+            if before is None:
+                page['total'] = post_model.count_mentions_for_user(user['_id'])
+            
+            return jsonify(page), 200
+            
+        except Exception as e:
+            logger.exception("Error in get_user_mentions")
+            return jsonify({'error': str(e)}), 500
+    
+    @posts_bp.route('/<post_id>/comments', methods=['GET'])
+    @jwt_required()
+    def get_comments(post_id):
+        try:
+            try:
+                limit, before = parse_page_args()
+            except ValueError:
+                return jsonify({'error': 'Invalid pagination parameters'}), 400
+            
+            post = comment_model.get_visible_post(post_id, get_jwt_identity())
+            if not post:
+                return jsonify({'error': 'Post not found'}), 404
+            
+            comments, next_cursor = comment_model.get_comments(post, limit, before)
+            return jsonify({'comments': comments, 'next_cursor': next_cursor}), 200
+            
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+    
+    @posts_bp.route('/<post_id>/comments', methods=['POST'])
+    @jwt_required()
+    def add_comment(post_id):
+        try:
+            current_user_id = get_jwt_identity()
+            content = ((request.get_json(silent=True) or {}).get('content') or '').strip()
             
-            # Convert all ObjectId fields to strings recursively
-            posts = convert_objectids_to_strings(posts)
+            if not content:
+                return jsonify({'error': 'Content is required'}), 400
+            if len(content) > COMMENT_MAX_LENGTH:
+                return jsonify({'error': f'Comments are limited to {COMMENT_MAX_LENGTH} characters'}), 400
+            
+            post = comment_model.get_visible_post(post_id, current_user_id)
+            if not post:
+                return jsonify({'error': 'Post not found'}), 404
             
-            return jsonify({'posts': posts}), 200
+            comment = comment_model.add_comment(post, current_user_id, content)
+            if not comment:
+                return jsonify({'error': 'Failed to add comment'}), 400
+            
+            comment_model.hydrate([comment])
+            notify_post_author(post_id, current_user_id, 'post_commented', {'comment': comment})
+            return jsonify({'message': 'Comment added successfully', 'comment': comment}), 201
             
         except Exception as e:
-            print(f"DEBUG: Exception in get_user_mentions: {str(e)}")
-            import traceback
-            print(f"DEBUG: Traceback: {traceback.format_exc()}")
             return jsonify({'error': str(e)}), 500
     
     @posts_bp.route('/<post_id>/like', methods=['POST'])
@@ -188,11 +341,16 @@ def init_posts_routes(mongo):
     def like_post(post_id):
         try:
             current_user_id = get_jwt_identity()
-            result = post_model.like_post(post_id, current_user_id)
+            post = comment_model.get_visible_post(post_id, current_user_id)
+            if not post:
+                return jsonify({'error': 'Post not found'}), 404
+            
+            result = post_model.like_post(post, current_user_id)
             
             if result.modified_count == 0:
                 return jsonify({'error': 'Failed to like post'}), 400
             
+            notify_post_author(post_id, current_user_id, 'post_liked', {'liked': True})
             return jsonify({'message': 'Post liked successfully'}), 200
             
         except Exception as e:
@@ -203,11 +361,16 @@ def init_posts_routes(mongo):
     def unlike_post(post_id):
         try:
             current_user_id = get_jwt_identity()
-            result = post_model.unlike_post(post_id, current_user_id)
+            post = comment_model.get_visible_post(post_id, current_user_id)
+            if not post:
+                return jsonify({'error': 'Post not found'}), 404
+            
+            result = post_model.unlike_post(post, current_user_id)
             
             if result.modified_count == 0:
                 return jsonify({'error': 'Failed to unlike post'}), 400
             
+            notify_post_author(post_id, current_user_id, 'post_liked', {'liked': False})
             return jsonify({'message': 'Post unliked successfully'}), 200
             
         except Exception as e:
@@ -1,13 +1,27 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models.user import User
+from models.user import User, normalize_username
+from models.user_dto import FullProfile, UserCard
+from models.versions import FRIENDS, USER, Versions
+from routes.conditional import not_modified, with_etag
+from services.events import event_bus
 from bson import ObjectId
 import json
+import logging
+
+logger = logging.getLogger(__name__)
 
 users_bp = Blueprint('users', __name__)
 
 def init_users_routes(mongo):
     user_model = User(mongo.db)
+    versions = Versions(mongo.db)
+    
+    def notify(user_ids, event_type, actor_id):
+        """Push a friend-graph event carrying the acting user's card"""
+        actor = user_model.get_user_by_id(actor_id)
+        if actor and user_ids:
+            event_bus.publish(user_ids, event_type, {'user': UserCard.from_document(actor)})
     
     @users_bp.route('/search', methods=['GET'])
     @jwt_required()
@@ -17,38 +31,74 @@ def init_users_routes(mongo):
             if not query:
                 return jsonify({'users': []}), 200
             
-            users = user_model.search_users(query)
-            
-            # Remove sensitive information and convert ObjectId to string
-            for user in users:
-                user.pop('password_hash', None)
-                user['_id'] = str(user['_id'])
-                user['friends'] = [str(friend_id) for friend_id in user.get('friends', [])]
-                user['friend_requests_sent'] = [str(req_id) for req_id in user.get('friend_requests_sent', [])]
-                user['friend_requests_received'] = [str(req_id) for req_id in user.get('friend_requests_received', [])]
+            limit = max(1, min(request.args.get('limit', 10, type=int), 50))
+            users = user_model.search_users(query, limit)
             
+            # Search results are slim cards from the in-memory index: _id, username, profile_picture
             return jsonify({'users': users}), 200
             
         except Exception as e:
             return jsonify({'error': str(e)}), 500
     
+    @users_bp.route('/leaderboard', methods=['GET'])
+    @jwt_required()
+    def get_leaderboard():
+        try:
+            scope = request.args.get('scope', 'global')
+            if scope not in ('global', 'friends'):
+                return jsonify({'error': 'scope must be global or friends'}), 400
+            
+            limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+            entries, my_rank = user_model.get_leaderboard(get_jwt_identity(), scope, limit)
+            
+            return jsonify({'scope': scope, 'leaderboard': entries, 'my_rank': my_rank}), 200
+            
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+    
+    @users_bp.route('/<username>/mutual', methods=['GET'])
+    @jwt_required()
+    def get_mutual_friends(username):
+        try:
+            user = user_model.get_user_by_username(username)
+            if not user:
+                return jsonify({'error': 'User not found'}), 404
+            
+            mutual = user_model.get_mutual_friends(get_jwt_identity(), user['_id'])
+            return jsonify({'mutual_friends': mutual, 'count': len(mutual)}), 200
+            
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+    
+    @users_bp.route('/suggestions', methods=['GET'])
+    @jwt_required()
+    def get_friend_suggestions():
+        try:
+            limit = max(1, min(request.args.get('limit', 10, type=int), 50))
+            suggestions = user_model.get_friend_suggestions(get_jwt_identity(), limit)
+            return jsonify({'suggestions': suggestions}), 200
+            
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+    
     @users_bp.route('/profile/<username>', methods=['GET'])
     @jwt_required()
     def get_user_profile(username):
         try:
-            user = user_model.get_user_by_username(username)
+            viewer_id = get_jwt_identity()
+            # Relationship flags in FullProfile depend on who is asking
+            etag = versions.etag({'username_lower': normalize_username(username)}, USER, viewer_id)
+            cached = not_modified(etag)
+            if cached:
+                return cached
+            
+            user = user_model.get_user_by_username(username, fresh=True)
             
             if not user:
                 return jsonify({'error': 'User not found'}), 404
             
-            # Remove sensitive information
-            user.pop('password_hash', None)
-            user['_id'] = str(user['_id'])
-            user['friends'] = [str(friend_id) for friend_id in user.get('friends', [])]
-            user['friend_requests_sent'] = [str(req_id) for req_id in user.get('friend_requests_sent', [])]
-            user['friend_requests_received'] = [str(req_id) for req_id in user.get('friend_requests_received', [])]
-            
-            return jsonify({'user': user}), 200
+            profile = FullProfile(user, viewer_id=ObjectId(viewer_id))
+            return with_etag(jsonify({'user': profile}), etag), 200
             
         except Exception as e:
             return jsonify({'error': str(e)}), 500
@@ -84,49 +134,79 @@ def init_users_routes(mongo):
             current_user_id = get_jwt_identity()
             data = request.get_json()
             
-            print(f"DEBUG: Friend request data: {data}")
-            print(f"DEBUG: Current user ID: {current_user_id}")
-            
             receiver_username = data.get('username')
+            logger.debug("Friend request from %s to %s", current_user_id, receiver_username)
             
             if not receiver_username:
-                print("DEBUG: No username provided")
+                logger.debug("No username provided")
                 return jsonify({'error': 'Username is required'}), 400
 
             receiver = user_model.get_user_by_username(receiver_username)
             if not receiver:
-                print(f"DEBUG: User {receiver_username} not found")
+                logger.debug("User %s not found", receiver_username)
                 return jsonify({'error': 'User not found'}), 404
 
             receiver_id = str(receiver['_id'])
-            print(f"DEBUG: Receiver ID: {receiver_id}")
             
             # Check if trying to send request to self
             if current_user_id == receiver_id:
-                print("DEBUG: Trying to send friend request to self")
+                logger.debug("Trying to send friend request to self")
                 return jsonify({'error': 'Cannot send friend request to yourself'}), 400
 
             # Check if they're already friends
             if ObjectId(current_user_id) in receiver.get('friends', []):
-                print("DEBUG: Already friends")
+                logger.debug("Already friends")
                 return jsonify({'error': 'Already friends'}), 400
 
             # Check if request already sent
             if ObjectId(current_user_id) in receiver.get('friend_requests_received', []):
-                print("DEBUG: Friend request already sent")
+                logger.debug("Friend request already sent")
                 return jsonify({'error': 'Friend request already sent'}), 400
 
             result = user_model.send_friend_request(current_user_id, receiver_id)
-            print(f"DEBUG: Send friend request result: {result.modified_count}")
+            logger.debug("Send friend request result: %s", result.modified_count)
 
             if result.modified_count == 0:
-                print("DEBUG: Failed to send friend request - no documents modified")
+                logger.debug("Failed to send friend request - no documents modified")
                 return jsonify({'error': 'Failed to send friend request'}), 400
 
+            notify([receiver_id], 'friend_request', current_user_id)
             return jsonify({'message': 'Friend request sent successfully'}), 200
 
         except Exception as e:
-            print(f"DEBUG: Exception in send_friend_request: {str(e)}")
+            logger.exception("Error in send_friend_request")
+            return jsonify({'error': str(e)}), 500
+    
+    @users_bp.route('/friend-request/accept-all', methods=['POST'])
+    @users_bp.route('/friend-request/accept-many', methods=['POST'])
+    @users_bp.route('/friend-request/reject-all', methods=['POST'])
+    @users_bp.route('/friend-request/reject-many', methods=['POST'])
+    @jwt_required()
+    def handle_friend_requests_bulk():
+        """Accept or reject many pending requests in a constant number of round trips"""
+        try:
+            current_user_id = get_jwt_identity()
+            action, scope = request.path.rsplit('/', 1)[-1].split('-')
+            
+            friend_ids = None  # '-all' handles every pending request
+            if scope == 'many':
+                friend_ids = (request.get_json(silent=True) or {}).get('friend_ids')
+                if not isinstance(friend_ids, list) or not friend_ids:
+                    return jsonify({'error': 'friend_ids must be a non-empty list'}), 400
+            
+            if action == 'accept':
+                handled = user_model.accept_friend_requests(current_user_id, friend_ids)
+                notify(handled, 'friend_request_accepted', current_user_id)
+            else:
+                handled = user_model.reject_friend_requests(current_user_id, friend_ids)
+            
+            return jsonify({
+                'message': f'{len(handled)} friend requests {action}ed',
+                'friend_ids': handled
+            }), 200
+            
+        except Exception as e:
+            logger.exception("Error in handle_friend_requests_bulk")
             return jsonify({'error': str(e)}), 500
     
     @users_bp.route('/friend-request/<action>', methods=['POST'])
@@ -137,32 +217,35 @@ def init_users_routes(mongo):
             data = request.get_json()
             friend_id = data.get('friend_id')
             
-            print(f"DEBUG: {action} friend request - user: {current_user_id}, friend: {friend_id}")
+            logger.debug("%s friend request - user: %s, friend: %s", action, current_user_id, friend_id)
             
             if not friend_id:
-                print("DEBUG: No friend_id provided")
+                logger.debug("No friend_id provided")
                 return jsonify({'error': 'Friend ID is required'}), 400
             
             if action == 'accept':
                 result = user_model.accept_friend_request(current_user_id, friend_id)
                 message = 'Friend request accepted'
-                print(f"DEBUG: Accept result: {result.modified_count}")
+                logger.debug("Accept result: %s", result.modified_count)
             elif action == 'reject':
                 result = user_model.reject_friend_request(current_user_id, friend_id)
                 message = 'Friend request rejected'
-                print(f"DEBUG: Reject result: {result.modified_count}")
+                logger.debug("Reject result: %s", result.modified_count)
             else:
-                print(f"DEBUG: Invalid action: {action}")
+                logger.debug("Invalid action: %s", action)
                 return jsonify({'error': 'Invalid action'}), 400
             
             if result.modified_count == 0:
-                print(f"DEBUG: Failed to {action} friend request - no documents modified")
+                logger.debug("Failed to %s friend request - no documents modified", action)
                 return jsonify({'error': f'Failed to {action} friend request'}), 400
             
+            if action == 'accept':
+                notify([friend_id], 'friend_request_accepted', current_user_id)
+            
             return jsonify({'message': message}), 200
             
         except Exception as e:
-            print(f"DEBUG: Exception in handle_friend_request: {str(e)}")
+            logger.exception("Error in handle_friend_request")
             return jsonify({'error': str(e)}), 500
     
     @users_bp.route('/friends', methods=['GET'])
@@ -170,26 +253,20 @@ def init_users_routes(mongo):
     def get_friends():
         try:
             current_user_id = get_jwt_identity()
-            print(f"DEBUG: Getting friends for user: {current_user_id}")
+            logger.debug("Getting friends for user: %s", current_user_id)
             
-            friends = user_model.get_friends(current_user_id)
-            print(f"DEBUG: Found {len(friends)} friends")
+            etag = versions.etag({'_id': ObjectId(current_user_id)}, FRIENDS)
+            cached = not_modified(etag)
+            if cached:
+                return cached
             
-            # Convert ObjectId to string
-            for friend in friends:
-                print(f"DEBUG: Processing friend: {friend.get('_id')}")
-                friend['_id'] = str(friend['_id'])
-                friend['friends'] = [str(friend_id) for friend_id in friend.get('friends', [])]
-                friend['friend_requests_sent'] = [str(req_id) for req_id in friend.get('friend_requests_sent', [])]
-                friend['friend_requests_received'] = [str(req_id) for req_id in friend.get('friend_requests_received', [])]
+            friends = user_model.get_friends(current_user_id, fresh=True)
+            logger.debug("Found %s friends", len(friends))
             
-            print(f"DEBUG: Successfully processed all friends")
-            return jsonify({'friends': friends}), 200
+            return with_etag(jsonify({'friends': friends}), etag), 200
             
         except Exception as e:
-            print(f"DEBUG: Exception in get_friends: {str(e)}")
-            import traceback
-            print(f"DEBUG: Traceback: {traceback.format_exc()}")
+            logger.exception("Error in get_friends")
             return jsonify({'error': str(e)}), 500
     
     @users_bp.route('/friend-requests', methods=['GET'])
@@ -197,22 +274,15 @@ def init_users_routes(mongo):
     def get_friend_requests():
         try:
             current_user_id = get_jwt_identity()
-            print(f"DEBUG: Getting friend requests for user: {current_user_id}")
+            logger.debug("Getting friend requests for user: %s", current_user_id)
             
             requests = user_model.get_friend_requests(current_user_id)
-            print(f"DEBUG: Found {len(requests)} friend requests")
-            
-            # Convert ObjectId to string
-            for req in requests:
-                req['_id'] = str(req['_id'])
-                req['friends'] = [str(friend_id) for friend_id in req.get('friends', [])]
-                req['friend_requests_sent'] = [str(req_id) for req_id in req.get('friend_requests_sent', [])]
-                req['friend_requests_received'] = [str(req_id) for req_id in req.get('friend_requests_received', [])]
+            logger.debug("Found %s friend requests", len(requests))
             
             return jsonify({'friend_requests': requests}), 200
             
         except Exception as e:
-            print(f"DEBUG: Exception in get_friend_requests: {str(e)}")
+            logger.exception("Error in get_friend_requests")
             return jsonify({'error': str(e)}), 500
     
     return users_bp
@@ -0,0 +1,96 @@
+from dotenv import load_dotenv
+import os
+import queue
+import threading
+
+load_dotenv()
+
+# Undelivered events kept per connection; a slower client is told to resync
+EVENTS_QUEUE_SIZE = int(os.getenv('EVENTS_QUEUE_SIZE', '100'))
+# Open event streams allowed per process
+EVENTS_MAX_SUBSCRIBERS = int(os.getenv('EVENTS_MAX_SUBSCRIBERS', '1000'))
+# Seconds between keep-alive comments on an idle stream
+EVENTS_HEARTBEAT = float(os.getenv('EVENTS_HEARTBEAT', '15'))
+
+RESYNC = 'resync'
+
+
+class Subscription:
+    """One open event stream for a user"""
+
+    def __init__(self, user_id, maxsize=EVENTS_QUEUE_SIZE):
+        self.user_id = user_id
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._overflowed = False
+
+    def put(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            # Drop the backlog; the client refetches instead of replaying it
+            self._overflowed = True
+
+    def get(self, timeout=None):
+        """Next (type, data) event, or None when `timeout` passes without one"""
+        if self._overflowed:
+            self._overflowed = False
+            with self._queue.mutex:
+                self._queue.queue.clear()
+            return RESYNC, {}
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventBus:
+    """In-process pub/sub keyed by user id.
+
+    Publishers name the users an event is for; only their open streams
+    receive it. Events are not persisted and do not cross processes; a
+    client that reconnects refetches what it shows.
+    """
+
+    def __init__(self, max_subscribers=EVENTS_MAX_SUBSCRIBERS):
+        self.max_subscribers = max_subscribers
+        self._lock = threading.Lock()
+        self._subscriptions = {}  # str user id -> set of Subscription
+        self._count = 0
+
+    def subscribe(self, user_id):
+        """Open a subscription, or return None when the process is at capacity"""
+        with self._lock:
+            if self._count >= self.max_subscribers:
+                return None
+            subscription = Subscription(str(user_id))
+            self._subscriptions.setdefault(subscription.user_id, set()).add(subscription)
+            self._count += 1
+            return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions and subscription in subscriptions:
+                subscriptions.discard(subscription)
+                self._count -= 1
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def publish(self, user_ids, event_type, data):
+        """Deliver an event to every open stream of the given users"""
+        with self._lock:
+            targets = [
+                subscription
+                for user_id in {str(user_id) for user_id in user_ids}
+                for subscription in self._subscriptions.get(user_id, ())
+            ]
+        for subscription in targets:
+            subscription.put((event_type, data))
+        return len(targets)
+
+    def stats(self):
+        with self._lock:
+            return {"subscribers": self._count, "users": len(self._subscriptions)}
+
+
+event_bus = EventBus()
@@ -0,0 +1,105 @@
+from dotenv import load_dotenv
+import io
+import os
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+load_dotenv()
+
+# Largest accepted upload; also applied as MAX_CONTENT_LENGTH (plus room for the form fields)
+IMAGE_MAX_BYTES = int(os.getenv('IMAGE_MAX_BYTES', str(8 * 1024 * 1024)))
+IMAGE_CHUNK_SIZE = 64 * 1024
+# Refuse images that would decode to more pixels than this (decompression bombs)
+IMAGE_MAX_PIXELS = int(os.getenv('IMAGE_MAX_PIXELS', str(40_000_000)))
+# Longest side of the copy sent to verification
+VERIFY_MAX_SIDE = int(os.getenv('VERIFY_MAX_SIDE', '1600'))
+THUMBNAIL_MAX_SIDE = int(os.getenv('THUMBNAIL_MAX_SIDE', '320'))
+JPEG_QUALITY = 85
+
+ALLOWED_FORMATS = {'JPEG': 'image/jpeg', 'PNG': 'image/png', 'WEBP': 'image/webp', 'GIF': 'image/gif'}
+
+
+class ImageRejected(ValueError):
+    """Upload is not an acceptable image; the message is safe to show to the client"""
+
+
+class ProcessedImage:
+    """An upload decoded once, with the derived copies cut from it"""
+
+    __slots__ = ("original", "content_type", "width", "height", "verification", "thumbnail")
+
+    def __init__(self, original, content_type, width, height, verification, thumbnail):
+        self.original = original
+        self.content_type = content_type
+        self.width = width
+        self.height = height
+        self.verification = verification  # JPEG, longest side <= VERIFY_MAX_SIDE
+        self.thumbnail = thumbnail  # JPEG, longest side <= THUMBNAIL_MAX_SIDE
+
+
+def read_upload(file_storage, max_bytes=IMAGE_MAX_BYTES, chunk_size=IMAGE_CHUNK_SIZE):
+    """Read an uploaded file in chunks, giving up as soon as it exceeds max_bytes"""
+    buffer = io.BytesIO()
+    stream = file_storage.stream
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        if buffer.tell() + len(chunk) > max_bytes:
+            raise ImageRejected(f"Image is larger than {max_bytes // (1024 * 1024)} MB")
+        buffer.write(chunk)
+    if not buffer.tell():
+        raise ImageRejected("Image is empty")
+    return buffer.getvalue()
+
+
+def _encode_jpeg(image):
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    output = io.BytesIO()
+    image.save(output, format='JPEG', quality=JPEG_QUALITY, optimize=True)
+    return output.getvalue()
+
+
+def process_image(data):
+    """Decode an upload once and derive the verification copy and the thumbnail.
+
+    Raises ImageRejected for anything Pillow can't decode, unsupported
+    formats and images over IMAGE_MAX_PIXELS.
+    """
+    if Image is None:
+        raise RuntimeError("Pillow is required to process images")
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            if image.format not in ALLOWED_FORMATS:
+                raise ImageRejected("Unsupported image format")
+            width, height = image.size
+            if width * height > IMAGE_MAX_PIXELS:
+                raise ImageRejected("Image dimensions are too large")
+            content_type = ALLOWED_FORMATS[image.format]
+            # JPEGs can be decoded straight at a reduced scale
+            image.draft('RGB', (VERIFY_MAX_SIDE, VERIFY_MAX_SIDE))
+            image.load()
+
+            verification = image.copy()
+    except ImageRejected:
+        raise
+    except Exception as e:
+        raise ImageRejected("Could not read image") from e
+
+    verification.thumbnail((VERIFY_MAX_SIDE, VERIFY_MAX_SIDE))
+    thumbnail = verification.copy()
+    thumbnail.thumbnail((THUMBNAIL_MAX_SIDE, THUMBNAIL_MAX_SIDE))
+
+    return ProcessedImage(
+        data,
+        content_type,
+        width,
+        height,
+        _encode_jpeg(verification),
+        _encode_jpeg(thumbnail)
+    )
@@ -0,0 +1,45 @@
+from dotenv import load_dotenv
+import logging
+import os
+import random
+
+load_dotenv()
+
+# DEBUG logs every request and model decision; the default INFO keeps
+# warnings, errors and lifecycle messages
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+# Fraction of DEBUG and INFO records written; WARNING and above are always kept
+LOG_SAMPLE_RATE = float(os.getenv('LOG_SAMPLE_RATE', '1.0'))
+
+LOG_FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+
+
+class SamplingFilter(logging.Filter):
+    """Lets through `rate` of the records below WARNING, chosen at random"""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or self.rate >= 1 or random.random() < self.rate
+
+
+def configure_logging(level=LOG_LEVEL, sample_rate=LOG_SAMPLE_RATE):
+    """Send application logs to stderr at `level`, sampling the chatty levels.
+
+    Loggers check the level before formatting anything, so disabled
+    ``logger.debug("...", args)`` calls cost one comparison. Safe to call
+    more than once.
+    """
+    root = logging.getLogger()
+    root.setLevel(level)
+    handler = next((h for h in root.handlers if getattr(h, 'sampling', False)), None)
+    if handler is None:
+        handler = logging.StreamHandler()
+        handler.sampling = True
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        root.addHandler(handler)
+    # Also on the handler: Werkzeug sets its own logger to INFO
+    handler.setLevel(level)
+    handler.filters = [SamplingFilter(sample_rate)]
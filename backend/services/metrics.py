@@ -0,0 +1,206 @@
+from pymongo import monitoring
+import bisect
+import contextvars
+import threading
+
+# Upper bounds in seconds, Prometheus-style; an implicit +Inf bucket follows
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """Thread-safe fixed-bucket histogram"""
+
+    def __init__(self, buckets=DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (None if empty or past the last bucket)"""
+        with self._lock:
+            if not self.count:
+                return None
+            rank = q * self.count
+            seen = 0
+            for index, bucket_count in enumerate(self.counts):
+                seen += bucket_count
+                if seen >= rank:
+                    return self.buckets[index] if index < len(self.buckets) else None
+        return None
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "count": self.count,
+                "sum": self.sum,
+                "buckets": dict(zip(self.buckets, self.counts)),
+                "overflow": self.counts[-1]
+            }
+
+
+# Buckets for per-request Mongo command counts
+COMMAND_COUNT_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+
+def _labels_key(labels):
+    return tuple(sorted((labels or {}).items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        f'{name}="' + str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for name, value in pairs
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metrics:
+    """Labeled counters, gauges and histograms in one process.
+
+    `render` writes them in the Prometheus text exposition format. Label
+    values are passed as keyword arguments and kept as sorted tuples.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._families = {}  # name -> (type, help)
+        self._values = {}  # name -> {labels key: number or Histogram}
+
+    def _family(self, name, kind, help_text):
+        family = self._families.get(name)
+        if family is None:
+            self._families[name] = (kind, help_text)
+            self._values[name] = {}
+        elif family[0] != kind:
+            raise ValueError(f"Metric {name} is a {family[0]}, not a {kind}")
+        return self._values[name]
+
+    def inc(self, name, help_text='', value=1, **labels):
+        key = _labels_key(labels)
+        with self._lock:
+            values = self._family(name, 'counter', help_text)
+            values[key] = values.get(key, 0) + value
+
+    def set(self, name, value, help_text='', **labels):
+        with self._lock:
+            self._family(name, 'gauge', help_text)[_labels_key(labels)] = value
+
+    def histogram(self, name, help_text='', buckets=DEFAULT_LATENCY_BUCKETS, **labels):
+        """The histogram for these labels, created on first use"""
+        key = _labels_key(labels)
+        with self._lock:
+            values = self._family(name, 'histogram', help_text)
+            histogram = values.get(key)
+            if histogram is None:
+                histogram = values[key] = Histogram(buckets)
+            return histogram
+
+    def observe(self, name, value, help_text='', buckets=DEFAULT_LATENCY_BUCKETS, **labels):
+        self.histogram(name, help_text, buckets, **labels).observe(value)
+
+    def values(self, name):
+        """{sorted (label, value) tuple: number or Histogram} for one metric"""
+        with self._lock:
+            return dict(self._values.get(name, {}))
+
+    def render(self):
+        with self._lock:
+            families = sorted((name, kind, help_text, dict(self._values[name]))
+                              for name, (kind, help_text) in self._families.items())
+        lines = []
+        for name, kind, help_text, values in families:
+            if help_text:
+                lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key, value in sorted(values.items()):
+                if kind != 'histogram':
+                    lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+                    continue
+                snapshot = value.snapshot()
+                cumulative = 0
+                for bound, bucket_count in snapshot["buckets"].items():
+                    cumulative += bucket_count
+                    lines.append(f"{name}_bucket{_format_labels(key, [('le', _format_value(bound))])} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(key, [('le', '+Inf')])} {snapshot['count']}")
+                lines.append(f"{name}_sum{_format_labels(key)} {_format_value(snapshot['sum'])}")
+                lines.append(f"{name}_count{_format_labels(key)} {snapshot['count']}")
+        return '\n'.join(lines) + '\n'
+
+
+METRICS = Metrics()
+
+
+class RequestTally:
+    """Mongo commands issued while serving one request"""
+
+    __slots__ = ('commands', 'seconds')
+
+    def __init__(self):
+        self.commands = 0
+        self.seconds = 0.0
+
+
+_current_tally = contextvars.ContextVar('mongo_request_tally', default=None)
+
+
+def start_request_tally():
+    tally = RequestTally()
+    return tally, _current_tally.set(tally)
+
+
+def end_request_tally(token):
+    _current_tally.reset(token)
+
+
+def tally_command(seconds=0.0):
+    """Count one Mongo command against the current request, if any"""
+    tally = _current_tally.get()
+    if tally is not None:
+        tally.commands += 1
+        tally.seconds += seconds
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Counts and times every Mongo command, overall and for the current request.
+
+    pymongo calls listeners on the thread that ran the command, so the
+    context variable set for a request collects exactly its commands.
+    """
+
+    def __init__(self, metrics=METRICS):
+        self.metrics = metrics
+
+    def _record(self, event, outcome):
+        seconds = event.duration_micros / 1e6
+        self.metrics.inc('mongo_commands_total', 'Mongo commands by name and outcome',
+                         command=event.command_name, outcome=outcome)
+        self.metrics.observe('mongo_command_seconds', seconds, 'Mongo command round-trip time',
+                             command=event.command_name)
+        tally_command(seconds)
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event, 'ok')
+
+    def failed(self, event):
+        self._record(event, 'error')
@@ -0,0 +1,92 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dotenv import load_dotenv
+import bcrypt
+import logging
+import multiprocessing
+import os
+import threading
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# bcrypt cost factor for new hashes; stored hashes with another cost are rehashed on login
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', '12'))
+# Worker processes for hashing; 0 hashes on the calling thread
+BCRYPT_POOL_SIZE = int(os.getenv('BCRYPT_POOL_SIZE', str(os.cpu_count() or 1)))
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+
+def _check(password, password_hash):
+    return bcrypt.checkpw(password, password_hash)
+
+
+def _get_pool():
+    """Per-process pool, created on first use (and again after a fork)"""
+    global _pool, _pool_pid
+    if BCRYPT_POOL_SIZE <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            # spawn: forking a threaded server process is not safe
+            _pool = ProcessPoolExecutor(
+                max_workers=BCRYPT_POOL_SIZE,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def _run(fn, *args):
+    pool = _get_pool()
+    if pool is None:
+        return fn(*args)
+    try:
+        return pool.submit(fn, *args).result()
+    except BrokenProcessPool as e:
+        logger.warning("Password pool broke, hashing inline: %s", e)
+        shutdown_pool(wait=False)
+        return fn(*args)
+
+
+def hash_password(password, rounds=None):
+    """bcrypt hash of a str password, computed in the worker pool"""
+    return _run(_hash, password.encode('utf-8'), rounds or BCRYPT_ROUNDS)
+
+
+def check_password(password, password_hash):
+    """Check a str password against a stored bcrypt hash, in the worker pool"""
+    if isinstance(password_hash, str):
+        password_hash = password_hash.encode('utf-8')
+    return _run(_check, password.encode('utf-8'), password_hash)
+
+
+def hash_rounds(password_hash):
+    """Cost factor encoded in a bcrypt hash (`$2b$12$...`), or None if unreadable"""
+    if isinstance(password_hash, bytes):
+        password_hash = password_hash.decode('ascii', 'replace')
+    parts = password_hash.split('$')
+    try:
+        return int(parts[2])
+    except (IndexError, ValueError):
+        return None
+
+
+def needs_rehash(password_hash, rounds=None):
+    return hash_rounds(password_hash) != (rounds or BCRYPT_ROUNDS)
+
+
+def shutdown_pool(wait=True):
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=wait)
+            _pool = None
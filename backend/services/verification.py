@@ -0,0 +1,312 @@
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from services.metrics import METRICS
+import io
+import logging
+import os
+import re
+import threading
+import time
+
+try:
+    import pytesseract
+    from PIL import Image
+except ImportError:
+    pytesseract = None
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# 'gemini' (default) or 'stub'
+IMAGE_VERIFIER = os.getenv('IMAGE_VERIFIER', 'gemini')
+# Verdict returned by the stub verifier: 'accept' or 'reject'
+STUB_VERIFIER_VERDICT = os.getenv('STUB_VERIFIER_VERDICT', 'accept')
+VERIFICATION_WORKERS = int(os.getenv('VERIFICATION_WORKERS', '4'))
+# Posts waiting for or undergoing verification; beyond this, new beijjati posts are refused
+VERIFICATION_MAX_PENDING = int(os.getenv('VERIFICATION_MAX_PENDING', '64'))
+VERIFICATION_TIMEOUT = float(os.getenv('VERIFICATION_TIMEOUT', '30'))
+VERIFICATION_RETRIES = int(os.getenv('VERIFICATION_RETRIES', '2'))
+VERIFICATION_RETRY_BACKOFF = float(os.getenv('VERIFICATION_RETRY_BACKOFF', '1'))
+# Pending posts whose verification started longer ago than this are assumed
+# lost (the worker restarted or crashed) and are queued again
+VERIFICATION_STALE_AFTER = int(os.getenv('VERIFICATION_STALE_AFTER', '900'))
+# Seconds between sweeps for such posts; 0 disables the sweeper
+VERIFICATION_SWEEP_INTERVAL = int(os.getenv('VERIFICATION_SWEEP_INTERVAL', '60'))
+# Local Tesseract pass in front of Gemini
+OCR_PREFILTER = os.getenv('OCR_PREFILTER', 'true').lower() == 'true'
+# Longest image side fed to Tesseract
+OCR_MAX_SIDE = int(os.getenv('OCR_MAX_SIDE', '1600'))
+# Reject locally only when OCR read at least this many characters without any evidence
+OCR_REJECT_MIN_CHARS = int(os.getenv('OCR_REJECT_MIN_CHARS', '200'))
+
+QUESTION_PATTERN = re.compile(r'\bq\s*[1-4]\b')
+SOLVED_PATTERN = re.compile(r'\bsolved\b')
+
+VERIFICATION_PROMPT = (
+    "Does this image show proof of solving a coding question like 'Q1', 'Q2', 'Q3' or 'Q4' "
+    "with 'solved'? Respond with 'yes' or 'no' and optionally mention keywords found."
+)
+
+
+class VerificationStats:
+    """Per-tier decision counters and latency histograms, kept in `metrics`
+    so they are also exported at /api/metrics"""
+
+    DECISIONS = 'verification_decisions_total'
+    LATENCY = 'verification_seconds'
+
+    def __init__(self, metrics=METRICS):
+        self.metrics = metrics
+
+    def record(self, tier, decision, seconds=None):
+        self.metrics.inc(self.DECISIONS, 'Image verification decisions by tier', tier=tier, decision=decision)
+        if seconds is not None:
+            self.metrics.observe(self.LATENCY, seconds, 'Image verification time by tier', tier=tier)
+
+    def snapshot(self):
+        tiers = {}
+        for labels, count in self.metrics.values(self.DECISIONS).items():
+            labels = dict(labels)
+            tiers.setdefault(labels["tier"], {"decisions": {}})["decisions"][labels["decision"]] = count
+        for labels, histogram in self.metrics.values(self.LATENCY).items():
+            tiers.setdefault(dict(labels)["tier"], {"decisions": {}}).update({
+                "count": histogram.count,
+                "seconds_total": histogram.sum,
+                "p50_seconds": histogram.quantile(0.5),
+                "p99_seconds": histogram.quantile(0.99)
+            })
+        return tiers
+
+
+VERIFICATION_STATS = VerificationStats()
+
+
+def _decision(verified):
+    return {True: 'accept', False: 'reject', None: 'defer'}[verified]
+
+
+class GeminiVerifier:
+    """Asks Gemini whether an image shows a solved coding question"""
+
+    name = 'gemini'
+
+    def __init__(self, api_key=None, model_name="gemini-1.5-flash"):
+        import google.generativeai as genai
+
+        genai.configure(api_key=api_key or os.getenv('GEMINI_KEY'))
+        self.model = genai.GenerativeModel(model_name)
+
+    def verify(self, image_bytes, mimetype, timeout=None):
+        response = self.model.generate_content(
+            [VERIFICATION_PROMPT, {'mime_type': mimetype, 'data': image_bytes}],
+            request_options={'timeout': timeout} if timeout else None
+        )
+        text = response.text.strip().lower()
+        logger.debug("Gemini response: %s", text)
+        return 'yes' in text  # Gemini responds with "yes" or "no"
+
+
+class StubVerifier:
+    """Fixed verdict without any external call, for tests and local development"""
+
+    name = 'stub'
+
+    def __init__(self, verdict=True, delay=0.0):
+        self.verdict = verdict
+        self.delay = delay
+
+    def verify(self, image_bytes, mimetype, timeout=None):
+        if self.delay:
+            time.sleep(self.delay)
+        return self.verdict
+
+
+class OcrPrefilterVerifier:
+    """Cheap local Tesseract pass that settles clear cases.
+
+    `classify` returns True when the text shows a question label (Q1..Q4) and
+    "solved", False when plenty of text was read but neither shows up, and
+    None when the image should go to the remote model.
+    """
+
+    name = 'ocr'
+
+    def __init__(self, max_side=OCR_MAX_SIDE, reject_min_chars=OCR_REJECT_MIN_CHARS):
+        self.max_side = max_side
+        self.reject_min_chars = reject_min_chars
+
+    def read_text(self, image_bytes):
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            image = image.convert('L')
+            image.thumbnail((self.max_side, self.max_side))
+            return pytesseract.image_to_string(image).lower()
+
+    def classify(self, image_bytes):
+        text = self.read_text(image_bytes)
+        has_question = QUESTION_PATTERN.search(text) is not None
+        has_solved = SOLVED_PATTERN.search(text) is not None
+        if has_question and has_solved:
+            return True
+        if not has_question and not has_solved and len(text.strip()) >= self.reject_min_chars:
+            return False
+        return None
+
+
+class TieredVerifier:
+    """Local OCR first; only images it can't decide go to the remote verifier"""
+
+    name = 'tiered'
+
+    def __init__(self, local, remote, stats=VERIFICATION_STATS):
+        self.local = local
+        self.remote = remote
+        self.stats = stats
+
+    def verify(self, image_bytes, mimetype, timeout=None):
+        started = time.perf_counter()
+        try:
+            verified = self.local.classify(image_bytes)
+            self.stats.record(self.local.name, _decision(verified), time.perf_counter() - started)
+        except Exception as e:
+            logger.warning("OCR prefilter failed, deferring to %s: %s", self.remote.name, e)
+            self.stats.record(self.local.name, 'error', time.perf_counter() - started)
+            verified = None
+        if verified is not None:
+            return verified
+        return self.remote.verify(image_bytes, mimetype, timeout=timeout)
+
+
+class TimedVerifier:
+    """Records the decision and latency of every call to the wrapped verifier"""
+
+    def __init__(self, verifier, stats=VERIFICATION_STATS):
+        self.verifier = verifier
+        self.stats = stats
+        self.name = verifier.name
+
+    def verify(self, image_bytes, mimetype, timeout=None):
+        started = time.perf_counter()
+        try:
+            verified = self.verifier.verify(image_bytes, mimetype, timeout=timeout)
+        except Exception:
+            self.stats.record(self.name, 'error', time.perf_counter() - started)
+            raise
+        self.stats.record(self.name, _decision(verified), time.perf_counter() - started)
+        return verified
+
+
+class CachingVerifier:
+    """Wraps a verifier with a VerdictCache so repeat images skip the external call"""
+
+    def __init__(self, verifier, cache, stats=VERIFICATION_STATS):
+        self.verifier = verifier
+        self.cache = cache
+        self.stats = stats
+        self.name = verifier.name
+
+    def verify(self, image_bytes, mimetype, timeout=None):
+        started = time.perf_counter()
+        verified, sha256, phash = self.cache.lookup(image_bytes)
+        self.stats.record('cache', _decision(verified), time.perf_counter() - started)
+        if verified is not None:
+            return verified
+
+        verified = self.verifier.verify(image_bytes, mimetype, timeout=timeout)
+        self.cache.store(sha256, phash, verified)
+        return verified
+
+
+def build_verifier(name=None):
+    """Create the verifier selected by IMAGE_VERIFIER"""
+    name = name or IMAGE_VERIFIER
+    if name == 'stub':
+        return TimedVerifier(StubVerifier(verdict=STUB_VERIFIER_VERDICT == 'accept'))
+    if name == 'gemini':
+        remote = TimedVerifier(GeminiVerifier())
+        if OCR_PREFILTER and pytesseract is not None:
+            return TieredVerifier(OcrPrefilterVerifier(), remote)
+        return remote
+    raise ValueError(f"Unknown image verifier: {name}")
+
+
+class VerificationPipeline:
+    """Runs image verification off the request thread.
+
+    Work goes to a bounded thread pool. A slot must be reserved before the
+    post is created, so a full queue is reported to the client instead of
+    piling up. Each job is retried with exponential backoff; when it
+    finishes, `on_complete(post_id, verified)` is called from the worker.
+    Failures that outlast the retries count as rejections.
+    """
+
+    def __init__(self, verifier, on_complete, max_workers=VERIFICATION_WORKERS,
+                 max_pending=VERIFICATION_MAX_PENDING, timeout=VERIFICATION_TIMEOUT,
+                 retries=VERIFICATION_RETRIES, backoff=VERIFICATION_RETRY_BACKOFF):
+        self.verifier = verifier
+        self.on_complete = on_complete
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='verify')
+        self._sweeper = None
+        self._sweeper_lock = threading.Lock()
+
+    def reserve(self):
+        """Claim a queue slot; returns False when the pipeline is saturated"""
+        return self._slots.acquire(blocking=False)
+
+    def release(self):
+        """Give back a reserved slot that will not be submitted"""
+        self._slots.release()
+
+    def submit(self, post_id, image_bytes, mimetype):
+        """Queue verification for a post; the caller must hold a reserved slot"""
+        return self._executor.submit(self._run, post_id, image_bytes, mimetype)
+
+    def _verify_with_retries(self, image_bytes, mimetype):
+        for attempt in range(self.retries + 1):
+            try:
+                return self.verifier.verify(image_bytes, mimetype, timeout=self.timeout)
+            except Exception as e:
+                logger.warning("Image verification attempt %d failed: %s", attempt + 1, e)
+                if attempt < self.retries:
+                    time.sleep(self.backoff * (2 ** attempt))
+        return False
+
+    def _run(self, post_id, image_bytes, mimetype):
+        try:
+            verified = self._verify_with_retries(image_bytes, mimetype)
+            self.on_complete(post_id, verified)
+            return verified
+        except Exception as e:
+            logger.exception("Error completing verification for post %s", post_id)
+            return False
+        finally:
+            self._slots.release()
+
+    def start_sweeper(self, sweep, interval=VERIFICATION_SWEEP_INTERVAL):
+        """Call `sweep()` now and every `interval` seconds on a daemon thread.
+
+        Only the first call starts the thread; later calls return at once.
+        """
+        if self._sweeper is not None or interval <= 0:
+            return
+        with self._sweeper_lock:
+            if self._sweeper is not None:
+                return
+
+            def loop():
+                while True:
+                    try:
+                        sweep()
+                    except Exception:
+                        logger.exception("Error sweeping stale verifications")
+                    time.sleep(interval)
+
+            self._sweeper = threading.Thread(target=loop, name='verify-sweeper', daemon=True)
+            self._sweeper.start()
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
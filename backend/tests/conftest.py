@@ -0,0 +1,90 @@
+"""Shared fixtures: the whole app on an in-memory mongomock database.
+
+    pip install pytest mongomock
+    python -m pytest -q
+
+Blueprints can only be registered once per process, so the app is built
+once per session and tests keep apart by using unique usernames.
+"""
+import os
+import sys
+import uuid
+
+import pytest
+
+os.environ.setdefault('IMAGE_VERIFIER', 'stub')
+os.environ.setdefault('BCRYPT_POOL_SIZE', '0')
+os.environ.setdefault('BCRYPT_ROUNDS', '4')
+os.environ.setdefault('MONGO_ENSURE_INDEXES', 'false')
+os.environ.setdefault('VERIFICATION_SWEEP_INTERVAL', '0')
+os.environ.setdefault('JWT_SECRET_KEY', 'test-secret-key-that-is-long-enough')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+mongomock = pytest.importorskip('mongomock')
+import mongomock.gridfs  # noqa: E402
+
+mongomock.gridfs.enable_gridfs_integration()
+
+
+class MockPyMongo:
+    """Stands in for flask_pymongo.PyMongo"""
+
+    instance = None
+
+    def __init__(self, app=None, **kwargs):
+        self.cx = mongomock.MongoClient()
+        self.db = self.cx.beizzati_tracker
+        MockPyMongo.instance = self
+
+
+@pytest.fixture(scope='session')
+def app_and_db():
+    import app as app_module
+    app_module.PyMongo = MockPyMongo
+    application = app_module.create_app()
+    application.testing = True
+    return application, MockPyMongo.instance.db
+
+
+@pytest.fixture
+def client(app_and_db):
+    return app_and_db[0].test_client()
+
+
+@pytest.fixture
+def db(app_and_db):
+    return app_and_db[1]
+
+
+@pytest.fixture
+def register(client):
+    """Create a user with a unique name; returns (username, auth headers)"""
+    def register(prefix='user'):
+        username = f"{prefix}{uuid.uuid4().hex[:8]}"
+        response = client.post('/api/auth/register', json={
+            'username': username, 'email': f'{username}@example.com', 'password': 'password'
+        })
+        assert response.status_code == 201, response.get_json()
+        return username, {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+    return register
+
+
+@pytest.fixture
+def befriend(client):
+    def befriend(headers_a, headers_b, username_b):
+        client.post('/api/users/friend-request', headers=headers_a, json={'username': username_b})
+        assert client.post('/api/users/friend-request/accept-all', headers=headers_b).status_code == 200
+    return befriend
+
+
+@pytest.fixture
+def create_post(client):
+    def create_post(headers, content='hello', mentioned=()):
+        import json
+        response = client.post('/api/posts', headers=headers, content_type='multipart/form-data', data={
+            'content': content, 'is_beizzati': 'false', 'mentioned_users': json.dumps(list(mentioned))
+        })
+        assert response.status_code == 201, response.get_json()
+        return response.get_json()['post_id']
+    return create_post
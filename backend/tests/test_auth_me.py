@@ -0,0 +1,13 @@
+def test_me_returns_counts_not_id_arrays(client, register, befriend):
+    _, headers = register('me')
+    friend, friend_headers = register('mefriend')
+    _, requester_headers = register('mereq')
+    befriend(headers, friend_headers, friend)
+    me = client.get('/api/auth/me', headers=headers).get_json()['user']
+    client.post('/api/users/friend-request', headers=requester_headers, json={'username': me['username']})
+
+    user = client.get('/api/auth/me', headers=headers).get_json()['user']
+    assert user['friends_count'] == 1
+    assert user['friend_requests_sent_count'] == 0
+    assert user['friend_requests_received_count'] == 1
+    assert not {'friends', 'friend_requests_sent', 'friend_requests_received', 'password_hash'} & set(user)
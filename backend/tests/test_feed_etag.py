@@ -0,0 +1,32 @@
+def test_feed_revalidates_after_commenter_changes_card(client, register, befriend, create_post):
+    author, author_headers = register('author')
+    viewer, viewer_headers = register('viewer')
+    commenter, commenter_headers = register('commenter')
+    befriend(author_headers, viewer_headers, viewer)
+    befriend(author_headers, commenter_headers, commenter)
+    post_id = create_post(author_headers)
+    # The commenter can see the post but is not the viewer's friend
+    response = client.post(f'/api/posts/{post_id}/comments', headers=commenter_headers, json={'content': 'nice'})
+    assert response.status_code == 201
+
+    first = client.get('/api/posts/feed', headers=viewer_headers)
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+
+    client.put('/api/users/profile', headers=commenter_headers, json={'profile_picture': 'https://example.com/new.png'})
+
+    again = client.get('/api/posts/feed', headers=dict(viewer_headers, **{'If-None-Match': etag}))
+    fresh = client.get('/api/posts/feed', headers=viewer_headers)
+    # Either the cached copy is still accurate, or the ETag must have changed
+    if again.status_code == 304:
+        assert fresh.get_json() == first.get_json()
+    preview_author = fresh.get_json()['posts'][0]['comment_preview'][0]['author']
+    assert preview_author['username'] == commenter
+    assert 'profile_picture' not in preview_author
+
+
+def test_feed_unchanged_is_304(client, register, create_post):
+    _, headers = register('solo')
+    create_post(headers)
+    etag = client.get('/api/posts/feed', headers=headers).headers['ETag']
+    assert client.get('/api/posts/feed', headers=dict(headers, **{'If-None-Match': etag})).status_code == 304
@@ -0,0 +1,34 @@
+import mongomock
+
+from models.friend_graph import FriendGraph
+
+
+def make_graph(friendships, users=4):
+    collection = mongomock.MongoClient().db.users
+    ids = collection.insert_many([{"friends": []} for _ in range(users)]).inserted_ids
+    for a, b in friendships:
+        collection.update_one({"_id": ids[a]}, {"$push": {"friends": ids[b]}})
+        collection.update_one({"_id": ids[b]}, {"$push": {"friends": ids[a]}})
+    return collection, ids, FriendGraph(collection)
+
+
+def test_mutual_friends_and_suggestions():
+    collection, ids, graph = make_graph([(0, 1), (1, 2), (0, 3), (3, 2)])
+    assert sorted(graph.mutual_friends(ids[0], ids[2])) == sorted([ids[1], ids[3]])
+    assert graph.suggestions(ids[0]) == [(ids[2], 2)]
+
+
+def test_friendship_added_during_reload_survives_the_swap():
+    collection, ids, graph = make_graph([(0, 1)])
+    graph.mutual_friends(ids[0], ids[1])
+    find = collection.find
+
+    def find_then_befriend(*args, **kwargs):
+        cursor = list(find(*args, **kwargs))
+        # Written after the reload read its snapshot
+        graph.add_friendships(ids[2], [ids[1]])
+        return cursor
+
+    collection.find = find_then_befriend
+    graph._loaded_at = -float("inf")
+    assert graph.mutual_friends(ids[0], ids[2]) == [ids[1]]
@@ -0,0 +1,45 @@
+import mongomock
+
+from models.leaderboard import Leaderboard
+
+
+def make_board(counts, size=3):
+    collection = mongomock.MongoClient().db.users
+    ids = collection.insert_many([
+        {"username": f"user{index}", "beijjati_count": count} for index, count in enumerate(counts)
+    ]).inserted_ids
+    return collection, ids, Leaderboard(collection, size=size)
+
+
+def test_increment_after_reload_is_not_counted_twice():
+    collection, ids, board = make_board([5, 6, 1])
+    board.top()
+    collection.update_one({"_id": ids[1]}, {"$inc": {"beijjati_count": 1}})
+    # A reload lands between the Mongo write and the in-memory update
+    board._loaded_at = None
+    board.top()
+    board.increment([ids[1]])
+
+    top = board.top()
+    assert top[0]["user"].username == "user1"
+    assert top[0]["user"].beijjati_count == 7
+
+
+def test_increment_places_new_user_on_full_board():
+    collection, ids, board = make_board([5, 4, 3, 1])
+    board.top()
+    collection.update_one({"_id": ids[3]}, {"$inc": {"beijjati_count": 9}})
+    board.increment([ids[3]])
+    assert [entry["user"].username for entry in board.top()] == ["user3", "user0", "user1"]
+
+
+def test_rank_outside_board_is_counted_once():
+    collection, ids, board = make_board([9, 8, 7, 2, 1])
+    board.top()
+    calls = []
+    count_documents = collection.count_documents
+    collection.count_documents = lambda *args, **kwargs: calls.append(args) or count_documents(*args, **kwargs)
+
+    assert board.rank_of({"_id": ids[4], "beijjati_count": 1}) == 5
+    assert board.rank_of({"_id": ids[4], "beijjati_count": 1}) == 5
+    assert len(calls) == 1
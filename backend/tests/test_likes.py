@@ -0,0 +1,25 @@
+from bson import ObjectId
+
+
+def test_stranger_cannot_like_or_unlike(client, db, register, create_post):
+    _, author_headers = register('liked')
+    _, stranger_headers = register('stranger')
+    post_id = create_post(author_headers)
+
+    assert client.post(f'/api/posts/{post_id}/like', headers=stranger_headers).status_code == 404
+    assert client.post(f'/api/posts/{post_id}/unlike', headers=stranger_headers).status_code == 404
+    assert db.likes.count_documents({'post_id': ObjectId(post_id)}) == 0
+    post = client.get('/api/posts/feed', headers=author_headers).get_json()['posts'][0]
+    assert post['like_count'] == 0
+
+
+def test_friend_can_like_and_unlike(client, register, befriend, create_post):
+    _, author_headers = register('liked')
+    friend, friend_headers = register('liker')
+    befriend(author_headers, friend_headers, friend)
+    post_id = create_post(author_headers)
+
+    assert client.post(f'/api/posts/{post_id}/like', headers=friend_headers).status_code == 200
+    assert client.get('/api/posts/feed', headers=friend_headers).get_json()['posts'][0]['liked_by_me']
+    assert client.post(f'/api/posts/{post_id}/unlike', headers=friend_headers).status_code == 200
+    assert client.get('/api/posts/feed', headers=author_headers).get_json()['posts'][0]['like_count'] == 0
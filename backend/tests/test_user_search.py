@@ -0,0 +1,53 @@
+import mongomock
+
+from models.user_search import UserSearchIndex
+
+
+def make_index(usernames):
+    collection = mongomock.MongoClient().db.users
+    ids = collection.insert_many([
+        {"username": name, "username_lower": name.lower(), "profile_picture": "", "beijjati_count": 3}
+        for name in usernames
+    ]).inserted_ids
+    return collection, ids, UserSearchIndex(collection)
+
+
+def test_search_is_served_from_memory_after_load():
+    collection, ids, index = make_index(["Alice", "alicia", "bob"])
+    index.search("ali")
+    calls = []
+    find = collection.find
+    collection.find = lambda *args, **kwargs: calls.append(args) or find(*args, **kwargs)
+
+    results = index.search("ali")
+    assert [user["username"] for user in results] == ["Alice", "alicia"]
+    assert set(results[0]) == {"_id", "username", "profile_picture"}
+    assert calls == []
+
+
+def test_update_and_add_apply_without_reload():
+    collection, ids, index = make_index(["carol"])
+    index.search("c")
+    index.update(ids[0], {"profile_picture": "carol.png", "bio": "hi"})
+    index.add({"_id": "new", "username": "Cara", "username_lower": "cara"})
+
+    assert index.search("car") == [
+        {"_id": "new", "username": "Cara", "profile_picture": ""},
+        {"_id": ids[0], "username": "carol", "profile_picture": "carol.png"},
+    ]
+
+
+def test_changes_during_reload_survive_the_swap():
+    collection, ids, index = make_index(["dave"])
+    index.search("d")
+    find = collection.find
+
+    def find_then_update(*args, **kwargs):
+        cursor = list(find(*args, **kwargs))
+        # Written after the reload read its snapshot
+        index.update(ids[0], {"profile_picture": "dave.png"})
+        return cursor
+
+    collection.find = find_then_update
+    index._loaded_at = -float("inf")
+    assert index.search("dave")[0]["profile_picture"] == "dave.png"
@@ -0,0 +1,106 @@
+import React, { useState } from "react";
+import { Send } from "lucide-react";
+import { postsAPI } from "../services/api";
+import type { Comment, Post } from "../services/api";
+
+interface CommentSectionProps {
+  post: Post;
+  onCommentAdded: (comment: Comment) => void;
+}
+
+const CommentSection: React.FC<CommentSectionProps> = ({
+  post,
+  onCommentAdded,
+}) => {
+  // Until "View all" is used, only the preview embedded in the post is shown
+  const [comments, setComments] = useState<Comment[] | null>(null);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loading, setLoading] = useState(false);
+  const [content, setContent] = useState("");
+  const [submitting, setSubmitting] = useState(false);
+
+  const loadComments = async (before?: string) => {
+    setLoading(true);
+    try {
+      const response = await postsAPI.getComments(post._id, before);
+      setComments((prev) =>
+        before && prev ? [...prev, ...response.comments] : response.comments
+      );
+      setNextCursor(response.next_cursor);
+    } catch (error) {
+      console.error("Failed to load comments:", error);
+    } finally {
+      setLoading(false);
+    }
+  };
+
+  const handleSubmit = async (e: React.FormEvent) => {
+    e.preventDefault();
+    if (!content.trim()) return;
+
+    setSubmitting(true);
+    try {
+      const response = await postsAPI.addComment(post._id, content.trim());
+      setComments((prev) => (prev ? [response.comment, ...prev] : prev));
+      onCommentAdded(response.comment);
+      setContent("");
+    } catch (error) {
+      console.error("Failed to add comment:", error);
+    } finally {
+      setSubmitting(false);
+    }
+  };
+
+  // Preview is stored oldest first; the full list comes back newest first
+  const visibleComments = comments ?? [...post.comment_preview].reverse();
+  const hasMore = comments
+    ? nextCursor !== null
+    : post.comment_count > post.comment_preview.length;
+
+  return (
+    <div className="mt-4 space-y-3">
+      {visibleComments.map((comment) => (
+        <div key={comment._id} className="text-sm">
+          <span className="font-medium text-gray-900 mr-2">
+            {comment.author?.username ?? "Unknown"}
+          </span>
+          <span className="text-gray-700">{comment.content}</span>
+        </div>
+      ))}
+
+      {hasMore && (
+        <button
+          onClick={() => loadComments(comments ? nextCursor ?? undefined : undefined)}
+          disabled={loading}
+          className="text-sm font-medium text-blue-600 hover:text-blue-800"
+        >
+          {loading
+            ? "Loading..."
+            : comments
+            ? "Load more comments"
+            : `View all ${post.comment_count} comments`}
+        </button>
+      )}
+
+      <form onSubmit={handleSubmit} className="flex items-center space-x-2">
+        <input
+          type="text"
+          value={content}
+          onChange={(e) => setContent(e.target.value)}
+          placeholder="Write a comment..."
+          maxLength={1000}
+          className="flex-1 px-3 py-2 border border-gray-300 rounded-md text-sm focus:outline-none focus:ring-2 focus:ring-blue-500"
+        />
+        <button
+          type="submit"
+          disabled={submitting || !content.trim()}
+          className="p-2 text-blue-600 hover:text-blue-800 disabled:opacity-50"
+        >
+          <Send className="w-4 h-4" />
+        </button>
+      </form>
+    </div>
+  );
+};
+
+export default CommentSection;
@@ -3,13 +3,13 @@ import { Link, useNavigate } from 'react-router-dom';
 import { Search, Bell, User, LogOut, Settings } from 'lucide-react';
 import { useAuth } from '../context/AuthContext';
 import { usersAPI } from '../services/api';
-import type { User as UserType } from '../services/api';
+import type { UserSearchResult } from '../services/api';
 
 const Header: React.FC = () => {
   const { user, logout } = useAuth();
   const navigate = useNavigate();
   const [searchQuery, setSearchQuery] = useState('');
-  const [searchResults, setSearchResults] = useState<UserType[]>([]);
+  const [searchResults, setSearchResults] = useState<UserSearchResult[]>([]);
   const [showSearchResults, setShowSearchResults] = useState(false);
   const [showUserMenu, setShowUserMenu] = useState(false);
 
@@ -83,7 +83,6 @@ const Header: React.FC = () => {
                       </div>
                       <div>
                         <p className="font-medium text-gray-900">{searchUser.username}</p>
-                        <p className="text-sm text-gray-500">Beijjati Count: {searchUser.beijjati_count}</p>
                       </div>
                     </div>
                   </div>
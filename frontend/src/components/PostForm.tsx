@@ -1,7 +1,7 @@
 import React, { useState } from "react";
 import { Send, Users } from "lucide-react";
 import { postsAPI, usersAPI } from "../services/api";
-import type { Post, User } from "../services/api";
+import type { Post, UserSearchResult } from "../services/api";
 
 interface PostFormProps {
   onPostCreated: (post: Post) => void;
@@ -11,8 +11,8 @@ const PostForm: React.FC<PostFormProps> = ({ onPostCreated }) => {
   const [content, setContent] = useState("");
   const [isBeizzati, setisBeizzati] = useState(false);
   const [mentionQuery, setMentionQuery] = useState("");
-  const [mentionedUsers, setMentionedUsers] = useState<User[]>([]);
-  const [searchResults, setSearchResults] = useState<User[]>([]);
+  const [mentionedUsers, setMentionedUsers] = useState<UserSearchResult[]>([]);
+  const [searchResults, setSearchResults] = useState<UserSearchResult[]>([]);
   const [showMentionSearch, setShowMentionSearch] = useState(false);
   const [loading, setLoading] = useState(false);
   const [image, setImage] = useState<File | null>(null);
@@ -39,7 +39,7 @@ const PostForm: React.FC<PostFormProps> = ({ onPostCreated }) => {
     }
   };
 
-  const addMentionedUser = (user: User) => {
+  const addMentionedUser = (user: UserSearchResult) => {
     setMentionedUsers([...mentionedUsers, user]);
     setMentionQuery("");
     setShowMentionSearch(false);
@@ -72,20 +72,18 @@ const PostForm: React.FC<PostFormProps> = ({ onPostCreated }) => {
         author: {
           _id: "current-user-id",
           username: "You",
-          email: "",
           beijjati_count: 0,
-          friends: [],
-          friend_requests_sent: [],
-          friend_requests_received: [],
-          created_at: new Date().toISOString(),
         },
         content,
         is_beizzati: isBeizzati,
+        verification_status: response.verification_status ?? undefined,
         mentioned_users: mentionedUsers.map((user) => user._id),
         mentioned_users_details: mentionedUsers,
         visible_to: [],
-        likes: [],
-        comments: [],
+        like_count: 0,
+        liked_by_me: false,
+        comment_count: 0,
+        comment_preview: [],
         created_at: new Date().toISOString(),
       };
 
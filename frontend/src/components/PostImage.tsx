@@ -0,0 +1,68 @@
+import React, { useEffect, useState } from "react";
+import { postsAPI } from "../services/api";
+import type { PostImage as PostImageRef } from "../services/api";
+
+interface PostImageProps {
+  image: PostImageRef;
+}
+
+// Images need the JWT, which a plain <img src> can't send, so they are
+// fetched as blobs and shown through object URLs
+const PostImage: React.FC<PostImageProps> = ({ image }) => {
+  const [thumbnailUrl, setThumbnailUrl] = useState<string | null>(null);
+
+  useEffect(() => {
+    let objectUrl: string | null = null;
+    let cancelled = false;
+    postsAPI
+      .getImage(image.thumbnail_id)
+      .then((blob) => {
+        if (cancelled) return;
+        objectUrl = URL.createObjectURL(blob);
+        setThumbnailUrl(objectUrl);
+      })
+      .catch((error) => console.error("Failed to load image:", error));
+    return () => {
+      cancelled = true;
+      if (objectUrl) URL.revokeObjectURL(objectUrl);
+    };
+  }, [image.thumbnail_id]);
+
+  const openOriginal = async () => {
+    // Opened synchronously so popup blockers allow it, then pointed at the blob
+    const tab = window.open("", "_blank");
+    try {
+      const blob = await postsAPI.getImage(image.file_id);
+      const objectUrl = URL.createObjectURL(blob);
+      if (tab) {
+        tab.location.href = objectUrl;
+      }
+      setTimeout(() => URL.revokeObjectURL(objectUrl), 60000);
+    } catch (error) {
+      tab?.close();
+      console.error("Failed to load image:", error);
+    }
+  };
+
+  return (
+    <button type="button" onClick={openOriginal} className="mt-3 block">
+      {thumbnailUrl ? (
+        <img
+          src={thumbnailUrl}
+          alt="Post attachment"
+          className="rounded-lg border border-gray-200 max-h-80"
+        />
+      ) : (
+        <div
+          className="rounded-lg border border-gray-200 bg-gray-100 animate-pulse"
+          style={{
+            width: Math.min(image.width, 320),
+            aspectRatio: `${image.width} / ${image.height}`,
+          }}
+        />
+      )}
+    </button>
+  );
+};
+
+export default PostImage;
@@ -5,29 +5,107 @@ import {
   MoreHorizontal,
   Users,
   Clock,
+  Trophy,
 } from "lucide-react";
 import { postsAPI, usersAPI } from "../services/api";
 import { useAuth } from "../context/AuthContext";
 import PostForm from "../components/PostForm";
-import type { Post, User } from "../services/api";
+import CommentSection from "../components/CommentSection";
+import PostImage from "../components/PostImage";
+import { subscribeToEvents } from "../services/events";
+import type {
+  Comment,
+  FriendSuggestion,
+  LeaderboardEntry,
+  LeaderboardScope,
+  Post,
+  UserCard,
+} from "../services/api";
 
 const Home: React.FC = () => {
   const { user } = useAuth();
   const [posts, setPosts] = useState<Post[]>([]);
   const [loading, setLoading] = useState(true);
-  const [friends, setFriends] = useState<User[]>([]);
-  const [friendRequests, setFriendRequests] = useState<User[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [friends, setFriends] = useState<UserCard[]>([]);
+  const [friendRequests, setFriendRequests] = useState<UserCard[]>([]);
+  const [leaderboardScope, setLeaderboardScope] =
+    useState<LeaderboardScope>("global");
+  const [leaderboard, setLeaderboard] = useState<LeaderboardEntry[]>([]);
+  const [myRank, setMyRank] = useState<number | null>(null);
+  const [suggestions, setSuggestions] = useState<FriendSuggestion[]>([]);
+  const [openComments, setOpenComments] = useState<Set<string>>(new Set());
 
   useEffect(() => {
     loadFeed();
     loadFriends();
     loadFriendRequests();
-  }, [posts]);
+    loadSuggestions();
+  }, []);
+
+  // Live updates instead of refetching the feed and friend requests
+  useEffect(
+    () =>
+      subscribeToEvents({
+        post_created: ({ post }) =>
+          setPosts((prevPosts) =>
+            prevPosts.some((existing) => existing._id === post._id)
+              ? prevPosts.map((existing) =>
+                  existing._id === post._id ? post : existing
+                )
+              : [post, ...prevPosts]
+          ),
+        post_verified: ({ post_id, verification_status, is_beizzati }) =>
+          setPosts((prevPosts) =>
+            prevPosts.map((post) =>
+              post._id === post_id
+                ? { ...post, verification_status, is_beizzati }
+                : post
+            )
+          ),
+        post_liked: ({ post_id, like_count }) =>
+          setPosts((prevPosts) =>
+            prevPosts.map((post) =>
+              post._id === post_id ? { ...post, like_count } : post
+            )
+          ),
+        post_commented: ({ post_id, comment, comment_count }) =>
+          setPosts((prevPosts) =>
+            prevPosts.map((post) =>
+              post._id === post_id
+                ? {
+                    ...post,
+                    comment_count,
+                    comment_preview: [...post.comment_preview, comment].slice(
+                      -3
+                    ),
+                  }
+                : post
+            )
+          ),
+        friend_request: () => loadFriendRequests(),
+        friend_request_accepted: () => {
+          loadFriends();
+          loadSuggestions();
+        },
+        resync: () => {
+          loadFeed();
+          loadFriendRequests();
+        },
+      }),
+    []
+  );
+
+  useEffect(() => {
+    loadLeaderboard(leaderboardScope);
+  }, [leaderboardScope]);
 
   const loadFeed = async () => {
     try {
       const response = await postsAPI.getFeed();
       setPosts(response.posts);
+      setNextCursor(response.next_cursor);
     } catch (error) {
       console.error("Failed to load feed:", error);
     } finally {
@@ -35,6 +113,21 @@ const Home: React.FC = () => {
     }
   };
 
+  const loadMorePosts = async () => {
+    if (!nextCursor) return;
+
+    setLoadingMore(true);
+    try {
+      const response = await postsAPI.getFeed(nextCursor);
+      setPosts((prevPosts) => [...prevPosts, ...response.posts]);
+      setNextCursor(response.next_cursor);
+    } catch (error) {
+      console.error("Failed to load more posts:", error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const loadFriends = async () => {
     try {
       const response = await usersAPI.getFriends();
@@ -44,6 +137,36 @@ const Home: React.FC = () => {
     }
   };
 
+  const loadSuggestions = async () => {
+    try {
+      const response = await usersAPI.getFriendSuggestions();
+      setSuggestions(response.suggestions);
+    } catch (error) {
+      console.error("Failed to load suggestions:", error);
+    }
+  };
+
+  const handleAddSuggestion = async (username: string) => {
+    try {
+      await usersAPI.sendFriendRequest(username);
+      setSuggestions((prev) =>
+        prev.filter((suggestion) => suggestion.user.username !== username)
+      );
+    } catch (error) {
+      console.error("Failed to send friend request:", error);
+    }
+  };
+
+  const loadLeaderboard = async (scope: LeaderboardScope) => {
+    try {
+      const response = await usersAPI.getLeaderboard(scope);
+      setLeaderboard(response.leaderboard);
+      setMyRank(response.my_rank);
+    } catch (error) {
+      console.error("Failed to load leaderboard:", error);
+    }
+  };
+
   const loadFriendRequests = async () => {
     try {
       const response = await usersAPI.getFriendRequests();
@@ -65,10 +188,11 @@ const Home: React.FC = () => {
       setPosts((prevPosts) =>
         prevPosts.map((post) => {
           if (post._id === postId) {
-            const updatedLikes = isLiked
-              ? post.likes.filter((like) => like !== user?._id)
-              : [...post.likes, user?._id || ""];
-            return { ...post, likes: updatedLikes };
+            return {
+              ...post,
+              like_count: post.like_count + (isLiked ? -1 : 1),
+              liked_by_me: !isLiked,
+            };
           }
           return post;
         })
@@ -78,6 +202,32 @@ const Home: React.FC = () => {
     }
   };
 
+  const toggleComments = (postId: string) => {
+    setOpenComments((prev) => {
+      const next = new Set(prev);
+      if (next.has(postId)) {
+        next.delete(postId);
+      } else {
+        next.add(postId);
+      }
+      return next;
+    });
+  };
+
+  const handleCommentAdded = (postId: string, comment: Comment) => {
+    setPosts((prevPosts) =>
+      prevPosts.map((post) =>
+        post._id === postId
+          ? {
+              ...post,
+              comment_count: post.comment_count + 1,
+              comment_preview: [...post.comment_preview, comment].slice(-3),
+            }
+          : post
+      )
+    );
+  };
+
   const handlePostCreated = (newPost: Post) => {
     setPosts((prevPosts) => [newPost, ...prevPosts]);
   };
@@ -93,6 +243,16 @@ const Home: React.FC = () => {
     }
   };
 
+  const handleAcceptAllFriendRequests = async () => {
+    try {
+      await usersAPI.acceptAllFriendRequests();
+      loadFriends();
+      loadFriendRequests();
+    } catch (error) {
+      console.error("Failed to accept friend requests:", error);
+    }
+  };
+
   const handleRejectFriendRequest = async (friendId: string) => {
     try {
       await usersAPI.rejectFriendRequest(friendId);
@@ -153,6 +313,85 @@ const Home: React.FC = () => {
               </div>
             </div>
 
+            {/* People You May Know */}
+            {suggestions.length > 0 && (
+              <div className="bg-white rounded-lg shadow-sm border border-gray-200 p-6 mb-6">
+                <h3 className="text-lg font-semibold text-gray-900 mb-4">
+                  People You May Know
+                </h3>
+                <div className="space-y-3">
+                  {suggestions.map((suggestion) => (
+                    <div
+                      key={suggestion.user._id}
+                      className="flex items-center justify-between"
+                    >
+                      <div>
+                        <p className="font-medium text-gray-900">
+                          {suggestion.user.username}
+                        </p>
+                        <p className="text-xs text-gray-500">
+                          {suggestion.mutual_count} mutual friend
+                          {suggestion.mutual_count === 1 ? "" : "s"}
+                        </p>
+                      </div>
+                      <button
+                        onClick={() =>
+                          handleAddSuggestion(suggestion.user.username)
+                        }
+                        className="text-sm font-medium text-blue-600 hover:text-blue-800"
+                      >
+                        Add
+                      </button>
+                    </div>
+                  ))}
+                </div>
+              </div>
+            )}
+
+            {/* Leaderboard */}
+            <div className="bg-white rounded-lg shadow-sm border border-gray-200 p-6 mb-6">
+              <h3 className="text-lg font-semibold text-gray-900 mb-4 flex items-center">
+                <Trophy className="w-5 h-5 mr-2" />
+                Leaderboard
+              </h3>
+              <div className="flex space-x-2 mb-4">
+                {(["global", "friends"] as LeaderboardScope[]).map((scope) => (
+                  <button
+                    key={scope}
+                    onClick={() => setLeaderboardScope(scope)}
+                    className={`px-3 py-1 rounded-full text-sm font-medium ${
+                      leaderboardScope === scope
+                        ? "bg-red-100 text-red-800"
+                        : "text-gray-600 hover:bg-gray-100"
+                    }`}
+                  >
+                    {scope === "global" ? "Everyone" : "Friends"}
+                  </button>
+                ))}
+              </div>
+              <div className="space-y-2">
+                {leaderboard.map((entry) => (
+                  <div
+                    key={entry.user._id}
+                    className="flex items-center justify-between"
+                  >
+                    <span className="text-gray-900">
+                      <span className="text-gray-500 mr-2">#{entry.rank}</span>
+                      {entry.user.username}
+                    </span>
+                    <span className="font-semibold text-red-600">
+                      {entry.user.beijjati_count}
+                    </span>
+                  </div>
+                ))}
+              </div>
+              {myRank !== null && (
+                <p className="mt-4 text-sm text-gray-600">
+                  Your rank: <span className="font-semibold">#{myRank}</span>
+                </p>
+              )}
+            </div>
+
             {/* Friend Requests */}
             {friendRequests.length > 0 && (
               <div className="bg-white rounded-lg shadow-sm border border-gray-200 p-6">
@@ -162,6 +401,14 @@ const Home: React.FC = () => {
                   <span className="ml-2 bg-red-100 text-red-800 text-xs font-medium px-2.5 py-0.5 rounded-full">
                     {friendRequests.length}
                   </span>
+                  {friendRequests.length > 1 && (
+                    <button
+                      onClick={handleAcceptAllFriendRequests}
+                      className="ml-auto text-sm font-medium text-blue-600 hover:text-blue-800"
+                    >
+                      Accept all
+                    </button>
+                  )}
                 </h3>
                 <div className="space-y-3">
                   {friendRequests.map((request) => (
@@ -244,7 +491,7 @@ const Home: React.FC = () => {
             {/* Posts Feed */}
             <div className="space-y-6">
               {posts.map((post) => {
-                const isLiked = post.likes.includes(user?._id || "");
+                const isLiked = post.liked_by_me;
 
                 return (
                   <div
@@ -282,10 +529,19 @@ const Home: React.FC = () => {
                         {post.content}
                       </p>
 
-                      {/* Beijjati Badge */}
-                      {post.is_beizzati && (
+                      {/* Attached Image (thumbnail links to the original) */}
+                      {post.image && <PostImage image={post.image} />}
+
+                      {/* Beijjati Badge, also shown while the image is being verified */}
+                      {(post.is_beizzati ||
+                        post.verification_status === "pending_verification") && (
                         <div className="mt-3 inline-flex items-center px-3 py-1 rounded-full text-sm font-medium bg-red-100 text-red-800">
                           🔥 Beizzati Alert!
+                          {post.verification_status === "pending_verification" && (
+                            <span className="ml-2 text-xs text-red-600">
+                              (verifying image...)
+                            </span>
+                          )}
                         </div>
                       )}
 
@@ -324,20 +580,48 @@ const Home: React.FC = () => {
                                 isLiked ? "fill-current" : ""
                               }`}
                             />
-                            <span>{post.likes.length}</span>
+                            <span>{post.like_count}</span>
                           </button>
 
-                          <button className="flex items-center space-x-2 text-sm font-medium text-gray-500 hover:text-blue-600 transition-colors">
+                          <button
+                            onClick={() => toggleComments(post._id)}
+                            className="flex items-center space-x-2 text-sm font-medium text-gray-500 hover:text-blue-600 transition-colors"
+                          >
                             <MessageCircle className="w-5 h-5" />
-                            <span>Comment</span>
+                            <span>
+                              {post.comment_count > 0
+                                ? post.comment_count
+                                : "Comment"}
+                            </span>
                           </button>
                         </div>
                       </div>
+
+                      {openComments.has(post._id) && (
+                        <CommentSection
+                          post={post}
+                          onCommentAdded={(comment) =>
+                            handleCommentAdded(post._id, comment)
+                          }
+                        />
+                      )}
                     </div>
                   </div>
                 );
               })}
 
+              {nextCursor && (
+                <div className="text-center">
+                  <button
+                    onClick={loadMorePosts}
+                    disabled={loadingMore}
+                    className="btn btn-secondary"
+                  >
+                    {loadingMore ? "Loading..." : "Load more"}
+                  </button>
+                </div>
+              )}
+
               {posts.length === 0 && (
                 <div className="bg-white rounded-lg shadow-sm border border-gray-200 p-12 text-center">
                   <p className="text-gray-500 mb-4">No posts to show yet.</p>
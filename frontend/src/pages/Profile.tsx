@@ -3,37 +3,50 @@ import { useParams } from 'react-router-dom';
 import { Edit3, UserPlus, UserCheck, MessageCircle, Heart, Calendar } from 'lucide-react';
 import { usersAPI, postsAPI } from '../services/api';
 import { useAuth } from '../context/AuthContext';
-import type { User, Post } from '../services/api';
+import type { UserProfile, Post, UserCard } from '../services/api';
 
 const Profile: React.FC = () => {
   const { username } = useParams<{ username: string }>();
   const { user: currentUser } = useAuth();
 
-  const [profileUser, setProfileUser] = useState<User | null>(null);
+  const [profileUser, setProfileUser] = useState<UserProfile | null>(null);
   const [posts, setPosts] = useState<Post[]>([]);
   const [mentions, setMentions] = useState<Post[]>([]);
+  const [postsCursor, setPostsCursor] = useState<string | null>(null);
+  const [mentionsCursor, setMentionsCursor] = useState<string | null>(null);
+  // Counts come from the server; the lists only hold the pages loaded so far
+  const [postsTotal, setPostsTotal] = useState(0);
+  const [mentionsTotal, setMentionsTotal] = useState(0);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [activeTab, setActiveTab] = useState<'posts' | 'mentions'>('posts');
   const [loading, setLoading] = useState(true);
   const [isEditing, setIsEditing] = useState(false);
+  const [mutualFriends, setMutualFriends] = useState<UserCard[]>([]);
   const [editForm, setEditForm] = useState({ bio: '', profile_picture: '' });
 
   const isOwnProfile = currentUser?.username === username;
-  const isFriend = profileUser?.friends.includes(currentUser?._id || '');
-  const hasPendingRequest = profileUser?.friend_requests_received.includes(currentUser?._id || '');
+  const isFriend = profileUser?.is_friend;
+  const hasPendingRequest = profileUser?.friend_request_sent;
 
   const loadProfile = useCallback(async () => {
     if (!username) return;
 
     try {
-      const [userResponse, postsResponse, mentionsResponse] = await Promise.all([
+      const [userResponse, postsResponse, mentionsResponse, mutualResponse] = await Promise.all([
         usersAPI.getUserProfile(username),
         postsAPI.getUserPosts(username),
-        postsAPI.getUserMentions(username)
+        postsAPI.getUserMentions(username),
+        usersAPI.getMutualFriends(username)
       ]);
 
       setProfileUser(userResponse.user);
+      setMutualFriends(mutualResponse.mutual_friends);
       setPosts(postsResponse.posts);
+      setPostsCursor(postsResponse.next_cursor);
+      setPostsTotal(postsResponse.total ?? postsResponse.posts.length);
       setMentions(mentionsResponse.posts);
+      setMentionsCursor(mentionsResponse.next_cursor);
+      setMentionsTotal(mentionsResponse.total ?? mentionsResponse.posts.length);
       setEditForm({
         bio: userResponse.user.bio || '',
         profile_picture: userResponse.user.profile_picture || ''
@@ -51,6 +64,30 @@ const Profile: React.FC = () => {
     }
   }, [username, loadProfile]);
 
+  const loadMore = async () => {
+    const cursor = activeTab === 'posts' ? postsCursor : mentionsCursor;
+    if (!username || !cursor) return;
+
+    setLoadingMore(true);
+    try {
+      if (activeTab === 'posts') {
+        const response = await postsAPI.getUserPosts(username, cursor);
+        setPosts((prev) => [...prev, ...response.posts]);
+        setPostsCursor(response.next_cursor);
+      } else {
+        const response = await postsAPI.getUserMentions(username, cursor);
+        setMentions((prev) => [...prev, ...response.posts]);
+        setMentionsCursor(response.next_cursor);
+      }
+    } catch (error) {
+      console.error('Failed to load more posts:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  const activeCursor = activeTab === 'posts' ? postsCursor : mentionsCursor;
+
   const handleSendFriendRequest = async () => {
     if (!username) return;
 
@@ -162,14 +199,22 @@ const Profile: React.FC = () => {
               <div className="text-sm text-gray-500">Beijjati Count</div>
             </div>
             <div className="text-center">
-              <div className="text-2xl font-bold text-blue-600">{posts.length}</div>
+              <div className="text-2xl font-bold text-blue-600">{postsTotal}</div>
               <div className="text-sm text-gray-500">Posts</div>
             </div>
             <div className="text-center">
-              <div className="text-2xl font-bold text-gray-600">{profileUser.friends.length}</div>
+              <div className="text-2xl font-bold text-gray-600">{profileUser.friends_count}</div>
               <div className="text-sm text-gray-500">Friends</div>
             </div>
           </div>
+
+          {!isOwnProfile && mutualFriends.length > 0 && (
+            <p className="mt-4 text-sm text-gray-600">
+              {mutualFriends.length} mutual friend{mutualFriends.length === 1 ? '' : 's'}:{' '}
+              {mutualFriends.slice(0, 3).map((friend) => friend.username).join(', ')}
+              {mutualFriends.length > 3 && ' and others'}
+            </p>
+          )}
         </div>
 
         {/* Edit Profile Modal */}
@@ -233,7 +278,7 @@ const Profile: React.FC = () => {
                     : 'border-transparent text-gray-500 hover:text-gray-700'
                 }`}
               >
-                Posts ({posts.length})
+                Posts ({postsTotal})
               </button>
               <button
                 onClick={() => setActiveTab('mentions')}
@@ -243,7 +288,7 @@ const Profile: React.FC = () => {
                     : 'border-transparent text-gray-500 hover:text-gray-700'
                 }`}
               >
-                Mentions ({mentions.length})
+                Mentions ({mentionsTotal})
               </button>
             </nav>
           </div>
@@ -276,11 +321,11 @@ const Profile: React.FC = () => {
                         <div className="flex items-center space-x-4 text-sm text-gray-500">
                           <span className="flex items-center">
                             <Heart className="w-4 h-4 mr-1" />
-                            {post.likes.length}
+                            {post.like_count}
                           </span>
                           <span className="flex items-center">
                             <MessageCircle className="w-4 h-4 mr-1" />
-                            {post.comments.length}
+                            {post.comment_count}
                           </span>
                         </div>
                       </div>
@@ -320,11 +365,11 @@ const Profile: React.FC = () => {
                         <div className="flex items-center space-x-4 text-sm text-gray-500">
                           <span className="flex items-center">
                             <Heart className="w-4 h-4 mr-1" />
-                            {post.likes.length}
+                            {post.like_count}
                           </span>
                           <span className="flex items-center">
                             <MessageCircle className="w-4 h-4 mr-1" />
-                            {post.comments.length}
+                            {post.comment_count}
                           </span>
                         </div>
                       </div>
@@ -338,6 +383,18 @@ const Profile: React.FC = () => {
                 )}
               </div>
             )}
+
+            {activeCursor && (
+              <div className="text-center mt-6">
+                <button
+                  onClick={loadMore}
+                  disabled={loadingMore}
+                  className="btn btn-secondary"
+                >
+                  {loadingMore ? 'Loading...' : 'Load more'}
+                </button>
+              </div>
+            )}
           </div>
         </div>
       </div>
@@ -1,6 +1,6 @@
 import axios from "axios";
 
-const API_BASE_URL = "http://localhost:5000/api";
+export const API_BASE_URL = "http://localhost:5000/api";
 
 // Create axios instance
 const api = axios.create({
@@ -39,26 +39,103 @@ export interface User {
   bio?: string;
   profile_picture?: string;
   beijjati_count: number;
-  friends: string[];
-  friend_requests_sent: string[];
-  friend_requests_received: string[];
+  friends_count: number;
+  friend_requests_sent_count: number;
+  friend_requests_received_count: number;
   created_at: string;
 }
 
+export interface UserCard {
+  _id: string;
+  username: string;
+  profile_picture?: string;
+  beijjati_count: number;
+}
+
+// Search and @mention autocomplete results, served from the in-memory search index
+export type UserSearchResult = Pick<UserCard, "_id" | "username" | "profile_picture">;
+
+export interface UserProfile {
+  _id: string;
+  username: string;
+  bio?: string;
+  profile_picture?: string;
+  beijjati_count: number;
+  created_at: string;
+  friends_count: number;
+  is_friend: boolean;
+  friend_request_sent: boolean;
+  friend_request_received: boolean;
+}
+
+export type VerificationStatus = "pending_verification" | "verified" | "rejected";
+
+export interface PostImage {
+  file_id: string;
+  thumbnail_id: string;
+  content_type: string;
+  width: number;
+  height: number;
+}
+
+export interface Comment {
+  _id: string;
+  post_id: string;
+  author_id: string;
+  // Full card from the comments endpoint; only _id and username in feed previews
+  author?: (Pick<UserCard, "_id" | "username"> & Partial<UserCard>) | null;
+  content: string;
+  created_at: string;
+}
+
+export interface CommentPage {
+  comments: Comment[];
+  next_cursor: string | null;
+}
+
 export interface Post {
   _id: string;
   author_id: string;
-  author: User;
+  author: UserCard;
   content: string;
   is_beizzati: boolean;
+  verification_status?: VerificationStatus;
+  image?: PostImage;
   mentioned_users: string[];
-  mentioned_users_details: User[];
+  mentioned_users_details: Pick<UserCard, "_id" | "username">[];
   visible_to: string[];
-  likes: string[];
-  comments: any[];
+  like_count: number;
+  liked_by_me: boolean;
+  comment_count: number;
+  comment_preview: Comment[];
   created_at: string;
 }
 
+export interface LeaderboardEntry {
+  rank: number;
+  user: UserCard;
+}
+
+export type LeaderboardScope = "global" | "friends";
+
+export interface Leaderboard {
+  scope: LeaderboardScope;
+  leaderboard: LeaderboardEntry[];
+  my_rank: number | null;
+}
+
+export interface FriendSuggestion {
+  user: UserCard;
+  mutual_count: number;
+}
+
+export interface PostPage {
+  posts: Post[];
+  next_cursor: string | null;
+  // Only on the first page of user posts and mentions
+  total?: number;
+}
+
 export interface AuthResponse {
   message: string;
   access_token: string;
@@ -94,14 +171,14 @@ export const authAPI = {
 
 // Users API
 export const usersAPI = {
-  searchUsers: async (query: string): Promise<{ users: User[] }> => {
+  searchUsers: async (query: string): Promise<{ users: UserSearchResult[] }> => {
     const response = await api.get(
       `/users/search?q=${encodeURIComponent(query)}`
     );
     return response.data;
   },
 
-  getUserProfile: async (username: string): Promise<{ user: User }> => {
+  getUserProfile: async (username: string): Promise<{ user: UserProfile }> => {
     const response = await api.get(`/users/profile/${username}`);
     return response.data;
   },
@@ -137,12 +214,46 @@ export const usersAPI = {
     return response.data;
   },
 
-  getFriends: async (): Promise<{ friends: User[] }> => {
+  acceptAllFriendRequests: async (): Promise<{
+    message: string;
+    friend_ids: string[];
+  }> => {
+    const response = await api.post("/users/friend-request/accept-all");
+    return response.data;
+  },
+
+  getLeaderboard: async (
+    scope: LeaderboardScope = "global",
+    limit = 10
+  ): Promise<Leaderboard> => {
+    const response = await api.get("/users/leaderboard", {
+      params: { scope, limit },
+    });
+    return response.data;
+  },
+
+  getMutualFriends: async (
+    username: string
+  ): Promise<{ mutual_friends: UserCard[]; count: number }> => {
+    const response = await api.get(`/users/${username}/mutual`);
+    return response.data;
+  },
+
+  getFriendSuggestions: async (
+    limit = 5
+  ): Promise<{ suggestions: FriendSuggestion[] }> => {
+    const response = await api.get("/users/suggestions", {
+      params: { limit },
+    });
+    return response.data;
+  },
+
+  getFriends: async (): Promise<{ friends: UserCard[] }> => {
     const response = await api.get("/users/friends");
     return response.data;
   },
 
-  getFriendRequests: async (): Promise<{ friend_requests: User[] }> => {
+  getFriendRequests: async (): Promise<{ friend_requests: UserCard[] }> => {
     const response = await api.get("/users/friend-requests");
     return response.data;
   },
@@ -152,7 +263,11 @@ export const usersAPI = {
 export const postsAPI = {
   createPostWithImage: async (
     formData: FormData
-  ): Promise<{ message: string; post_id: string }> => {
+  ): Promise<{
+    message: string;
+    post_id: string;
+    verification_status: VerificationStatus | null;
+  }> => {
     const response = await fetch("http://localhost:5000/api/posts", {
       method: "POST",
       headers: {
@@ -182,18 +297,47 @@ export const postsAPI = {
     return response.data;
   },
 
-  getFeed: async (): Promise<{ posts: Post[] }> => {
-    const response = await api.get("/posts/feed");
+  // Needs the auth header, so callers render it through an object URL
+  getImage: async (fileId: string): Promise<Blob> => {
+    const response = await api.get(`/posts/images/${fileId}`, {
+      responseType: "blob",
+    });
+    return response.data;
+  },
+
+  getFeed: async (before?: string): Promise<PostPage> => {
+    const response = await api.get("/posts/feed", {
+      params: before ? { before } : undefined,
+    });
+    return response.data;
+  },
+
+  getUserPosts: async (username: string, before?: string): Promise<PostPage> => {
+    const response = await api.get(`/posts/user/${username}`, {
+      params: before ? { before } : undefined,
+    });
+    return response.data;
+  },
+
+  getUserMentions: async (username: string, before?: string): Promise<PostPage> => {
+    const response = await api.get(`/posts/mentions/${username}`, {
+      params: before ? { before } : undefined,
+    });
     return response.data;
   },
 
-  getUserPosts: async (username: string): Promise<{ posts: Post[] }> => {
-    const response = await api.get(`/posts/user/${username}`);
+  getComments: async (postId: string, before?: string): Promise<CommentPage> => {
+    const response = await api.get(`/posts/${postId}/comments`, {
+      params: before ? { before } : undefined,
+    });
     return response.data;
   },
 
-  getUserMentions: async (username: string): Promise<{ posts: Post[] }> => {
-    const response = await api.get(`/posts/mentions/${username}`);
+  addComment: async (
+    postId: string,
+    content: string
+  ): Promise<{ message: string; comment: Comment }> => {
+    const response = await api.post(`/posts/${postId}/comments`, { content });
     return response.data;
   },
 
@@ -0,0 +1,53 @@
+import { API_BASE_URL } from "./api";
+import type { Comment, Post, UserCard, VerificationStatus } from "./api";
+
+export interface ServerEvents {
+  post_created: { post: Post };
+  post_verified: {
+    post_id: string;
+    verification_status: VerificationStatus;
+    is_beizzati: boolean;
+  };
+  mention: { post_id: string; user: UserCard };
+  post_liked: {
+    post_id: string;
+    liked: boolean;
+    like_count: number;
+    comment_count: number;
+    user?: UserCard;
+  };
+  post_commented: {
+    post_id: string;
+    comment: Comment;
+    like_count: number;
+    comment_count: number;
+    user?: UserCard;
+  };
+  friend_request: { user: UserCard };
+  friend_request_accepted: { user: UserCard };
+  // Events were dropped for this connection; refetch what is on screen
+  resync: Record<string, never>;
+}
+
+export type ServerEventHandlers = {
+  [K in keyof ServerEvents]?: (data: ServerEvents[K]) => void;
+};
+
+// Opens the server-sent event stream for the logged-in user; returns a cleanup function
+export const subscribeToEvents = (handlers: ServerEventHandlers) => {
+  const token = localStorage.getItem("token");
+  if (!token) return () => {};
+
+  const source = new EventSource(
+    `${API_BASE_URL}/events/stream?token=${encodeURIComponent(token)}`
+  );
+
+  (Object.keys(handlers) as (keyof ServerEvents)[]).forEach((type) => {
+    source.addEventListener(type, (event) => {
+      const handler = handlers[type] as ((data: unknown) => void) | undefined;
+      handler?.(JSON.parse((event as MessageEvent).data));
+    });
+  });
+
+  return () => source.close();
+};